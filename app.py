@@ -1,53 +1,119 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, send_from_directory, send_file
+from flask import Flask, render_template, request, redirect, url_for, session, flash, send_from_directory, send_file, jsonify, Response, stream_with_context
 import mysql.connector
+import importlib
 import os
-import base64
-from mysql.connector import Binary
+import re
+import shutil
+import uuid
+import click
+from mysql.connector import Binary, errorcode
 from werkzeug.utils import secure_filename
-import pandas as pd
 from io import BytesIO
 
+from db import configure as configure_db, connect as db_connect, db_connection, db_cursor, get_pool, set_observer
+from queries import APPLICATION_LIST, APPLICATION_DETAIL, APPLICATION_DETAIL_COLUMNS, APPLICATION_IMAGE_META, APPLICATION_IMAGE_BLOB, APPLICATION_INSERT, columns, has_picture, like_pattern
+from image_store import get_image_store, ImageCache, ImageStoreError, sniff_image_type
+from migrate import apply_migrations
+from exports import ExportError, XLSX_MIMETYPE, applications_query, iter_csv, iter_rows, select_columns, with_checks, write_xlsx, xlsx_tempfile
+import jobs
+from jobs import JobError, job_kind
+from sequences import next_application_no, parse_application_no, skip_past
+from plan_check import explain, format_plan, plan_problems
+from search import index_application, ranked_search
+from cache import APPROVED, PENDING, create_cache
+from stats import StatsError, add_sponsored, read_stats, rebuild as rebuild_stats, record_donation, record_new_application, set_status
+from imports import IMPORT_COLUMNS, IMPORT_EXTENSIONS, import_file
+from bulk_review import BulkReviewError, approve_many, delete_class_default, list_class_defaults, parse_overrides, reject_many, save_class_default
+from uploads import MAX_REQUEST_BYTES, UploadError, UploadRequest, normalize_receipt, sniff_type, stage_data_url, stage_file
+from settings import DB_CONFIG, SECRET_KEY
+from metrics import Instrumentation, render_prometheus
+from pagination import PAGE_TOTALS, PaginationError, cached_count, decode_token, fetch_page, page_query, page_size
+import templating
+from templating import FragmentCache, TemplatingError, vendor_bootstrap
+from filters import APPLICATIONS, DONATIONS
+import files
+from files import FILE_DELIVERY, FileStoreError, get_receipt_store, is_key, receipt_location, send_protected
+from duplicates import describe as describe_duplicate, find_duplicates, index_duplicates, is_similar, is_strong, write_report as write_duplicates_report
+from holds import HOLD_MINUTES, HoldError, Sweeper, holder_for
+from holds import confirm as confirm_hold, current as current_hold, held_by as holds_of, place as place_hold, release as release_hold, sweep as sweep_holds
+from pdf_reports import PDF_MIMETYPE, PDF_SYNC_ROWS, PdfReportError, PdfReports
+
 app = Flask(__name__)
-app.secret_key = "supersecret123"
+app.secret_key = SECRET_KEY
+
+# Template bytecode cache, per-row fragment cache, bootstrap source (templating.py)
+fragment_cache = FragmentCache()
+templating.init_app(app, fragment_cache)
+
+# Database credentials: settings.py (Remote / Local)
+configure_db(DB_CONFIG)
+query_cache = create_cache()
 
-#Remote
-DB_CONFIG = {
-    "host": "localhost",
-    "user": "root",
-    "password": "SecureRootPass123!",
-    "database": "afaqschool1"
-}
+# Per-route latency, DB round-trips and slow-query log (metrics.py, /metrics)
+instrumentation = Instrumentation()
+instrumentation.init_app(app)
+set_observer(instrumentation)
 
+# Receipts and uploads are served only through access-checked routes (files.py)
+files.init_app(app)
 
-#Local
-#DB_CONFIG = {
- #   "host": "localhost",
-  #  "user": "root",
-   # "password": "Zain12345",
-   # "database": "afaqschool"
-#}
+# PDF reports: process pool + file cache (pdf_reports.py)
+pdf_reports = PdfReports()
 
+# Expired donor holds are cleared from donor_dashboard (holds.py)
+hold_sweeper = Sweeper()
+
+# Job runner threads start on a worker's first request too, so jobs left
+# queued by a recycled worker do not wait for the next submit() (jobs.py)
+app.before_request(jobs.ensure_runner)
+
+# Old upload locations, only read now (photos and receipts live in their stores)
 UPLOAD_FOLDER = "static/uploads"
 RECEIPT_FOLDER = "static/receipts"
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(RECEIPT_FOLDER, exist_ok=True)
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 app.config["RECEIPT_FOLDER"] = RECEIPT_FOLDER
 
+# Uploads stream to disk (uploads.py); refuse oversized posts before parsing
+app.request_class = UploadRequest
+app.config["MAX_CONTENT_LENGTH"] = MAX_REQUEST_BYTES
+
 ADMIN_PASSWORD = "admin12345"
+APPLICATION_NO_RETRIES = 3
+SEARCH_LIMIT = 50
 
 # ==== HELPERS ====
 def get_db_connection():
-    return mysql.connector.connect(**DB_CONFIG)
-
-def get_next_application_no():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT MAX(id) FROM applications")
-    max_id = cursor.fetchone()[0] or 0
-    cursor.close()
-    conn.close()
-    return f"APP-{max_id+1:04d}"
+    # Pooled connection; close() returns it to this worker's pool
+    return db_connect()
+
+# Keyset pagination order (newest first) for each list
+APPLICATION_PAGE_KEYS = [("created_at", "created_at"), ("id", "id")]
+DASHBOARD_PAGE_KEYS = [("a.created_at", "created_at"), ("a.id", "id")]
+DONATION_PAGE_KEYS = [("d.created_at", "created_at"), ("d.id", "donation_id")]
+
+def _page_args(keys=APPLICATION_PAGE_KEYS):
+    # [cursor, size] from ?cursor= and ?size=, also the cache key part for a
+    # paged list. The cursor is checked here, before the cached loader runs:
+    # a bad one is flashed on every request, not only on a cache miss, and
+    # the first page is cached under the first page's key
+    token = request.args.get("cursor")
+    if token:
+        try:
+            decode_token(token, len(keys))
+        except PaginationError:
+            flash("That page link has expired; showing the first page.", "warning")
+            token = None
+    return [token, request.args.get("size")]
+
+def list_page(cursor, query, params, page_args, keys=APPLICATION_PAGE_KEYS):
+    # One page of a list route; page_args from _page_args(keys)
+    token, size = page_args
+    total = cached_count(cursor, query, params) if PAGE_TOTALS else None
+    return fetch_page(cursor, query, params, keys, token, page_size(size), total)
+
+def insert_application(cursor, application_no, fields):
+    # fields: student_name .. picture_key, in column order below
+    cursor.execute(APPLICATION_INSERT, (application_no,) + tuple(fields) + ("Pending", "1"))
 
 # ==== ROUTES ====
 #updated pwd
@@ -115,7 +181,17 @@ def home():
         flash("براہ کرم پہلے لاگ ان کریں", "warning")
         return redirect(url_for("login"))
     user = session["user"]
-    return render_template("home.html", user=user)
+    summary = None
+    if user.get("role") == "admin":
+        with db_cursor(dictionary=True) as cursor:
+            summary = read_stats(cursor)
+    return render_template("home.html", user=user, summary=summary)
+
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    flash(f"Upload is larger than {MAX_REQUEST_BYTES // (1024 * 1024)} MB", "danger")
+    return redirect(request.referrer or url_for("home"))
 
 
 # LOGOUT
@@ -132,8 +208,6 @@ def new_registration():
     if not session.get("user"):
         return redirect(url_for("login"))
 
-    application_no = get_next_application_no()
-
     if request.method == "POST":
         student_name = request.form["student_name"]
         father_name = request.form["father_name"]
@@ -148,93 +222,149 @@ def new_registration():
         donation_percent = request.form.get("donation_percentage")
         is_orphan = request.form.get("is_orphan")  # ✅ New Field
 
-        picture_data = None
+        # Staged to disk in chunks; thumbnails are made by a background job
+        picture_key = None
         picture = request.files.get("picture")
-        if picture and picture.filename != "":
-            picture_data = picture.read()
-
         captured_image = request.form.get("captured_image")
-        if not picture_data and captured_image:
-            header, encoded = captured_image.split(",", 1)
-            picture_data = base64.b64decode(encoded)
-
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO applications
-            (application_no, student_name, father_name, dob, age, class, sabika_school,
-             father_cnic, mobile_no, father_income, is_orphan, loss_flood, donation_percentage,
-             picture, status, user_id)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-        """, (
-            application_no,
-            student_name,
-            father_name,
-            dob,
-            age,
-            class_name,
-            sabika_school,
-            father_cnic,
-            mobile,
-            monthly_income,
-            is_orphan,   # ✅ Insert new field
-            loss_flood,
-            donation_percent,
-            Binary(picture_data) if picture_data else None,
-            "Pending",
-            "1"
-        ))
-        conn.commit()
-        cursor.close()
-        conn.close()
+        try:
+            if picture and picture.filename != "":
+                staged = stage_file(picture, "picture")
+            elif captured_image:
+                staged = stage_data_url(captured_image, "picture")
+            else:
+                staged = None
+            if staged:
+                picture_key = get_image_store().put_file(staged.path, staged.ext, staged.sha256)
+        except (UploadError, ImageStoreError) as e:
+            flash(f"Picture rejected: {e}", "danger")
+            return redirect(url_for("new_registration"))
+
+        # The number is allocated inside the insert transaction; a duplicate
+        # (number taken by a legacy row) moves the counter past it and retries
+        for attempt in range(APPLICATION_NO_RETRIES):
+            try:
+                with db_connection() as conn:
+                    cursor = conn.cursor()
+                    # Indexed lookup on the blocking keys (duplicates.py); a warning, not a refusal
+                    duplicates = find_duplicates(cursor, student_name, dob, father_cnic, mobile)
+                    application_no = next_application_no(cursor)
+                    insert_application(cursor, application_no, (
+                        student_name,
+                        father_name,
+                        dob,
+                        age,
+                        class_name,
+                        sabika_school,
+                        father_cnic,
+                        mobile,
+                        monthly_income,
+                        is_orphan,   # ✅ Insert new field
+                        loss_flood,
+                        donation_percent,
+                        picture_key,
+                    ))
+                    index_application(cursor, application_no, student_name, father_name,
+                                      father_cnic, mobile)
+                    index_duplicates(cursor, [(application_no, student_name, dob, father_cnic, mobile)])
+                    record_new_application(cursor)
+                    conn.commit()
+                    cursor.close()
+                break
+            except mysql.connector.IntegrityError as e:
+                if e.errno != errorcode.ER_DUP_ENTRY or attempt == APPLICATION_NO_RETRIES - 1:
+                    raise
+                with db_cursor(commit=True) as cursor:
+                    skip_past(cursor, parse_application_no(application_no))
+        query_cache.invalidate(PENDING)
+        if picture_key:
+            process_later("image_derivatives", {"key": picture_key})
 
         flash(f"Application submitted successfully! Your Application No is {application_no}")
+        for number, kinds in duplicates:
+            if is_strong(kinds):
+                flash(f"Possible duplicate of {number}: {describe_duplicate(kinds)}. "
+                      "Please check before it is reviewed.", "warning")
+            elif is_similar(kinds):
+                flash(f"Similar to {number}: {describe_duplicate(kinds)}. "
+                      "A sibling, or the same child spelled differently?", "info")
         return redirect(url_for("status_report"))
 
-    return render_template("new_registration.html", application_no=application_no)
+    return render_template("new_registration.html")
 
 @app.route("/donor")
 def donor_dashboard():
     if "user" not in session or session["user"]["role"] != "donor":
         return redirect(url_for("home"))
 
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("""
-        SELECT a.application_no, a.student_name, a.father_name, s.class_name, s.section, s.total
-        FROM applications a
-        JOIN students s ON a.application_no = s.application_no
-        WHERE a.status = 'Approved'
-    """)
-    approved_apps = cursor.fetchall()
-    cursor.close()
-    conn.close()
+    # Expired holds reappear once swept; at most every HOLD_SWEEP_INTERVAL per worker
+    if hold_sweeper.due():
+        with db_cursor(commit=True) as cursor:
+            if sweep_holds(cursor):
+                query_cache.invalidate(APPROVED)
 
-    return render_template("donor_dashboard.html", applications=approved_apps)
+    page_args = _page_args(DASHBOARD_PAGE_KEYS)
+
+    def load():
+        with db_cursor(dictionary=True) as cursor:
+            return list_page(cursor, """
+                SELECT a.id, a.created_at, a.application_no, a.student_name, a.father_name,
+                       s.class_name, s.section, s.total
+                FROM applications a
+                JOIN students s ON a.application_no = s.application_no
+                WHERE a.status = 'Approved' AND a.held_until IS NULL
+            """, [], page_args, DASHBOARD_PAGE_KEYS)
+
+    page = query_cache.get_or_set("donor_dashboard", page_args, load, tags=(APPROVED,))
+
+    # The donor's own holds: per donor, so not cached
+    with db_cursor(dictionary=True) as cursor:
+        reserved = holds_of(cursor, holder_for(session["user"]))
+
+    return render_template("donor_dashboard.html", applications=page.rows, page=page, reserved=reserved)
 
 @app.route("/donor/view/<application_no>")
 def donor_view(application_no):
     
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("""
-        SELECT a.*,s.class_name, s.section, s.fee, s.books, s.uniform, s.total
-        FROM applications a
-        JOIN students s ON a.application_no = s.application_no
-        WHERE a.application_no = %s
-    """, (application_no,))
-    application = cursor.fetchone()
-    cursor.close()
-    conn.close()
+    with db_cursor(dictionary=True) as cursor:
+        cursor.execute(f"""
+            SELECT {columns(APPLICATION_DETAIL_COLUMNS, "a")}, {has_picture("a")},
+                   s.class_name, s.section, s.fee, s.books, s.uniform, s.total
+            FROM applications a
+            JOIN students s ON a.application_no = s.application_no
+            WHERE a.application_no = %s
+        """, (application_no,))
+        application = cursor.fetchone()
 
     return render_template("donor_view.html", app=application)
 
-import os
-from werkzeug.utils import secure_filename
+# DONOR HOLDS (holds.py)
+@app.route("/donor/hold/<application_no>", methods=["POST"])
+def donor_hold(application_no):
+    if "user" not in session or session["user"]["role"] != "donor":
+        flash("Please login as a donor first.", "warning")
+        return redirect(url_for("login"))
 
-UPLOAD_FOLDER = "static/receipts"
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
+    try:
+        with db_cursor(commit=True) as cursor:
+            place_hold(cursor, application_no, holder_for(session["user"]))
+    except HoldError as e:
+        flash(str(e), "warning")
+        return redirect(url_for("donor_dashboard"))
+    query_cache.invalidate(APPROVED)
+    return redirect(url_for("donor_confirm", application_no=application_no))
+
+@app.route("/donor/release/<application_no>", methods=["POST"])
+def donor_release(application_no):
+    if "user" not in session or session["user"]["role"] != "donor":
+        flash("Please login as a donor first.", "warning")
+        return redirect(url_for("login"))
+
+    with db_cursor(commit=True) as cursor:
+        released = release_hold(cursor, application_no, holder_for(session["user"]))
+    if released:
+        query_cache.invalidate(APPROVED)
+        flash(f"Reservation of {application_no} released.", "info")
+    return redirect(url_for("donor_dashboard"))
 
 @app.route("/donor/confirm/<application_no>", methods=["GET", "POST"])
 def donor_confirm(application_no):
@@ -242,24 +372,38 @@ def donor_confirm(application_no):
         flash("Please login as a donor first.", "warning")
         return redirect(url_for("login"))
 
+    donor_name = holder_for(session["user"])
+
     if request.method == "POST":
+        version = request.form.get("hold_version", "")
+        if not version.isdigit():
+            flash("Please reserve the student before uploading the receipt.", "warning")
+            return redirect(url_for("donor_view", application_no=application_no))
+
         file = request.files.get("receipt")
-        if not file:
+        if not file or not file.filename:
             flash("Please upload a receipt.", "danger")
             return redirect(request.url)
-
-        # Save receipt with application_no prefix
-        filename = secure_filename(application_no + "_" + file.filename)
-        filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-        file.save(filepath)
-        app.logger.info(f"[DEBUG] Receipt saved: {filepath}")
+        try:
+            staged = stage_file(file, "receipt")
+        except UploadError as e:
+            flash(str(e), "danger")
+            return redirect(request.url)
 
         # Insert donation + update application status
         conn = get_db_connection()
         cursor = conn.cursor()
 
         try:
-            donor_name = f"{session['user']['name']} - {session['user']['mobile']}"
+            # Approved -> Assigned only for this donor's live hold; the
+            # conditional UPDATE locks the row until commit
+            confirm_hold(cursor, application_no, donor_name, int(version))
+
+            # Stored once per content hash (files.py); the key goes in receipt_path
+            store = get_receipt_store()
+            filename = store.put_file(staged.path, staged.ext, staged.sha256)
+            app.logger.info(f"[DEBUG] Receipt saved: {filename}")
+
             app.logger.info(f"[DEBUG] Preparing INSERT for application_no={application_no}, donor_name={donor_name}, file={filename}")
 
             # Insert into donations table
@@ -273,20 +417,23 @@ def donor_confirm(application_no):
             ))
             app.logger.info("[DEBUG] INSERT executed successfully")
 
-            # Update application status
-            cursor.execute("""
-                UPDATE applications
-                SET status = 'Assigned'
-                WHERE application_no = %s
-            """, (application_no,))
-            app.logger.info("[DEBUG] UPDATE executed successfully")
+            record_donation(cursor)
 
             conn.commit()
+            query_cache.invalidate(APPROVED)
+            # The re-encoded receipt is stored under its own hash (job below)
+            process_later("receipt_normalize", {"key": filename})
             flash("Donation confirmed, receipt uploaded, and application assigned successfully!", "success")
             app.logger.info("[DEBUG] Transaction committed ✅")
 
+        except HoldError as e:
+            conn.rollback()
+            staged.discard()
+            flash(str(e), "warning")
+
         except Exception as e:
             conn.rollback()
+            staged.discard()
             flash(f"Error: {str(e)}", "danger")
             app.logger.error(f"[ERROR] Database error: {e}")
 
@@ -298,11 +445,30 @@ def donor_confirm(application_no):
         return redirect(url_for("donor_dashboard"))
 
     app.logger.info(f"[DEBUG] GET request for donor_confirm page - application_no={application_no}")
-    return render_template("donor_confirm.html", application_no=application_no)
+    with db_cursor(dictionary=True) as cursor:
+        hold = current_hold(cursor, application_no, donor_name)
+    if hold is None:
+        flash("Please reserve the student first; reservations last "
+              f"{HOLD_MINUTES} minutes.", "warning")
+        return redirect(url_for("donor_view", application_no=application_no))
+    return render_template("donor_confirm.html", application_no=application_no, hold=hold)
+
+def export_response(query, params, name, fmt, sheet_name="Sheet1"):
+    # Stream rows from a server-side cursor into CSV (chunked) or XLSX (write-only)
+    rows = iter_rows(query, params)
+    if fmt == "csv":
+        return Response(
+            stream_with_context(iter_csv(rows)),
+            mimetype="text/csv",
+            headers={"Content-Disposition": f"attachment; filename={name}.csv"},
+        )
+    return send_file(
+        xlsx_tempfile(rows, sheet_name),
+        as_attachment=True,
+        download_name=f"{name}.xlsx",
+        mimetype=XLSX_MIMETYPE,
+    )
 
-import pandas as pd
-from flask import request, send_file
-from io import BytesIO
 
 @app.route("/donor_assignments", methods=["GET", "POST"])
 def donor_assignments():
@@ -310,58 +476,39 @@ def donor_assignments():
         flash("Admins only.", "warning")
         return redirect(url_for("login"))
 
-    # Filters
-    student_name = request.args.get("student_name", "").strip()
-    donor_name = request.args.get("donor_name", "").strip()
-    application_no = request.args.get("application_no", "").strip()
-
-    query = """
-        SELECT a.application_no, a.student_name, a.father_name,
-               d.name AS donor_name, u.mobile AS donor_mobile, d.receipt_path,
-               a.status, d.created_at
-        FROM applications a
-        JOIN donations d ON a.application_no = d.application_no
-        LEFT JOIN users u ON d.donor_id = u.id
-        WHERE 1=1
-    """
-    params = []
-
-    if student_name:
-        query += " AND a.student_name LIKE %s"
-        params.append(f"%{student_name}%")
-    if donor_name:
-        query += " AND d.name LIKE %s"
-        params.append(f"%{donor_name}%")
-    if application_no:
-        query += " AND a.application_no LIKE %s"
-        params.append(f"%{application_no}%")
-
-    query += " ORDER BY d.created_at DESC"
-
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
-    cursor.close()
-    conn.close()
-
-    # Export to Excel if requested
-    if request.args.get("export") == "excel":
-        df = pd.DataFrame(rows)
-        output = BytesIO()
-        df.to_excel(output, index=False, engine="openpyxl")
-        output.seek(0)
-        return send_file(
-            output,
-            download_name="donor_assignments.xlsx",
-            as_attachment=True
-        )
+    filters = _parse_filters(DONATIONS)
+
+    # Export to Excel / CSV if requested
+    export = request.args.get("export")
+    if export in ("excel", "csv"):
+        with db_cursor() as cursor:
+            filters.resolve(cursor)
+        query, params = DONATIONS.query(filters, order_by="d.created_at DESC")
+        return export_response(query, params, "donor_assignments",
+                               "csv" if export == "csv" else "xlsx")
+
+    page_args = _page_args(DONATION_PAGE_KEYS)
 
-    return render_template("donor_assignments.html", rows=rows,
-                           student_name=student_name,
-                           donor_name=donor_name,
-                           application_no=application_no)
+    def load():
+        with db_cursor(dictionary=True) as cursor:
+            query, params = DONATIONS.query(filters.resolve(cursor))
+            return list_page(cursor, query, params, page_args, DONATION_PAGE_KEYS)
 
+    page = query_cache.get_or_set("donor_assignments", filters.key + page_args, load, tags=(APPROVED,))
+
+    return render_template("donor_assignments.html", rows=page.rows, page=page,
+                           student_name=filters.get("student_name"),
+                           donor_name=filters.get("donor_name"),
+                           application_no=filters.get("application_no"))
+
+
+
+def _parse_filters(spec, forced=None):
+    # filters.py spec from the query string; bad values are flashed and ignored
+    filters, errors = spec.parse(request.args, forced)
+    for error in errors:
+        flash(error, "warning")
+    return filters
 
 
 # STATUS REPORT
@@ -371,64 +518,38 @@ def status_report():
         flash("Please login first", "warning")
         return redirect(url_for('login'))
 
-    # Get filter values from form/query
-    status_filter = request.args.get("status", "All")
-    student_filter = request.args.get("student", "").strip()
-    class_filter = request.args.get("class", "").strip()
-    age_filter = request.args.get("age", "").strip()
+    # Role based filter: non-admins see only their applications
+    forced = {"mobile": session['user']['mobile']} if session['user']['role'] != 'admin' else None
+    filters = _parse_filters(APPLICATIONS, forced)
 
-    conn = get_db_connection()
-    try:
-        with conn.cursor(dictionary=True) as cur:
-            query = "SELECT * FROM applications WHERE 1=1"
-            params = []
-
-            # Role based filter: non-admins see only their applications
-            if session['user']['role'] != 'admin':
-                query += " AND mobile_no=%s"
-                params.append(session['user']['mobile'])
-
-            # Apply filters
-            if status_filter != "All":
-                query += " AND status=%s"
-                params.append(status_filter)
-            if student_filter:
-                query += " AND student_name LIKE %s"
-                params.append(f"%{student_filter}%")
-            if class_filter:
-                query += " AND class LIKE %s"
-                params.append(f"%{class_filter}%")
-            if age_filter:
-                query += " AND age=%s"
-                params.append(age_filter)
-
-            query += " ORDER BY created_at DESC"
-            cur.execute(query, tuple(params))
-            apps = cur.fetchall()
-    finally:
-        conn.close()
+    page_args = _page_args()
+
+    def load():
+        with db_cursor(dictionary=True) as cur:
+            query, params = APPLICATIONS.query(filters.resolve(cur))
+            return list_page(cur, query, params, page_args)
+
+    page = query_cache.get_or_set("status_report", filters.key + page_args, load,
+                                  tags=(PENDING, APPROVED))
 
     return render_template('status_report.html',
-                           apps=apps,
-                           status_filter=status_filter,
-                           student_filter=student_filter,
-                           class_filter=class_filter,
-                           age_filter=age_filter)
+                           apps=page.rows,
+                           page=page,
+                           status_filter=filters.get("status", "All"),
+                           student_filter=filters.get("student"),
+                           class_filter=filters.get("class"),
+                           age_filter=filters.get("age"))
 
 
 # VIEW APPLICATION
 @app.route('/application/<int:app_id>')
 def view_application(app_id):
-    conn = get_db_connection()
-    try:
-        with conn.cursor(dictionary=True) as cur:
-            cur.execute('SELECT * FROM applications WHERE id=%s', (app_id,))
-            apprec = cur.fetchone()
-            if not apprec:
-                flash('Application not found')
-                return redirect(url_for('home'))
-    finally:
-        conn.close()
+    with db_cursor(dictionary=True) as cur:
+        cur.execute(f'SELECT {APPLICATION_DETAIL} FROM applications WHERE id=%s', (app_id,))
+        apprec = cur.fetchone()
+    if not apprec:
+        flash('Application not found')
+        return redirect(url_for('home'))
     return render_template('view_application.html', app=apprec)
 
 
@@ -439,28 +560,133 @@ def review():
         flash("Access denied")
         return redirect(url_for("home"))
 
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM applications WHERE status='Pending'")
-    applications = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return render_template("review_applications.html", applications=applications)
+    page_args = _page_args()
+
+    def load():
+        with db_cursor(dictionary=True) as cursor:
+            return list_page(cursor, f"SELECT {APPLICATION_LIST} FROM applications WHERE status='Pending'", [],
+                             page_args)
+
+    page = query_cache.get_or_set("review", page_args, load, tags=(PENDING,))
+    return render_template("review_applications.html", applications=page.rows, page=page)
 
 
 # IMAGE SERVE
+IMAGE_MAX_AGE = int(os.environ.get("IMAGE_MAX_AGE", 7 * 24 * 3600))
+image_cache = ImageCache(int(os.environ.get("IMAGE_CACHE_BYTES", 32 * 1024 * 1024)))
+
+
+def _image_headers(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    # The URL is per application, not per photo, so revalidate after max_age
+    response.cache_control.private = True
+    response.cache_control.max_age = IMAGE_MAX_AGE
+    return response
+
+
+def _may_see_image(user, status, mobile_no):
+    # Admins see every photo; donors the students open to them (Approved,
+    # which includes the ones they hold) and the ones already assigned;
+    # applicants their own applications (status_report's mobile filter)
+    if user["role"] == "admin":
+        return True
+    if user["role"] == "donor":
+        return status in ("Approved", "Assigned")
+    return bool(user.get("mobile")) and mobile_no == user["mobile"]
+
+
 @app.route("/image/<application_no>")
 def get_image(application_no):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT picture FROM applications WHERE application_no=%s", (application_no,))
-    row = cursor.fetchone()
-    cursor.close()
-    conn.close()
+    user = session.get("user")
+    if not user:
+        flash("Please login first", "warning")
+        return redirect(url_for("login"))
 
-    if row and row[0]:
-        return send_file(BytesIO(row[0]), mimetype="image/jpeg")
-    return "No image", 404
+    size = request.args.get("size", "original")
+    store = get_image_store()
+    if size != "original" and size not in store.sizes:
+        return "Unknown image size", 400
+
+    with db_cursor() as cursor:
+        cursor.execute(f"SELECT {APPLICATION_IMAGE_META}, status, mobile_no FROM applications WHERE application_no=%s",
+                       (application_no,))
+        row = cursor.fetchone()
+    if not row:
+        return "No image", 404
+    key, blob_sha1, created_at, status, mobile_no = row
+    if not _may_see_image(user, status, mobile_no):
+        return "Access denied", 403
+    if not (key or blob_sha1):
+        return "No image", 404
+    if key:
+        try:
+            store.path(key)
+        except ImageStoreError:
+            return "No image", 404    # malformed picture_key
+    if key and size != "original" and not store.exists(key, size):
+        # Resized copy not written yet (background job); don't cache the
+        # original under the small size's ETag
+        size = "original"
+
+    # Strong ETag from the content digest; legacy blobs have no resized variants
+    etag = f"{key.split('.', 1)[0]}-{size}" if key else f"{blob_sha1}-original"
+    if request.if_none_match.contains(etag):
+        return _image_headers(Response(status=304), etag, created_at)
+
+    if key and FILE_DELIVERY == "accel":
+        # nginx sends the file (files.py); nothing to cache in this worker
+        response = send_protected("images", store.relative_path(key, size), store.path(key, size))
+        return _image_headers(response, etag, created_at)
+
+    cached = image_cache.get(etag)
+    if cached is None:
+        if key:
+            try:
+                data = store.read(key, size)
+            except FileNotFoundError:
+                return "No image", 404
+        else:
+            # Not yet moved to the image store by `flask migrate-images`
+            with db_cursor() as cursor:
+                cursor.execute(f"SELECT {APPLICATION_IMAGE_BLOB} FROM applications WHERE application_no=%s", (application_no,))
+                row = cursor.fetchone()
+            data = row[0] if row else None
+            if not data:
+                return "No image", 404
+        mimetype = sniff_image_type(data)[0] or "application/octet-stream"
+        cached = (data, mimetype, created_at)
+        image_cache.put(etag, *cached)
+
+    data, mimetype, last_modified = cached
+    return _image_headers(Response(data, mimetype=mimetype), etag, last_modified)
+
+
+# RECEIPTS
+@app.route("/receipts/<int:donation_id>")
+def get_receipt(donation_id):
+    user = session.get("user")
+    if not user or user.get("role") not in ("admin", "donor"):
+        flash("Please login first", "warning")
+        return redirect(url_for("login"))
+
+    with db_cursor(dictionary=True) as cursor:
+        cursor.execute("SELECT application_no, name, receipt_path FROM donations WHERE id=%s", (donation_id,))
+        donation = cursor.fetchone()
+    if not donation or not donation["receipt_path"]:
+        return "No receipt", 404
+    # Donors see only their own receipts (donor_confirm stores holder_for())
+    if user["role"] != "admin" and donation["name"] != holder_for(user):
+        return "Access denied", 403
+
+    try:
+        kind, relative, full = receipt_location(donation["receipt_path"])
+    except FileStoreError:
+        return "No receipt", 404
+    ext = relative.rsplit(".", 1)[-1]
+    return send_protected(kind, relative, full, download_name=f"{donation['application_no']}_receipt.{ext}",
+                          etag=donation["receipt_path"].split(".", 1)[0] if kind == "receipts" else None)
 
 
 # REVIEW DETAIL
@@ -470,12 +696,9 @@ def review_detail(application_no):
         flash("Access denied")
         return redirect(url_for("home"))
 
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM applications WHERE application_no=%s", (application_no,))
-    app_detail = cursor.fetchone()
-    cursor.close()
-    conn.close()
+    with db_cursor(dictionary=True) as cursor:
+        cursor.execute(f"SELECT {APPLICATION_DETAIL} FROM applications WHERE application_no=%s", (application_no,))
+        app_detail = cursor.fetchone()
     return render_template("review_detail.html", app=app_detail)
 
 
@@ -493,16 +716,18 @@ def approve_application(application_no):
     uniform = request.form["uniform"]
     total = request.form["total"]
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE applications SET status='Approved' WHERE application_no=%s", (application_no,))
-    cursor.execute("""
-        INSERT INTO students (application_no, class_name, section, fee, books, uniform, total)
-        VALUES (%s,%s,%s,%s,%s,%s,%s)
-    """, (application_no, class_name, section, fee, books, uniform, total))
-    conn.commit()
-    cursor.close()
-    conn.close()
+    try:
+        with db_cursor(commit=True) as cursor:
+            set_status(cursor, application_no, "Approved")
+            cursor.execute("""
+                INSERT INTO students (application_no, class_name, section, fee, books, uniform, total)
+                VALUES (%s,%s,%s,%s,%s,%s,%s)
+            """, (application_no, class_name, section, fee, books, uniform, total))
+            add_sponsored(cursor, total)
+    except StatsError as e:
+        flash(str(e), "danger")
+        return redirect(url_for("review"))
+    query_cache.invalidate(PENDING, APPROVED)
 
     flash("Application approved successfully!", "success")
     return redirect(url_for("review"))
@@ -517,22 +742,18 @@ def export_excel():
             flash("براہ کرم پہلے لاگ ان کریں", "warning")
             return redirect(url_for("login"))
 
-        conn = get_db_connection()
-        df = pd.read_sql("SELECT * FROM applications", conn)
-        conn.close()
-
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-            df.to_excel(writer, index=False, sheet_name="Applications")
-        output.seek(0)
-
-        return send_file(
-            output,
-            as_attachment=True,
-            download_name="applications.xlsx",
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-
+        # ?columns=application_no,student_name,... (blobs are never exportable)
+        # plus the /report filters
+        names = select_columns(request.args.get("columns", ""))
+        fmt = "csv" if request.args.get("format") == "csv" else "xlsx"
+        filters = _parse_filters(APPLICATIONS)
+        with db_cursor() as cursor:
+            filters.resolve(cursor)
+        query, params = applications_query(names, filters)
+        return export_response(query, params, "applications", fmt, sheet_name="Applications")
+
+    except ExportError as e:
+        return str(e), 400
     except Exception as e:
         # 🔥 Log error to terminal
         current_app.logger.error(f"Excel export failed: {e}")
@@ -540,7 +761,57 @@ def export_excel():
 
 
 # ---------------- Export to PDF ----------------
+# Rendered in a process pool and cached by filters + data version (pdf_reports.py)
+@app.route("/report/pdf")
+def report_pdf():
+    if not session.get("user") or session['user']['role'] != "admin":
+        flash("Access denied")
+        return redirect(url_for("home"))
 
+    values = _parse_filters(APPLICATIONS)
+    try:
+        with db_cursor() as cursor:
+            rows, version = pdf_reports.report_version(cursor, values)
+        key = pdf_reports.key("report", values.args, version)
+        path = pdf_reports.cached(key)
+        if path is None and rows > PDF_SYNC_ROWS:
+            # Too long to render inside the request
+            job_id = jobs.submit("pdf_report", {"kind": "report", "params": values.args, "key": key},
+                                 owner=session["user"].get("name"))
+            return redirect(url_for("job_status", job_id=job_id))
+        path = path or pdf_reports.render("report", values.args, key)
+    except (PdfReportError, JobError) as e:
+        flash(str(e), "danger")
+        return redirect(url_for("report", **values.args))
+    return send_file(path, mimetype=PDF_MIMETYPE, download_name="applications_report.pdf",
+                     etag=key, conditional=True)
+
+
+@app.route("/sponsorship/<application_no>.pdf")
+def sponsorship_sheet(application_no):
+    user = session.get("user")
+    if not user or user.get("role") not in ("admin", "donor"):
+        flash("Please login first", "warning")
+        return redirect(url_for("login"))
+
+    with db_cursor(dictionary=True) as cursor:
+        if user["role"] != "admin":
+            # Donors get the sheets of the students they sponsored
+            cursor.execute("SELECT 1 FROM donations WHERE application_no=%s AND name=%s LIMIT 1",
+                           (application_no, holder_for(user)))
+            if cursor.fetchone() is None:
+                return "Access denied", 403
+        version = pdf_reports.sheet_version(cursor, application_no)
+    if version is None:
+        return "Application not found", 404
+
+    key = pdf_reports.key("sheet", {"application_no": application_no}, version)
+    try:
+        path = pdf_reports.get("sheet", {"application_no": application_no}, key)
+    except PdfReportError as e:
+        return str(e), 500
+    return send_file(path, mimetype=PDF_MIMETYPE, download_name=f"{application_no}_sponsorship.pdf",
+                     etag=key, conditional=True)
 
 
 @app.route("/reject/<application_no>", methods=["POST"])
@@ -549,17 +820,101 @@ def reject_application(application_no):
         flash("Access denied")
         return redirect(url_for("home"))
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE applications SET status='Rejected' WHERE application_no=%s", (application_no,))
-    conn.commit()
-    cursor.close()
-    conn.close()
+    try:
+        with db_cursor(commit=True) as cursor:
+            set_status(cursor, application_no, "Rejected")
+    except StatsError as e:
+        flash(str(e), "danger")
+        return redirect(url_for("review"))
+    query_cache.invalidate(PENDING)
 
     flash("Application rejected!", "danger")
     return redirect(url_for("review"))
 
 
+# BULK APPROVE / REJECT
+@app.route("/review/bulk", methods=["POST"])
+def bulk_review():
+    # Form post from the review queue, or JSON:
+    # {"action": "approve", "application_nos": [...], "fee": ..., "section": ...}
+    wants_json = request.is_json
+    if not session.get("user") or session['user']['role'] != "admin":
+        if wants_json:
+            return jsonify({"error": "Access denied"}), 403
+        flash("Access denied")
+        return redirect(url_for("home"))
+
+    if wants_json:
+        data = request.get_json(silent=True) or {}
+        numbers = data.get("application_nos") or []
+    else:
+        data = request.form
+        numbers = request.form.getlist("application_no")
+    action = data.get("action")
+    try:
+        if action == "approve":
+            overrides = parse_overrides(data)
+            with db_cursor(dictionary=True, commit=True) as cursor:
+                result = approve_many(cursor, numbers, overrides)
+            done = result["approved"]
+        elif action == "reject":
+            with db_cursor(dictionary=True, commit=True) as cursor:
+                result = reject_many(cursor, numbers)
+            done = result["rejected"]
+        else:
+            raise BulkReviewError("Unknown action")
+    except BulkReviewError as e:
+        if wants_json:
+            return jsonify({"error": str(e)}), 400
+        flash(str(e), "danger")
+        return redirect(url_for("review"))
+
+    if done:
+        query_cache.invalidate(PENDING, APPROVED)
+    if wants_json:
+        return jsonify(result)
+
+    verb = "approved" if action == "approve" else "rejected"
+    flash(f"{len(done)} application(s) {verb}.", "success" if done else "warning")
+    for number, reason in list(result["skipped"].items())[:20]:
+        flash(f"{number}: skipped, {reason}", "warning")
+    if len(result["skipped"]) > 20:
+        flash(f"... and {len(result['skipped']) - 20} more skipped", "warning")
+    return redirect(url_for("review"))
+
+
+# CLASS FEE DEFAULTS (used by bulk approve)
+@app.route("/admin/class_defaults", methods=["GET", "POST"])
+def class_defaults():
+    if not session.get("user") or session['user']['role'] != "admin":
+        flash("Access denied")
+        return redirect(url_for("home"))
+
+    if request.method == "POST":
+        class_name = request.form.get("class_name", "").strip()
+        if not class_name:
+            flash("Class is required", "danger")
+        elif request.form.get("delete"):
+            with db_cursor(commit=True) as cursor:
+                delete_class_default(cursor, class_name)
+            flash(f"Defaults for {class_name} removed", "info")
+        else:
+            try:
+                values = parse_overrides(request.form)
+                with db_cursor(commit=True) as cursor:
+                    save_class_default(cursor, class_name, values.get("section"),
+                                       values.get("fee", 0), values.get("books", 0),
+                                       values.get("uniform", 0))
+                flash(f"Defaults for {class_name} saved", "success")
+            except BulkReviewError as e:
+                flash(str(e), "danger")
+        return redirect(url_for("class_defaults"))
+
+    with db_cursor(dictionary=True) as cursor:
+        rows = list_class_defaults(cursor)
+    return render_template("class_defaults.html", rows=rows)
+
+
 # REPORT WITH FILTERS
 @app.route("/report", methods=["GET", "POST"])
 def report():
@@ -567,43 +922,550 @@ def report():
         flash("Please login first", "warning")
         return redirect(url_for("login"))
 
-    status_filter = request.args.get("status", "All")
-    student_filter = request.args.get("student_filter", "").strip()
-    class_filter = request.args.get("class_filter", "").strip()
-    age_filter = request.args.get("age_filter", "").strip()
-    income_filter = request.args.get("income_filter", "").strip()
-
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-
-    query = "SELECT * FROM applications WHERE 1=1"
-    params = []
-
-    if status_filter != "All":
-        query += " AND status=%s"
-        params.append(status_filter)
-    if student_filter:
-        query += " AND student_name LIKE %s"
-        params.append(f"%{student_filter}%")
-    if class_filter:
-        query += " AND class LIKE %s"
-        params.append(f"%{class_filter}%")
-    if age_filter:
-        query += " AND age=%s"
-        params.append(age_filter)
-    if income_filter:
-        query += " AND father_income >= %s"
-        params.append(income_filter)
-
-    query += " ORDER BY created_at DESC"
-    cursor.execute(query, tuple(params))
-    applications = cursor.fetchall()
-    cursor.close()
-    conn.close()
-
-    return render_template("report.html", applications=applications, status_filter=status_filter)
+    filters = _parse_filters(APPLICATIONS)
+
+    page_args = _page_args()
+
+    def load():
+        with db_cursor(dictionary=True) as cursor:
+            query, params = APPLICATIONS.query(filters.resolve(cursor))
+            return list_page(cursor, query, params, page_args)
+
+    page = query_cache.get_or_set("report", filters.key + page_args, load, tags=(PENDING, APPROVED))
+
+    return render_template("report.html", applications=page.rows, page=page, filters=filters,
+                           status_filter=filters.get("status", "All"))
+
+
+# SEARCH
+@app.route("/search")
+def search():
+    if not session.get("user") or session['user']['role'] != "admin":
+        flash("Access denied")
+        return redirect(url_for("home"))
+
+    q = request.args.get("q", "").strip()
+    results = []
+    if q:
+        with db_cursor(dictionary=True) as cursor:
+            ranked = ranked_search(cursor, q, limit=SEARCH_LIMIT)
+            if ranked:
+                scores = {r["application_no"]: r["score"] for r in ranked}
+                placeholders = ",".join(["%s"] * len(scores))
+                cursor.execute(
+                    f"SELECT {APPLICATION_LIST} FROM applications WHERE application_no IN ({placeholders})",
+                    tuple(scores))
+                results = sorted(cursor.fetchall(), key=lambda r: -scores[r["application_no"]])
+
+    if request.args.get("format") == "json":
+        return jsonify([{k: r[k] for k in ("application_no", "student_name", "father_name", "mobile_no", "status")}
+                        for r in results])
+    return render_template("search.html", q=q, results=results)
+
+
+# SUMMARY STATS
+@app.route("/stats")
+def stats_json():
+    if not session.get("user") or session['user']['role'] != "admin":
+        return jsonify({"error": "Access denied"}), 403
+    with db_cursor(dictionary=True) as cursor:
+        return jsonify(read_stats(cursor))
+
+
+# PROMETHEUS METRICS
+@app.route("/metrics")
+def metrics():
+    if not instrumentation.authorized(session.get("user")):
+        return "Forbidden", 403
+    return Response(render_prometheus(instrumentation.collect()),
+                    mimetype="text/plain; version=0.0.4")
+
+
+# QUERY CACHE METRICS
+@app.route("/admin/cache")
+def cache_stats():
+    if not session.get("user") or session['user']['role'] != "admin":
+        return jsonify({"error": "Access denied"}), 403
+    return jsonify(dict(query_cache.stats(), fragments=fragment_cache.stats(), pdf=pdf_reports.stats()))
+
+
+# DB POOL METRICS
+@app.route("/admin/db_pool")
+def db_pool_stats():
+    if not session.get("user") or session['user']['role'] != "admin":
+        return jsonify({"error": "Access denied"}), 403
+    # Stats are per gunicorn worker; the pid tells you which one answered
+    return jsonify(get_pool().snapshot())
+
 
+# BACKGROUND EXPORT JOBS
+def _write_export(rows, out_path, fmt, sheet_name, check_cancelled):
+    try:
+        checked = with_checks(rows, check_cancelled)
+        if fmt == "csv":
+            with open(out_path, "w", encoding="utf-8", newline="") as f:
+                for chunk in iter_csv(checked):
+                    f.write(chunk)
+        else:
+            write_xlsx(checked, out_path, sheet_name)
+    finally:
+        rows.close()
+    return {
+        "filename": f"{sheet_name.lower()}.{fmt}",
+        "mimetype": "text/csv" if fmt == "csv" else XLSX_MIMETYPE,
+    }
+
+
+@job_kind("applications_export")
+def applications_export_job(params, out_path, check_cancelled):
+    names = select_columns(params.get("columns", ""))
+    filters, _ = APPLICATIONS.parse(params)
+    with db_cursor() as cursor:
+        filters.resolve(cursor)
+    rows = iter_rows(*applications_query(names, filters))
+    return _write_export(rows, out_path, params.get("format", "xlsx"), "Applications", check_cancelled)
+
+
+@job_kind("donor_assignments_export")
+def donor_assignments_export_job(params, out_path, check_cancelled):
+    filters, _ = DONATIONS.parse(params)
+    with db_cursor() as cursor:
+        filters.resolve(cursor)
+    rows = iter_rows(*DONATIONS.query(filters, order_by="d.created_at DESC"))
+    return _write_export(rows, out_path, params.get("format", "xlsx"), "Donor_Assignments", check_cancelled)
+
+
+# Sheets for applications_import are staged in JOBS_DIR as <hex>.upload<ext>
+IMPORT_UPLOAD_RE = re.compile(r"^[0-9a-f]{32}\.upload\.(csv|xlsx)$")
+
+def import_upload_path(ext):
+    os.makedirs(jobs.JOBS_DIR, exist_ok=True)
+    return os.path.join(jobs.JOBS_DIR, f"{uuid.uuid4().hex}.upload{ext}")
+
+def is_import_upload(path):
+    # Only files import_upload_path() made; the job deletes what it is given
+    path = os.path.realpath(path or "")
+    return (os.path.dirname(path) == os.path.realpath(jobs.JOBS_DIR)
+            and bool(IMPORT_UPLOAD_RE.match(os.path.basename(path))))
+
+
+@job_kind("applications_import")
+def applications_import_job(params, out_path, check_cancelled):
+    path = params.get("path")
+    if not is_import_upload(path):
+        raise JobError(f"Not a staged import upload: {path!r}")
+    try:
+        summary = import_file(path, out_path, check_cancelled)
+    finally:
+        os.remove(path)
+        # Batches commit as they go, so even a failed import may have added rows
+        query_cache.invalidate(PENDING)
+    summary.update(filename="import_errors.csv", mimetype="text/csv")
+    return summary
+
+
+@job_kind("duplicates_report")
+def duplicates_report_job(params, out_path, check_cancelled):
+    with db_cursor(dictionary=True) as cursor:
+        summary = write_duplicates_report(cursor, out_path, check_cancelled)
+    summary.update(filename="duplicates.csv", mimetype="text/csv")
+    return summary
+
+
+@job_kind("pdf_report")
+def pdf_report_job(params, out_path, check_cancelled):
+    path = pdf_reports.get(params["kind"], params["params"], params["key"], check_cancelled)
+    shutil.copyfile(path, out_path)
+    return {"filename": "applications_report.pdf", "mimetype": PDF_MIMETYPE}
+
+
+# BACKGROUND UPLOAD PROCESSING
+def process_later(kind, params):
+    # The upload is already stored; a failed submit only delays the tidy-up
+    try:
+        jobs.submit(kind, params)
+    except Exception as e:
+        app.logger.warning(f"Could not queue {kind} job: {e}")
+
+
+@job_kind("image_derivatives", queue="uploads")
+def image_derivatives_job(params, out_path, check_cancelled):
+    return {"written": get_image_store().ensure_derivatives(params["key"])}
+
+
+@job_kind("receipt_normalize", queue="uploads")
+def receipt_normalize_job(params, out_path, check_cancelled):
+    # Store the re-encoded receipt as a new key and point every donation
+    # holding the upload's key at it; the original stays, so a later upload
+    # of the same bytes still dedupes onto it (and is normalized to the same
+    # key again)
+    store = get_receipt_store()
+    key = params["key"]
+    staged = normalize_receipt(store.path(key))
+    if staged is None:
+        return {"key": key, "changed": False}
+    new_key = store.put_file(staged.path, staged.ext, staged.sha256)
+    if new_key == key:
+        return {"key": key, "changed": False}
+    with db_cursor(commit=True) as cursor:
+        cursor.execute("UPDATE donations SET receipt_path=%s WHERE receipt_path=%s", (new_key, key))
+        updated = cursor.rowcount
+    return {"key": new_key, "replaced": key, "donations": updated, "changed": True}
+
+
+def _job_for_admin(job_id):
+    if not session.get("user") or session['user']['role'] != "admin":
+        return None
+    return jobs.get(job_id)
+
+
+# The only kinds /jobs/export may queue; the others take params that the
+# routes queueing them build and check themselves
+EXPORT_JOB_KINDS = ("applications_export", "donor_assignments_export")
+
+@app.route("/jobs/export", methods=["POST"])
+def submit_export_job():
+    if not session.get("user") or session['user']['role'] != "admin":
+        flash("Access denied")
+        return redirect(url_for("home"))
+
+    kind = request.form.get("kind", "applications_export")
+    if kind not in EXPORT_JOB_KINDS:
+        flash("Unknown export", "danger")
+        return redirect(request.referrer or url_for("report"))
+    params = {k: v.strip() for k, v in request.form.items() if k != "kind"}
+    params["format"] = "csv" if params.get("format") == "csv" else "xlsx"
+    try:
+        if kind == "applications_export":
+            select_columns(params.get("columns", ""))
+        spec = APPLICATIONS if kind == "applications_export" else DONATIONS
+        errors = spec.parse(params)[1]
+        if errors:
+            raise ExportError("; ".join(errors))
+        job_id = jobs.submit(kind, params, owner=session["user"].get("name"))
+    except (ExportError, JobError) as e:
+        flash(str(e), "danger")
+        return redirect(request.referrer or url_for("report"))
+    return redirect(url_for("job_status", job_id=job_id))
+
+
+# DUPLICATE REVIEW REPORT
+@app.route("/duplicates/report", methods=["POST"])
+def duplicates_report():
+    if not session.get("user") or session['user']['role'] != "admin":
+        flash("Access denied")
+        return redirect(url_for("home"))
+    job_id = jobs.submit("duplicates_report", {}, owner=session["user"].get("name"))
+    return redirect(url_for("job_status", job_id=job_id))
+
+
+# BULK IMPORT
+@app.route("/import", methods=["GET", "POST"])
+def import_applications():
+    if not session.get("user") or session['user']['role'] != "admin":
+        flash("Access denied")
+        return redirect(url_for("home"))
+
+    if request.method == "POST":
+        upload = request.files.get("sheet")
+        ext = os.path.splitext(upload.filename)[1].lower() if upload and upload.filename else ""
+        if ext not in IMPORT_EXTENSIONS:
+            flash("Please choose a .csv or .xlsx file", "danger")
+            return redirect(url_for("import_applications"))
+
+        path = import_upload_path(ext)
+        upload.save(path)
+        job_id = jobs.submit("applications_import", {"path": path, "filename": upload.filename},
+                             owner=session["user"].get("name"))
+        return redirect(url_for("job_status", job_id=job_id))
+
+    return render_template("import.html", columns=IMPORT_COLUMNS)
+
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    job = _job_for_admin(job_id)
+    if job is None:
+        return "Job not found", 404
+    if request.args.get("format") == "json":
+        return jsonify({
+            "id": job["id"],
+            "kind": job["kind"],
+            "status": job["status"],
+            "created_at": job["created_at"],
+            "started_at": job["started_at"],
+            "finished_at": job["finished_at"],
+            "error": (job["error"] or "").split("\n", 1)[0] or None,
+            "result": job["result"],
+            "download_url": url_for("job_download", job_id=job_id) if job["status"] == jobs.DONE else None,
+        })
+    return render_template("job_status.html", job=job)
+
+
+@app.route("/jobs/<job_id>/download")
+def job_download(job_id):
+    job = _job_for_admin(job_id)
+    if job is None or job["status"] != jobs.DONE:
+        return "Job not found or not finished", 404
+    path = jobs.output_path(job_id)
+    if not os.path.exists(path):
+        return "Job output has expired", 410
+    return send_file(os.path.abspath(path), as_attachment=True,
+                     download_name=job["result"]["filename"],
+                     mimetype=job["result"]["mimetype"])
+
+
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+def job_cancel(job_id):
+    if _job_for_admin(job_id) is None:
+        return "Job not found", 404
+    jobs.cancel(job_id)
+    flash("Cancellation requested", "info")
+    return redirect(url_for("job_status", job_id=job_id))
+
+
+# ==== CLI ====
+@app.cli.command("migrate")
+def migrate_command():
+    """Apply pending SQL files from migrations/."""
+    with db_connection() as conn:
+        applied = apply_migrations(conn)
+    print(f"{len(applied)} migration(s) applied")
+
+
+@app.cli.command("migrate-images")
+@click.option("--batch-size", default=50, show_default=True)
+@click.option("--keep-blobs", is_flag=True, help="Leave applications.picture in place.")
+def migrate_images_command(batch_size, keep_blobs):
+    """Move picture LONGBLOBs into the image store."""
+    store = get_image_store()
+    moved = failed = 0
+    last_id = 0
+    while True:
+        with db_cursor() as cursor:
+            cursor.execute("""
+                SELECT id FROM applications
+                WHERE id > %s AND picture IS NOT NULL AND picture_key IS NULL
+                ORDER BY id LIMIT %s
+            """, (last_id, batch_size))
+            ids = [r[0] for r in cursor.fetchall()]
+        if not ids:
+            break
+        last_id = ids[-1]
+
+        # One blob in memory at a time
+        for app_id in ids:
+            with db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT application_no, picture FROM applications WHERE id=%s", (app_id,))
+                application_no, data = cursor.fetchone()
+                try:
+                    key = store.put(data)
+                except ImageStoreError as e:
+                    failed += 1
+                    print(f"{application_no}: skipped ({e})")
+                    cursor.close()
+                    continue
+                if keep_blobs:
+                    cursor.execute("UPDATE applications SET picture_key=%s WHERE id=%s", (key, app_id))
+                else:
+                    cursor.execute("UPDATE applications SET picture_key=%s, picture=NULL WHERE id=%s", (key, app_id))
+                conn.commit()
+                cursor.close()
+                moved += 1
+        print(f"... {moved} moved")
+    print(f"Done: {moved} moved, {failed} skipped")
+
+
+# Representative first-page queries for `flask check-plans`, in the exact
+# shape list_page() sends them (ORDER BY created_at DESC, id DESC LIMIT n+1)
+def _first_page(query_and_params, keys=APPLICATION_PAGE_KEYS):
+    query, params = query_and_params
+    return page_query(query, params, keys)[:2]
+
+def _filtered(spec, **args):
+    return spec.query(spec.parse(args)[0])
+
+PLAN_CHECKS = [
+    ("status_report (own applications)",
+     _first_page(_filtered(APPLICATIONS, mobile="03000000000")), {}),
+    ("status_report (own, by status)",
+     _first_page(_filtered(APPLICATIONS, mobile="03000000000", status="Pending")), {}),
+    ("report (all)",
+     _first_page(_filtered(APPLICATIONS)), {}),
+    ("report (by status)",
+     _first_page(_filtered(APPLICATIONS, status="Approved")), {}),
+    ("report (by age)",
+     _first_page(_filtered(APPLICATIONS, age="10")), {}),
+    ("report (income >=)",
+     _first_page(_filtered(APPLICATIONS, min_income="20000")), {"allow_filesort": True}),
+    ("report (student name, prefix match)",
+     _first_page((f"SELECT {APPLICATION_LIST} FROM applications WHERE student_name LIKE %s",
+                  [like_pattern("Ali", "prefix")])), {"allow_filesort": True}),
+    ("review (pending)",
+     _first_page((f"SELECT {APPLICATION_LIST} FROM applications WHERE status='Pending'", [])), {}),
+    ("donor_assignments (all)",
+     _first_page(_filtered(DONATIONS), DONATION_PAGE_KEYS), {"allow_scan": ("u",)}),
+]
+
+
+@app.cli.command("migrate-receipts")
+def migrate_receipts_command():
+    """Move receipts from static/receipts into the hashed receipt store."""
+    store = get_receipt_store()
+    moved, missing = [], 0
+    with db_cursor(dictionary=True) as cursor:
+        cursor.execute("SELECT id, receipt_path FROM donations WHERE receipt_path IS NOT NULL")
+        donations = [d for d in cursor.fetchall() if not is_key(d["receipt_path"])]
+    for donation in donations:
+        try:
+            _, _, path = receipt_location(donation["receipt_path"])
+            with open(path, "rb") as f:
+                ext = sniff_type(f.read(16))[1] or "bin"
+            key = store.copy_in(path, ext)
+        except (FileStoreError, OSError) as e:
+            print(f"skip donation {donation['id']}: {e}")
+            missing += 1
+            continue
+        with db_cursor(commit=True) as cursor:
+            cursor.execute("UPDATE donations SET receipt_path=%s WHERE id=%s", (key, donation["id"]))
+        moved.append(path)
+    # Several donations may share one legacy file: remove originals only now
+    for path in set(moved):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    print(f"Done: {len(moved)} receipts moved, {missing} skipped")
+
+
+@app.cli.command("reindex-search")
+@click.option("--batch-size", default=500, show_default=True)
+def reindex_search_command(batch_size):
+    """Rebuild application_search from applications."""
+    last_id = 0
+    done = 0
+    while True:
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id, application_no, student_name, father_name, father_cnic, mobile_no
+                FROM applications WHERE id > %s AND application_no IS NOT NULL
+                ORDER BY id LIMIT %s
+            """, (last_id, batch_size))
+            rows = cursor.fetchall()
+            for row in rows:
+                index_application(cursor, *row[1:])
+            conn.commit()
+            cursor.close()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        done += len(rows)
+        print(f"... {done} indexed")
+    print(f"Done: {done} applications indexed")
+
+
+@app.cli.command("reindex-duplicates")
+@click.option("--batch-size", default=500, show_default=True)
+def reindex_duplicates_command(batch_size):
+    """Rebuild application_dup_keys from applications."""
+    last_id = 0
+    done = 0
+    while True:
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id, application_no, student_name, dob, father_cnic, mobile_no
+                FROM applications WHERE id > %s AND application_no IS NOT NULL
+                ORDER BY id LIMIT %s
+            """, (last_id, batch_size))
+            rows = cursor.fetchall()
+            index_duplicates(cursor, [row[1:] for row in rows], replace=True)
+            conn.commit()
+            cursor.close()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        done += len(rows)
+        print(f"... {done} indexed")
+    print(f"Done: {done} applications indexed")
+
+
+@app.cli.command("sweep-holds")
+def sweep_holds_command():
+    """Clear expired donor holds (run from cron during donation drives)."""
+    with db_cursor(commit=True) as cursor:
+        cleared = sweep_holds(cursor)
+    if cleared:
+        query_cache.invalidate(APPROVED)
+    print(f"Done: {cleared} expired holds cleared")
+
+
+@app.cli.command("rebuild-stats")
+def rebuild_stats_command():
+    """Recompute app_stats and donation_daily from the source tables."""
+    with db_cursor(commit=True) as cursor:
+        rebuild_stats(cursor)
+    with db_cursor(dictionary=True) as cursor:
+        summary = read_stats(cursor)
+    print(f"Done: {summary['applications']} applications, {summary['by_status']}")
+
+
+@app.cli.command("check-plans")
+def check_plans_command():
+    """EXPLAIN the list-route queries; exit 1 if one regressed to a full scan."""
+    failed = 0
+    with db_cursor() as cursor:
+        for name, (query, params), options in PLAN_CHECKS:
+            plan = explain(cursor, query, params)
+            problems = plan_problems(plan, **options)
+            print(f"{'FAIL' if problems else 'ok  '} {name}")
+            if problems:
+                failed += 1
+                print(format_plan(plan))
+                for problem in problems:
+                    print(f"    -> {problem}")
+    if failed:
+        raise SystemExit(1)
+
+
+@app.cli.command("compile-templates")
+def compile_templates_command():
+    """Compile every template into the bytecode cache (JINJA_CACHE_DIR)."""
+    names = app.jinja_env.list_templates()
+    for name in names:
+        app.jinja_env.get_template(name)
+    print(f"Done: {len(names)} templates compiled")
+
+
+@app.cli.command("vendor-bootstrap")
+def vendor_bootstrap_command():
+    """Download bootstrap into static/vendor/ for BOOTSTRAP_SOURCE=local."""
+    try:
+        path = vendor_bootstrap(app.static_folder)
+    except (OSError, TemplatingError) as e:
+        raise click.ClickException(str(e))
+    print(f"Done: {path}")
+
+
+# ==== WSGI ====
+# Imported by the routes that use them, not at module load
+WARM_IMPORTS = ("openpyxl",)
+
+def create_app(warm=False):
+    # gunicorn entry point (gunicorn.conf.py). Importing this module opens no
+    # connections, starts no threads and creates no directories: the DB pool,
+    # cache files, job runner and PDF pool are made per process on first use.
+    # warm=True (preload_app) imports the lazy modules and compiles every
+    # template once in the master, so the forked workers share them.
+    if warm:
+        for name in WARM_IMPORTS:
+            importlib.import_module(name)
+        for name in app.jinja_env.list_templates():
+            app.jinja_env.get_template(name)
+    return app
 
 # ==== MAIN ====
 if __name__ == "__main__":
-    app.run(debug=True, port=5001)
+    create_app().run(debug=True, port=5001)
@@ -29,18 +29,18 @@ git reset --hard origin/main
 echo "⬆️ Upgrading pip, setuptools, and wheel..."
 $VENV/pip install --upgrade pip setuptools wheel
 
-# Reinstall numpy and pandas cleanly
-echo "🔄 Reinstalling numpy and pandas..."
-$VENV/pip uninstall -y numpy pandas
-$VENV/pip install numpy pandas
+# pandas is no longer used; openpyxl imports numpy whenever it is installed,
+# which slows every worker start
+echo "🧹 Removing numpy and pandas..."
+$VENV/pip uninstall -y numpy pandas || true
 
 # Clear any compiled caches
 echo "🧹 Clearing Python bytecode caches..."
 find . -name "*.pyc" -delete
 find . -name "__pycache__" -type d -exec rm -rf {} +
 
-# Install the rest of the requirements without touching numpy/pandas
-echo "📦 Installing remaining requirements..."
+# Install the requirements
+echo "📦 Installing requirements..."
 $VENV/pip install --upgrade --no-deps -r requirements.txt
 
 # Set permissions
@@ -52,6 +52,6 @@ chmod -R 775 $APP_DIR/static/receipts
 
 # Start Gunicorn manually (instead of systemctl) in background
 echo "🚀 Starting Gunicorn..."
-$VENV/gunicorn -w 4 -b 127.0.0.1:8000 app:app &
+$VENV/gunicorn -c gunicorn.conf.py --bind 127.0.0.1:8000 &
 
 echo "✅ Update completed successfully!"
@@ -0,0 +1,12 @@
+"""
+Benchmark harness for the afaqschool app.
+
+    python -m bench.seed --applications 5000           # seed a local MySQL/MariaDB
+    python -m bench.seed --sqlite var/bench.db ...      # or a SQLite file for donor_api.py
+    python -m bench.run --base-url http://127.0.0.1:5001 --duration 60 --out before.json
+    python -m bench.compare before.json after.json
+    python -m bench.startup --runs 10 --out startup.json   # import / cold-start times
+
+seed writes a manifest (application numbers, mobiles, search terms) that run
+uses to build realistic URLs; see each module for its options.
+"""
@@ -0,0 +1,53 @@
+"""
+Compare two bench.run results route by route:
+
+    python -m bench.compare before.json after.json
+
+Prints requests/s and p50/p95/p99 for both runs with the change in percent
+(negative latency change = faster). Routes present in only one run are listed
+with "-" for the other.
+"""
+import argparse
+import json
+
+COLUMNS = ("rps", "p50_ms", "p95_ms", "p99_ms")
+
+
+def _change(before, after):
+    if before in (None, 0) or after is None:
+        return "-"
+    return f"{(after - before) / before * 100:+.0f}%"
+
+
+def compare(before, after):
+    rows = []
+    for route in sorted(set(before["routes"]) | set(after["routes"])):
+        a = before["routes"].get(route, {})
+        b = after["routes"].get(route, {})
+        rows.append((route, [(a.get(c), b.get(c), _change(a.get(c), b.get(c))) for c in COLUMNS]))
+    rows.append(("TOTAL", [(before["total"].get(c), after["total"].get(c),
+                            _change(before["total"].get(c), after["total"].get(c))) for c in COLUMNS]))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args(argv)
+    with open(args.before, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(args.after, encoding="utf-8") as f:
+        after = json.load(f)
+
+    print(f"before: {before['meta'].get('commit')} {before['meta'].get('timestamp')}")
+    print(f"after:  {after['meta'].get('commit')} {after['meta'].get('timestamp')}")
+    header = "".join(f"{c:>26}" for c in COLUMNS)
+    print(f"{'route':44}{header}")
+    for route, cells in compare(before, after):
+        text = "".join(f"{f'{x!s} -> {y!s} ({d})':>26}" for x, y, d in cells)
+        print(f"{route[:44]:44}{text}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Synthetic applicants for bench.seed: names (Roman and Urdu script), CNICs,
+mobiles, dates of birth consistent with age, incomes, and camera-like photos.
+
+Everything is drawn from one random.Random(seed), so the same seed gives the
+same data set.
+"""
+import random
+from datetime import date, timedelta
+from io import BytesIO
+
+from PIL import Image, ImageDraw, ImageFilter
+
+FIRST_NAMES = (
+    "Muhammad", "Ahmed", "Ali", "Hassan", "Hussain", "Usman", "Bilal", "Hamza",
+    "Abdullah", "Zain", "Fatima", "Ayesha", "Zainab", "Maryam", "Khadija", "Hira",
+    "Sana", "Iqra", "Noor", "Amna", "محمد", "احمد", "علی", "فاطمہ", "عائشہ", "زینب",
+)
+LAST_NAMES = (
+    "Khan", "Ahmed", "Iqbal", "Nadeem", "Raza", "Shah", "Butt", "Malik", "Chaudhry",
+    "Qureshi", "Sheikh", "Javed", "Aslam", "خان", "رضا", "ملک",
+)
+CLASSES = ("Nursery", "Prep", "1", "2", "3", "4", "5", "6", "7", "8", "9th", "10th")
+SCHOOLS = ("Govt Primary School", "Govt High School", "Private", "None")
+
+
+def person_name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def cnic(rng):
+    digits = f"{rng.randrange(10**12, 10**13)}"
+    return f"{digits[:5]}-{digits[5:12]}-{digits[12]}"
+
+
+def mobile(rng):
+    return f"03{rng.randrange(0, 10**9):09d}"
+
+
+def application_fields(rng, today=None):
+    # Same shape as imports.validate() output: fields after application_no
+    today = today or date.today()
+    age = rng.randint(4, 16)
+    dob = today - timedelta(days=age * 365 + rng.randint(0, 364))
+    class_name = CLASSES[min(max(age - 4, 0), len(CLASSES) - 1)]
+    return (
+        person_name(rng), person_name(rng), dob, age, class_name, rng.choice(SCHOOLS),
+        cnic(rng), mobile(rng),
+        rng.choice((15000, 20000, 25000, 30000, 40000, 60000)),
+        "Yes" if rng.random() < 0.15 else "No",
+        rng.choice((0, 0, 50000, 150000, 400000)),
+        rng.choice((25, 50, 75, 100)),
+        None,
+    )
+
+
+def photo(rng, width=960, height=1280, quality=85):
+    # A noisy, blurred "portrait": compresses like a phone photo (~100-300 KB)
+    small = (width // 4, height // 4)
+    img = Image.frombytes("RGB", small, rng.randbytes(small[0] * small[1] * 3))
+    img = img.resize((width, height))
+    draw = ImageDraw.Draw(img)
+    for _ in range(12):
+        x, y = rng.randrange(width), rng.randrange(height)
+        r = rng.randint(40, 240)
+        draw.ellipse((x - r, y - r, x + r, y + r),
+                     fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    img = img.filter(ImageFilter.GaussianBlur(1.2))
+    out = BytesIO()
+    img.save(out, format="JPEG", quality=quality)
+    return out.getvalue()
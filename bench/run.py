@@ -0,0 +1,428 @@
+"""
+Drive scripted admin / donor / registrar sessions against a running app and
+report throughput and latency percentiles per route.
+
+    python -m bench.run --base-url http://127.0.0.1:5001 --duration 60 \\
+        --concurrency 8 --mix admin=2,donor=5,registrar=3 --out before.json
+
+Each worker thread logs in once through the login form (the same as a browser),
+keeps its session cookie and connection, and then loops over its role's flow
+with application numbers, mobiles and search terms from the seed manifest.
+Redirects are not followed: a 302 to the login page is counted as an error.
+
+--api-url adds an "api" role against donor_api.py; its session cookie is
+signed with settings.SECRET_KEY, so the two must match.
+
+Only GETs by default; --write adds registrations (POST /new_registration)
+to the registrar flow, which changes the seeded data.
+
+Results are keyed by route template ("/donor/view/<application_no>"), with
+count, errors, requests/s and p50/p95/p99/max in milliseconds, plus the
+run's settings and git commit so two runs can be compared (bench.compare).
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlencode, urlsplit
+
+from bench.data import application_fields, photo
+
+ADMIN_PASSWORD = os.environ.get("BENCH_ADMIN_PASSWORD", "admin12345")
+DEFAULT_MIX = "admin=2,donor=5,registrar=3"
+
+
+# ==== HTTP ====
+class Client:
+    # One keep-alive connection and a cookie jar of one cookie
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        self.https = parts.scheme == "https"
+        self.host = parts.netloc
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.cookie = None
+        self.conn = None
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        self.conn = cls(self.host, timeout=self.timeout)
+
+    def request(self, method, path, body=None, headers=None):
+        # -> (status, body bytes); reconnects once if the server closed the socket
+        headers = dict(headers or {})
+        if self.cookie:
+            headers["Cookie"] = self.cookie
+        for attempt in range(2):
+            if self.conn is None:
+                self._connect()
+            try:
+                self.conn.request(method, self.prefix + path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+        cookie = response.getheader("Set-Cookie")
+        if cookie and cookie.startswith("session="):
+            self.cookie = cookie.split(";", 1)[0]
+        if response.getheader("Connection", "").lower() == "close":
+            self.conn.close()
+            self.conn = None
+        return response.status, data
+
+    def post_form(self, path, fields):
+        return self.request("POST", path, urlencode(fields),
+                            {"Content-Type": "application/x-www-form-urlencoded"})
+
+    def post_multipart(self, path, fields, files):
+        boundary = f"bench{random.getrandbits(64):x}"
+        parts = []
+        for name, value in fields.items():
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'
+                         f"{value}\r\n".encode("utf-8"))
+        for name, (filename, data, mimetype) in files.items():
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; '
+                         f'filename="{filename}"\r\nContent-Type: {mimetype}\r\n\r\n'.encode("utf-8")
+                         + data + b"\r\n")
+        parts.append(f"--{boundary}--\r\n".encode("utf-8"))
+        return self.request("POST", path, b"".join(parts),
+                            {"Content-Type": f"multipart/form-data; boundary={boundary}"})
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+
+# ==== FLOWS ====
+# Each flow is a list of (weight, route template, function(rng, manifest) -> request)
+# where a request is (method, path) or (method, path, kind, payload)
+def _pick(rng, manifest, key):
+    values = manifest.get(key) or manifest.get("approved") or ["APP-0001"]
+    return rng.choice(values)
+
+
+ADMIN_FLOW = [
+    (2, "/home", lambda rng, m: ("GET", "/home")),
+    (4, "/review", lambda rng, m: ("GET", "/review")),
+    (2, "/review/<application_no>", lambda rng, m: ("GET", f"/review/{_pick(rng, m, 'pending')}")),
+    (2, "/status_report", lambda rng, m: ("GET", "/status_report?" + urlencode(
+        {"status": rng.choice(("All", "Pending", "Approved"))}))),
+    (2, "/report", lambda rng, m: ("GET", "/report?" + urlencode(
+        {"status": rng.choice(("All", "Approved")), "income_filter": rng.choice(("", "20000"))}))),
+    (3, "/image/<application_no>?size=thumb",
+     lambda rng, m: ("GET", f"/image/{_pick(rng, m, 'pending')}?size=thumb")),
+    (2, "/search", lambda rng, m: ("GET", "/search?" + urlencode({"q": _pick(rng, m, "search_terms")}))),
+    (1, "/stats", lambda rng, m: ("GET", "/stats")),
+    (1, "/export_excel?format=csv", lambda rng, m: ("GET", "/export_excel?format=csv")),
+]
+
+DONOR_FLOW = [
+    (5, "/donor", lambda rng, m: ("GET", "/donor")),
+    (4, "/donor/view/<application_no>", lambda rng, m: ("GET", f"/donor/view/{_pick(rng, m, 'approved')}")),
+    (4, "/image/<application_no>?size=medium",
+     lambda rng, m: ("GET", f"/image/{_pick(rng, m, 'approved')}?size=medium")),
+]
+
+REGISTRAR_FLOW = [
+    (5, "/status_report", lambda rng, m: ("GET", "/status_report")),
+    (2, "/home", lambda rng, m: ("GET", "/home")),
+    (2, "/new_registration", lambda rng, m: ("GET", "/new_registration")),
+]
+
+
+def _registration(rng, manifest, mobile):
+    fields = application_fields(rng)
+    form = {
+        "student_name": fields[0], "father_name": fields[1], "dob": fields[2].isoformat(),
+        "age": fields[3], "class": fields[4], "sabika_school": fields[5], "father_cnic": fields[6],
+        "mobile_no": mobile, "father_income": fields[8], "is_orphan": fields[9],
+        "loss_flood": fields[10], "donation_percentage": fields[11],
+    }
+    return ("POST", "/new_registration", "multipart",
+            (form, {"picture": ("photo.jpg", rng.choice(manifest["_photos"]), "image/jpeg")}))
+
+
+API_FLOW = [
+    (5, "/api/donor/applications", lambda rng, m: ("GET", "/api/donor/applications")),
+    (4, "/api/donor/applications/<application_no>",
+     lambda rng, m: ("GET", f"/api/donor/applications/{_pick(rng, m, 'approved')}")),
+    (2, "/api/donor/applications/<application_no>/image",
+     lambda rng, m: ("GET", f"/api/donor/applications/{_pick(rng, m, 'approved')}/image")),
+]
+
+
+def login(client, role, rng, manifest):
+    if role == "admin":
+        fields = {"role": "admin", "name": "Bench Admin", "password": ADMIN_PASSWORD}
+    elif role == "donor":
+        fields = {"role": "donor", "name": "Bench Donor", "mobile": "03001234567"}
+    else:
+        fields = {"role": "applicant", "name": "Bench Registrar", "mobile": _pick(rng, manifest, "mobiles")}
+    status, _ = client.post_form("/", fields)
+    if status != 302 or not client.cookie:
+        raise RuntimeError(f"{role} login failed with HTTP {status}")
+
+
+def api_cookie():
+    # A Flask session cookie for donor_api.py (same signer as the Flask app)
+    from flask import Flask
+    from flask.sessions import SecureCookieSessionInterface
+    from settings import SECRET_KEY
+
+    app = Flask("bench")
+    app.secret_key = SECRET_KEY
+    serializer = SecureCookieSessionInterface().get_signing_serializer(app)
+    token = serializer.dumps({"user": {"role": "donor", "name": "Bench Donor", "mobile": "03001234567"}})
+    return f"session={token}"
+
+
+# ==== RECORDING ====
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}          # route -> [seconds, ...]
+        self.errors = {}           # route -> {status: count}
+        self.bytes = {}
+
+    def add(self, route, seconds, status, size, ok):
+        with self._lock:
+            self.samples.setdefault(route, []).append(seconds)
+            self.bytes[route] = self.bytes.get(route, 0) + size
+            if not ok:
+                per_route = self.errors.setdefault(route, {})
+                per_route[str(status)] = per_route.get(str(status), 0) + 1
+
+
+def percentile(sorted_values, fraction):
+    # Nearest-rank on an already sorted list
+    if not sorted_values:
+        return None
+    rank = max(int(round(fraction * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(samples, errors, sizes, seconds):
+    routes = {}
+    for route in sorted(samples):
+        values = sorted(samples[route])
+        ms = [v * 1000 for v in values]
+        routes[route] = {
+            "count": len(values),
+            "errors": sum(errors.get(route, {}).values()),
+            "error_statuses": errors.get(route, {}),
+            "rps": round(len(values) / seconds, 2) if seconds else None,
+            "mean_ms": round(sum(ms) / len(ms), 2),
+            "p50_ms": round(percentile(ms, 0.50), 2),
+            "p95_ms": round(percentile(ms, 0.95), 2),
+            "p99_ms": round(percentile(ms, 0.99), 2),
+            "max_ms": round(ms[-1], 2),
+            "bytes": sizes.get(route, 0),
+        }
+    everything = sorted(v * 1000 for values in samples.values() for v in values)
+    total = {
+        "count": len(everything),
+        "errors": sum(sum(e.values()) for e in errors.values()),
+        "rps": round(len(everything) / seconds, 2) if seconds else None,
+        "p50_ms": round(percentile(everything, 0.50), 2) if everything else None,
+        "p95_ms": round(percentile(everything, 0.95), 2) if everything else None,
+        "p99_ms": round(percentile(everything, 0.99), 2) if everything else None,
+    }
+    return routes, total
+
+
+# ==== RUNNING ====
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        role, _, weight = part.partition("=")
+        role = role.strip()
+        if role not in ("admin", "donor", "registrar", "api"):
+            raise SystemExit(f"Unknown role in --mix: {role}")
+        mix[role] = int(weight or 1)
+    return mix
+
+
+def flow_for(role, write):
+    if role == "admin":
+        return ADMIN_FLOW
+    if role == "donor":
+        return DONOR_FLOW
+    if role == "api":
+        return API_FLOW
+    if write:
+        return REGISTRAR_FLOW + [(1, "POST /new_registration", None)]
+    return REGISTRAR_FLOW
+
+
+def worker(index, role, args, manifest, recorder, stop_at, warm_until, counter):
+    rng = random.Random(args.seed * 1000 + index)
+    base = args.api_url if role == "api" else args.base_url
+    client = Client(base, timeout=args.timeout)
+    if role == "api":
+        client.cookie = manifest["_api_cookie"]
+    else:
+        login(client, role, rng, manifest)
+    mobile = None
+    if role == "registrar":
+        mobile = _pick(rng, manifest, "mobiles")
+
+    steps = flow_for(role, args.write)
+    weights = [weight for weight, _, _ in steps]
+    try:
+        while True:
+            now = time.perf_counter()
+            if stop_at and now >= stop_at:
+                break
+            if args.iterations and counter.take() is None:
+                break
+            _, route, build = rng.choices(steps, weights)[0]
+            spec = build(rng, manifest) if build else _registration(rng, manifest, mobile)
+            started = time.perf_counter()
+            if len(spec) == 2:
+                status, body = client.request(*spec)
+            else:
+                form, files = spec[3]
+                status, body = client.post_multipart(spec[1], form, files)
+            elapsed = time.perf_counter() - started
+            # Registration redirects to the status page on success
+            ok = status < 400 and (status != 302 or spec[0] == "POST")
+            if started >= warm_until:
+                recorder.add(route, elapsed, status, len(body), ok)
+    finally:
+        client.close()
+
+
+class Counter:
+    # Shared request budget for --iterations
+    def __init__(self, total):
+        self._lock = threading.Lock()
+        self.left = total
+
+    def take(self):
+        with self._lock:
+            if self.left <= 0:
+                return None
+            self.left -= 1
+            return self.left
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    manifest = {}
+    if os.path.exists(args.manifest):
+        with open(args.manifest, encoding="utf-8") as f:
+            manifest = json.load(f)
+    mix = parse_mix(args.mix)
+    if "api" in mix:
+        if not args.api_url:
+            raise SystemExit("--mix includes api but --api-url is not set")
+        manifest["_api_cookie"] = api_cookie()
+    if args.write:
+        rng = random.Random(args.seed)
+        manifest["_photos"] = [photo(rng) for _ in range(4)]
+
+    roles = []
+    for role, weight in mix.items():
+        roles += [role] * weight
+    assigned = [roles[i % len(roles)] for i in range(args.concurrency)]
+
+    recorder = Recorder()
+    counter = Counter(args.iterations or 0)
+    started = time.perf_counter()
+    warm_until = started + args.warmup
+    stop_at = started + args.warmup + args.duration if not args.iterations else None
+    failures = []
+
+    def guarded(*a):
+        try:
+            worker(*a)
+        except Exception as e:
+            failures.append(f"{a[1]}: {e}")
+
+    threads = [threading.Thread(target=guarded, daemon=True,
+                                args=(i, role, args, manifest, recorder, stop_at, warm_until, counter))
+               for i, role in enumerate(assigned)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    measured = time.perf_counter() - max(warm_until, started)
+
+    routes, total = summarize(recorder.samples, recorder.errors, recorder.bytes, measured)
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "base_url": args.base_url,
+            "api_url": args.api_url,
+            "concurrency": args.concurrency,
+            "mix": mix,
+            "workers": assigned,
+            "duration": round(measured, 2),
+            "warmup": args.warmup,
+            "write": args.write,
+            "seed": args.seed,
+            "dataset": {k: manifest.get(k) for k in ("applications", "target", "created_at")},
+            "failures": failures,
+        },
+        "total": total,
+        "routes": routes,
+    }
+
+
+def print_table(result):
+    print(f"{'route':48} {'count':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    for route, r in result["routes"].items():
+        print(f"{route[:48]:48} {r['count']:>7} {r['errors']:>5} {r['rps']:>8} "
+              f"{r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} {r['max_ms']:>8}")
+    t = result["total"]
+    print(f"{'TOTAL':48} {t['count']:>7} {t['errors']:>5} {t['rps']:>8} "
+          f"{t['p50_ms']!s:>8} {t['p95_ms']!s:>8} {t['p99_ms']!s:>8}")
+    for failure in result["meta"]["failures"]:
+        print(f"worker failed: {failure}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:5001")
+    parser.add_argument("--api-url", help="donor_api.py base URL, for the api role")
+    parser.add_argument("--manifest", default="var/bench/manifest.json")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to measure")
+    parser.add_argument("--iterations", type=int, help="stop after this many requests instead")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds not measured")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="role weights: admin, donor, registrar, api")
+    parser.add_argument("--write", action="store_true", help="include registrations")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the JSON result here")
+    args = parser.parse_args(argv)
+    if args.iterations:
+        args.warmup = 0
+
+    result = run(args)
+    print_table(result)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=1)
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
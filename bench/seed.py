@@ -0,0 +1,241 @@
+"""
+Seed a local database with N synthetic applications for benchmarking.
+
+MySQL / MariaDB (the real app; schema from afaqschool.sql, then migrations):
+
+    DB_NAME=afaqschool_bench python -m bench.seed --applications 5000
+
+Rows go through the app's own write paths - imports.insert_batch (numbers,
+search rows, counters), bulk_review.approve_many, stats.set_statuses - so
+the data looks exactly like production data. Photos are stored in the image store
+(IMAGE_STORE_ROOT); --legacy-blobs puts a fraction into applications.picture
+instead, to exercise the old blob path of /image.
+
+SQLite stand-in (for donor_api.py with DONOR_API_DB=sqlite:///...):
+
+    python -m bench.seed --sqlite var/bench.db --applications 5000
+
+Either way a manifest (default var/bench/manifest.json) lists sample
+application numbers, mobiles and search terms for bench.run.
+
+Refuses to touch the production database name from settings.py unless --force.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bench.data import application_fields, person_name, photo
+
+PRODUCTION_DB = "afaqschool1"
+BATCH = 500
+SAMPLE = 500
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _photos(rng, variants):
+    # A pool of distinct photos, reused across applicants (the store dedupes)
+    return [photo(rng) for _ in range(variants)]
+
+
+def _manifest(path, args, pending, approved, assigned, mobiles, names, started):
+    rng = random.Random(args.seed)
+    manifest = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "target": "sqlite" if args.sqlite else "mysql",
+        "applications": args.applications,
+        "seconds": round(time.time() - started, 1),
+        "pending": rng.sample(pending, min(SAMPLE, len(pending))),
+        "approved": rng.sample(approved, min(SAMPLE, len(approved))),
+        "assigned": rng.sample(assigned, min(SAMPLE, len(assigned))),
+        "mobiles": rng.sample(mobiles, min(SAMPLE, len(mobiles))),
+        "search_terms": sorted({name.split()[0] for name in rng.sample(names, min(200, len(names)))}),
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    return manifest
+
+
+# ==== MYSQL ====
+def seed_mysql(args, rng):
+    from bulk_review import approve_many
+    from db import configure, db_connection, db_cursor
+    from image_store import get_image_store
+    from migrate import apply_migrations
+    from imports import insert_batch
+    from settings import DB_CONFIG
+    from stats import rebuild, set_statuses
+
+    if DB_CONFIG["database"] == PRODUCTION_DB and not args.force:
+        sys.exit(f"Refusing to seed {PRODUCTION_DB!r}; set DB_NAME to a scratch database (or --force)")
+    configure(DB_CONFIG)
+    with db_connection() as conn:
+        apply_migrations(conn)
+
+    store = get_image_store()
+    pool = _photos(rng, args.photo_variants)
+    keys = [store.put(data) for data in pool]
+
+    numbers, mobiles, names, legacy = [], [], [], []
+    fields = []
+    for _ in range(args.applications):
+        row = list(application_fields(rng))
+        if rng.random() < args.photos:
+            index = rng.randrange(len(pool))
+            if rng.random() < args.legacy_blobs:
+                legacy.append((len(numbers) + len(fields), index))
+            else:
+                row[12] = keys[index]
+        fields.append(tuple(row))
+        mobiles.append(row[7])
+        names.append(row[0])
+        if len(fields) == BATCH:
+            numbers += insert_batch(fields)
+            fields = []
+    if fields:
+        numbers += insert_batch(fields)
+    print(f"... {len(numbers)} applications")
+
+    with db_cursor(commit=True) as cursor:
+        for position, index in legacy:
+            cursor.execute("UPDATE applications SET picture=%s WHERE application_no=%s",
+                           (pool[index], numbers[position]))
+        # Spread over the past year so keyset pages and date filters are realistic
+        for chunk in _chunks(numbers, BATCH):
+            cursor.execute(
+                f"UPDATE applications SET created_at = NOW() - INTERVAL (id % 365) DAY "
+                f"- INTERVAL (id * 37 % 86400) SECOND "
+                f"WHERE application_no IN ({','.join(['%s'] * len(chunk))})", tuple(chunk))
+
+    shuffled = numbers[:]
+    rng.shuffle(shuffled)
+    chosen = shuffled[:int(len(shuffled) * args.approved)]
+    pending = shuffled[len(chosen):]
+    fees = {"section": "A", "fee": 1500, "books": 800, "uniform": 1200}
+    approved = []
+    for chunk in _chunks(chosen, BATCH):
+        with db_cursor(dictionary=True, commit=True) as cursor:
+            approved += approve_many(cursor, chunk, fees)["approved"]
+    assigned = approved[:int(len(approved) * args.assigned)]
+    for chunk in _chunks(assigned, BATCH):
+        with db_cursor(commit=True) as cursor:
+            cursor.executemany(
+                "INSERT INTO donations (application_no, name, receipt_path, created_at) VALUES (%s,%s,%s,%s)",
+                [(number, f"{person_name(rng)} - 03001234567", f"{number}_receipt.jpg",
+                  datetime.now() - timedelta(days=rng.randrange(120))) for number in chunk])
+            set_statuses(cursor, chunk, "Assigned", allowed_from=("Approved",))
+    with db_cursor(commit=True) as cursor:
+        rebuild(cursor)
+    print(f"... {len(approved)} approved, {len(assigned)} assigned, {len(legacy)} legacy blobs")
+    assigned_set = set(assigned)
+    return pending, [n for n in approved if n not in assigned_set], assigned, mobiles, names
+
+
+# ==== SQLITE ====
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS applications (
+  id INTEGER PRIMARY KEY, application_no TEXT UNIQUE, student_name TEXT NOT NULL,
+  father_name TEXT NOT NULL, dob TEXT, age INTEGER, class TEXT, sabika_school TEXT,
+  father_cnic TEXT, mobile_no TEXT NOT NULL, father_income REAL, is_orphan TEXT DEFAULT 'No',
+  loss_flood REAL, donation_percentage INTEGER, picture BLOB, picture_key TEXT,
+  status TEXT DEFAULT 'Pending', user_id INTEGER, DonarPercentage INTEGER,
+  donor_mobile TEXT, receipt TEXT, created_at TEXT,
+  held_by TEXT, held_until TEXT, hold_version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_applications_status_created ON applications (status, created_at);
+CREATE TABLE IF NOT EXISTS students (
+  id INTEGER PRIMARY KEY, application_no TEXT, class_name TEXT, section TEXT,
+  fee REAL, books REAL, uniform REAL, total REAL
+);
+CREATE INDEX IF NOT EXISTS idx_students_application_no ON students (application_no);
+CREATE TABLE IF NOT EXISTS donations (
+  id INTEGER PRIMARY KEY, application_no TEXT, donor_id INTEGER, name TEXT,
+  receipt_path TEXT, created_at TEXT
+);
+"""
+
+
+def seed_sqlite(args, rng):
+    conn = sqlite3.connect(args.sqlite)
+    conn.executescript(SQLITE_SCHEMA)
+    start = conn.execute("SELECT COALESCE(MAX(id), 0) FROM applications").fetchone()[0]
+    pool = _photos(rng, args.photo_variants) if args.photos else []
+    now = datetime.now()
+
+    numbers, mobiles, names = [], [], []
+    rows = []
+    for i in range(1, args.applications + 1):
+        row_id = start + i
+        number = f"APP-{row_id:04d}"
+        fields = application_fields(rng)
+        blob = rng.choice(pool) if pool and rng.random() < args.photos else None
+        created = (now - timedelta(days=row_id % 365, seconds=row_id * 37 % 86400)).isoformat(" ", "seconds")
+        rows.append((row_id, number) + fields[:12] + (blob, "Pending", created))
+        numbers.append(number)
+        mobiles.append(fields[7])
+        names.append(fields[0])
+    conn.executemany("""
+        INSERT INTO applications (id, application_no, student_name, father_name, dob, age, class,
+            sabika_school, father_cnic, mobile_no, father_income, is_orphan, loss_flood,
+            donation_percentage, picture, status, created_at)
+        VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+    """, [tuple(str(v) if hasattr(v, "isoformat") else v for v in row) for row in rows])
+
+    shuffled = numbers[:]
+    rng.shuffle(shuffled)
+    approved = shuffled[:int(len(shuffled) * args.approved)]
+    assigned = approved[:int(len(approved) * args.assigned)]
+    pending = shuffled[len(approved):]
+    for chunk in _chunks(approved, BATCH):
+        marks = ",".join("?" * len(chunk))
+        conn.execute(f"UPDATE applications SET status='Approved' WHERE application_no IN ({marks})", chunk)
+        conn.executemany(
+            "INSERT INTO students (application_no, class_name, section, fee, books, uniform, total) "
+            "VALUES (?, ?, 'A', 1500, 800, 1200, 3500)",
+            [(n, "9") for n in chunk])
+    for chunk in _chunks(assigned, BATCH):
+        marks = ",".join("?" * len(chunk))
+        conn.execute(f"UPDATE applications SET status='Assigned' WHERE application_no IN ({marks})", chunk)
+        conn.executemany("INSERT INTO donations (application_no, name, receipt_path, created_at) VALUES (?,?,?,?)",
+                         [(n, person_name(rng), f"{n}_receipt.jpg", now.isoformat(" ", "seconds")) for n in chunk])
+    conn.commit()
+    conn.close()
+    print(f"... {len(numbers)} applications, {len(approved)} approved, {len(assigned)} assigned")
+    assigned_set = set(assigned)
+    return pending, [n for n in approved if n not in assigned_set], assigned, mobiles, names
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--applications", type=int, default=1000)
+    parser.add_argument("--approved", type=float, default=0.5, help="fraction approved")
+    parser.add_argument("--assigned", type=float, default=0.3, help="fraction of approved with a donation")
+    parser.add_argument("--photos", type=float, default=1.0, help="fraction with a photo")
+    parser.add_argument("--photo-variants", type=int, default=40, help="distinct photos to generate")
+    parser.add_argument("--legacy-blobs", type=float, default=0.0,
+                        help="fraction of photos stored in applications.picture (MySQL only)")
+    parser.add_argument("--sqlite", help="seed this SQLite file instead of MySQL")
+    parser.add_argument("--manifest", default="var/bench/manifest.json")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    started = time.time()
+    seed = seed_sqlite if args.sqlite else seed_mysql
+    pending, approved, assigned, mobiles, names = seed(args, rng)
+    manifest = _manifest(args.manifest, args, pending, approved, assigned, mobiles, names, started)
+    print(f"Done in {manifest['seconds']}s; manifest: {args.manifest}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Measure how long the app takes to start:
+
+    python -m bench.startup --runs 10 --out startup.json
+    python -m bench.startup --gunicorn --out startup.json    # also time gunicorn boots
+
+Each run is a fresh interpreter, so nothing is cached in memory:
+
+    interpreter     `python -c pass`, the floor under everything else
+    import          `import app` inside the child
+    first_request   import + create_app() + the first GET / (login page, no
+                    database), inside the child
+    wall            the whole child process as seen from here
+
+--importtime N lists the N modules app imports directly that cost the most
+(python -X importtime, cumulative). --gunicorn starts
+`gunicorn -c gunicorn.conf.py` on a local port, with GUNICORN_PRELOAD=1 and
+=0, and times until GET / answers. --cold-templates gives each run an empty
+JINJA_CACHE_DIR, so templates are compiled from source.
+"""
+import argparse
+import json
+import os
+import shutil
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+from bench.run import git_commit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+client = app.create_app().test_client()
+status = client.get("/").status_code
+t2 = time.perf_counter()
+print(status, (t1 - t0) * 1000, (t2 - t0) * 1000)
+"""
+
+
+def _stats(values):
+    values = sorted(values)
+    return {
+        "runs": len(values),
+        "min_ms": round(values[0], 1),
+        "median_ms": round(statistics.median(values), 1),
+        "max_ms": round(values[-1], 1),
+    }
+
+
+def _env(cold_templates):
+    env = dict(os.environ)
+    if cold_templates:
+        env["JINJA_CACHE_DIR"] = tempfile.mkdtemp(prefix="jinja-")
+    return env
+
+
+def _timed(args, env=None):
+    started = time.perf_counter()
+    out = subprocess.run(args, cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return out, (time.perf_counter() - started) * 1000
+
+
+def measure(runs, cold_templates):
+    floor, imports, first, wall = [], [], [], []
+    for _ in range(runs):
+        floor.append(_timed([sys.executable, "-c", "pass"])[1])
+        env = _env(cold_templates)
+        try:
+            out, elapsed = _timed([sys.executable, "-c", CHILD], env)
+        finally:
+            if cold_templates:
+                shutil.rmtree(env["JINJA_CACHE_DIR"], ignore_errors=True)
+        status, import_ms, first_ms = out.stdout.split()
+        if status != "200":
+            raise SystemExit(f"GET / answered {status}")
+        imports.append(float(import_ms))
+        first.append(float(first_ms))
+        wall.append(elapsed)
+    return {"interpreter": _stats(floor), "import": _stats(imports),
+            "first_request": _stats(first), "wall": _stats(wall)}
+
+
+def import_breakdown(top):
+    # Modules imported directly by app, by cumulative microseconds
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=ROOT,
+                         capture_output=True, text=True, check=True)
+    children, total = [], None
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue     # the header line
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 1:
+            children.append((name.strip(), int(cumulative)))
+        elif depth == 0:
+            if name.strip() == "app":
+                total = int(cumulative)
+                break
+            children = []    # imported before app (site, encodings)
+    children.sort(key=lambda c: -c[1])
+    return {"app_ms": round(total / 1000, 1) if total else None,
+            "modules": [{"module": n, "ms": round(us / 1000, 1)} for n, us in children[:top]]}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def gunicorn_boot(preload, timeout=60):
+    # Milliseconds from starting gunicorn until the first GET / answers
+    port = _free_port()
+    env = dict(os.environ, GUNICORN_PRELOAD="1" if preload else "0")
+    command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--bind", f"127.0.0.1:{port}"]
+    started = time.perf_counter()
+    proc = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        while time.perf_counter() - started < timeout:
+            if proc.poll() is not None:
+                raise SystemExit(f"gunicorn exited: {proc.stderr.read().decode(errors='replace')[-500:]}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=5) as response:
+                    response.read()
+                return round((time.perf_counter() - started) * 1000, 1)
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.02)
+        raise SystemExit(f"gunicorn did not answer within {timeout}s")
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--importtime", type=int, default=10, metavar="N",
+                        help="list the N slowest direct imports (0: skip)")
+    parser.add_argument("--cold-templates", action="store_true",
+                        help="empty JINJA_CACHE_DIR for every run")
+    parser.add_argument("--gunicorn", action="store_true", help="also time gunicorn boots")
+    parser.add_argument("--out", help="write the JSON result here")
+    args = parser.parse_args(argv)
+
+    result = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "cold_templates": args.cold_templates,
+        },
+    }
+    result.update(measure(args.runs, args.cold_templates))
+    if args.importtime:
+        result["import_breakdown"] = import_breakdown(args.importtime)
+    if args.gunicorn:
+        result["gunicorn_ms"] = {"preload": gunicorn_boot(True), "no_preload": gunicorn_boot(False)}
+
+    for name in ("interpreter", "import", "first_request", "wall"):
+        r = result[name]
+        print(f"{name:14} min {r['min_ms']:>7} ms   median {r['median_ms']:>7} ms   max {r['max_ms']:>7} ms")
+    for module in result.get("import_breakdown", {}).get("modules", []):
+        print(f"  {module['module']:30} {module['ms']:>7} ms")
+    if "gunicorn_ms" in result:
+        print(f"gunicorn boot  preload {result['gunicorn_ms']['preload']} ms, "
+              f"no preload {result['gunicorn_ms']['no_preload']} ms")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Approve or reject many pending applications in one transaction.
+
+The review queue is cleared one application per POST otherwise: a connection,
+an UPDATE, an INSERT into students and a commit each, then a full reload of
+the queue. Here a whole selection is handled with
+
+    SELECT ... WHERE application_no IN (...) FOR UPDATE    lock + read class
+    UPDATE applications ... WHERE application_no IN (...)  (stats.set_statuses)
+    INSERT INTO students ... (executemany -> one multi-row INSERT)
+
+and one commit. Only Pending applications are touched; anything else in the
+selection is reported back as skipped with the reason.
+
+Fees for an approval come from class_defaults (migrations/011), keyed by
+applications.class, and can be overridden for the whole selection.
+"""
+from decimal import Decimal, InvalidOperation
+
+from stats import add_sponsored, set_statuses
+
+MAX_BATCH = 500
+FEE_FIELDS = ("fee", "books", "uniform")
+OVERRIDE_FIELDS = ("section",) + FEE_FIELDS
+
+
+class BulkReviewError(Exception):
+    pass
+
+
+def parse_overrides(values):
+    # {"section": "A", "fee": "1500", ...} from a form or JSON; blanks are dropped
+    overrides = {}
+    for name in OVERRIDE_FIELDS:
+        value = values.get(name)
+        if value is None or str(value).strip() == "":
+            continue
+        if name == "section":
+            overrides[name] = str(value).strip()
+            continue
+        try:
+            amount = Decimal(str(value).strip())
+        except InvalidOperation:
+            raise BulkReviewError(f"{name}: not a number")
+        if amount < 0:
+            raise BulkReviewError(f"{name}: negative")
+        overrides[name] = amount
+    return overrides
+
+
+def _selection(application_nos):
+    numbers = list(dict.fromkeys(n.strip() for n in application_nos if n and n.strip()))
+    if not numbers:
+        raise BulkReviewError("No applications selected")
+    if len(numbers) > MAX_BATCH:
+        raise BulkReviewError(f"At most {MAX_BATCH} applications at a time")
+    return numbers
+
+
+def _lock_rows(cursor, numbers):
+    placeholders = ",".join(["%s"] * len(numbers))
+    cursor.execute(f"SELECT application_no, status, class FROM applications "
+                   f"WHERE application_no IN ({placeholders}) FOR UPDATE", tuple(numbers))
+    return {row["application_no"]: row for row in cursor.fetchall()}
+
+
+def _not_pending(numbers, rows):
+    skipped = {}
+    for number in numbers:
+        row = rows.get(number)
+        if row is None:
+            skipped[number] = "not found"
+        elif (row["status"] or "Pending") != "Pending":
+            skipped[number] = f"already {row['status']}"
+    return skipped
+
+
+# ==== CLASS DEFAULTS ====
+def _class_key(name):
+    return (name or "").strip().casefold()
+
+
+def list_class_defaults(cursor):
+    cursor.execute("SELECT class_name, section, fee, books, uniform FROM class_defaults ORDER BY class_name")
+    return cursor.fetchall()
+
+
+def save_class_default(cursor, class_name, section, fee, books, uniform):
+    cursor.execute("""
+        INSERT INTO class_defaults (class_name, section, fee, books, uniform)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE section=VALUES(section), fee=VALUES(fee),
+            books=VALUES(books), uniform=VALUES(uniform)
+    """, (class_name.strip(), section or None, fee, books, uniform))
+
+
+def delete_class_default(cursor, class_name):
+    cursor.execute("DELETE FROM class_defaults WHERE class_name=%s", (class_name,))
+
+
+def _defaults_for(cursor, class_names):
+    names = sorted({name.strip() for name in class_names if name and name.strip()})
+    if not names:
+        return {}
+    placeholders = ",".join(["%s"] * len(names))
+    cursor.execute(f"SELECT class_name, section, fee, books, uniform FROM class_defaults "
+                   f"WHERE class_name IN ({placeholders})", tuple(names))
+    return {_class_key(row["class_name"]): row for row in cursor.fetchall()}
+
+
+# ==== BULK ACTIONS ====
+def approve_many(cursor, application_nos, overrides=None):
+    # cursor: dictionary cursor inside the caller's transaction
+    numbers = _selection(application_nos)
+    rows = _lock_rows(cursor, numbers)
+    skipped = _not_pending(numbers, rows)
+    defaults = _defaults_for(cursor, [rows[n]["class"] for n in numbers if n not in skipped])
+
+    students = {}
+    for number in numbers:
+        if number in skipped:
+            continue
+        class_name = rows[number]["class"]
+        values = dict(defaults.get(_class_key(class_name)) or {})
+        values.update(overrides or {})
+        if any(values.get(name) is None for name in FEE_FIELDS):
+            skipped[number] = f"no fee defaults for class {class_name or '-'}"
+            continue
+        total = sum(Decimal(str(values[name])) for name in FEE_FIELDS)
+        students[number] = (number, class_name, values.get("section"),
+                            values["fee"], values["books"], values["uniform"], total)
+
+    changed = set_statuses(cursor, list(students), "Approved", allowed_from=("Pending",))
+    if changed:
+        cursor.executemany("""
+            INSERT INTO students (application_no, class_name, section, fee, books, uniform, total)
+            VALUES (%s,%s,%s,%s,%s,%s,%s)
+        """, [students[number] for number in changed])
+        add_sponsored(cursor, sum(students[number][-1] for number in changed))
+    return {"approved": list(changed), "skipped": skipped}
+
+
+def reject_many(cursor, application_nos):
+    numbers = _selection(application_nos)
+    rows = _lock_rows(cursor, numbers)
+    skipped = _not_pending(numbers, rows)
+    changed = set_statuses(cursor, [n for n in numbers if n not in skipped], "Rejected",
+                           allowed_from=("Pending",))
+    return {"rejected": list(changed), "skipped": skipped}
@@ -0,0 +1,198 @@
+"""
+Read-through cache for dashboard queries, invalidated by the write routes.
+
+    page = query_cache.get_or_set("review", (cursor, size), load, tags=("pending",))
+    ...
+    query_cache.invalidate("pending")      # after approve / reject / register
+
+Entries are tagged. invalidate() bumps the tag's version in a small SQLite file
+shared by all gunicorn workers, and the version is part of every cache key, so
+a write in one worker retires the entry in all of them without messaging.
+
+Where entries live is set by CACHE_BACKEND:
+    memory  per-worker LRU with TTL (default)
+    sqlite  one shared file under CACHE_DIR, so workers also share hits
+
+Environment: CACHE_BACKEND, CACHE_DIR (default var/cache), CACHE_TTL seconds
+(default 30), CACHE_MAX_ITEMS for the memory backend (default 512).
+"""
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_DIR = os.environ.get("CACHE_DIR", "var/cache")
+DEFAULT_TTL = float(os.environ.get("CACHE_TTL", 30))
+MAX_ITEMS = int(os.environ.get("CACHE_MAX_ITEMS", 512))
+
+# Tags used by app.py
+PENDING = "pending"      # review queue
+APPROVED = "approved"    # donor dashboard
+
+
+class _SQLiteFile:
+    # Per-thread connections to one SQLite file (also re-opened after fork)
+    def __init__(self, path, schema):
+        self.path = path
+        self.schema = schema
+        self._local = threading.local()
+
+    def conn(self):
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.schema)
+            local.conn, local.pid = conn, os.getpid()
+        return local.conn
+
+
+class TagVersions:
+    def __init__(self, path):
+        self._db = _SQLiteFile(path, """
+            CREATE TABLE IF NOT EXISTS tag_versions (tag TEXT PRIMARY KEY, version INTEGER NOT NULL);
+        """)
+
+    def get(self, tags):
+        if not tags:
+            return ()
+        placeholders = ",".join("?" * len(tags))
+        rows = dict(self._db.conn().execute(
+            f"SELECT tag, version FROM tag_versions WHERE tag IN ({placeholders})", tuple(tags)))
+        return tuple(rows.get(tag, 0) for tag in tags)
+
+    def bump(self, tags):
+        conn = self._db.conn()
+        for tag in tags:
+            conn.execute(
+                "INSERT INTO tag_versions (tag, version) VALUES (?, 1) "
+                "ON CONFLICT(tag) DO UPDATE SET version = version + 1", (tag,))
+
+
+class MemoryBackend:
+    def __init__(self, max_items=MAX_ITEMS):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if item[1] < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return item
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._items[key] = (value, time.monotonic() + ttl)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class SQLiteBackend:
+    def __init__(self, path):
+        self._db = _SQLiteFile(path, """
+            CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL);
+        """)
+        self._sets = 0
+
+    def get(self, key):
+        row = self._db.conn().execute(
+            "SELECT value, expires FROM entries WHERE key=? AND expires>?", (key, time.time())).fetchone()
+        if row is None:
+            return None
+        return pickle.loads(row[0]), row[1]
+
+    def set(self, key, value, ttl):
+        conn = self._db.conn()
+        conn.execute("INSERT OR REPLACE INTO entries (key, value, expires) VALUES (?,?,?)",
+                     (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), time.time() + ttl))
+        self._sets += 1
+        if self._sets % 100 == 0:
+            conn.execute("DELETE FROM entries WHERE expires<=?", (time.time(),))
+
+    def clear(self):
+        self._db.conn().execute("DELETE FROM entries")
+
+
+class QueryCache:
+    def __init__(self, backend, versions, ttl=DEFAULT_TTL):
+        self.backend = backend
+        self.versions = versions
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "invalidations": 0, "errors": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _key(self, namespace, key_parts, tags):
+        raw = json.dumps([namespace, key_parts, tags, self.versions.get(tags)], default=str)
+        return namespace + ":" + hashlib.sha1(raw.encode()).hexdigest()
+
+    def get_or_set(self, namespace, key_parts, loader, tags=(), ttl=None):
+        tags = tuple(tags)
+        try:
+            key = self._key(namespace, key_parts, tags)
+            hit = self.backend.get(key)
+        except sqlite3.Error:
+            # The cache must never take a page down; serve from the database
+            self._count("errors")
+            return loader()
+        if hit is not None:
+            self._count("hits")
+            return hit[0]
+        self._count("misses")
+        value = loader()
+        try:
+            self.backend.set(key, value, self.ttl if ttl is None else ttl)
+        except sqlite3.Error:
+            self._count("errors")
+        return value
+
+    def invalidate(self, *tags):
+        # Call after the write has committed
+        try:
+            self.versions.bump(tags)
+        except sqlite3.Error:
+            # Entries still expire after their TTL
+            self._count("errors")
+            return
+        self._count("invalidations")
+
+    def stats(self):
+        with self._lock:
+            data = dict(self.counters)
+        lookups = data["hits"] + data["misses"]
+        data["hit_ratio"] = round(data["hits"] / lookups, 3) if lookups else None
+        data["backend"] = type(self.backend).__name__
+        data["pid"] = os.getpid()
+        return data
+
+
+def create_cache():
+    versions = TagVersions(os.path.join(CACHE_DIR, "tags.sqlite3"))
+    if os.environ.get("CACHE_BACKEND", "memory") == "sqlite":
+        backend = SQLiteBackend(os.path.join(CACHE_DIR, "entries.sqlite3"))
+    else:
+        backend = MemoryBackend()
+    return QueryCache(backend, versions)
@@ -0,0 +1,347 @@
+"""
+MySQL connection pool for app.py.
+
+Every gunicorn worker keeps its own small pool of open connections instead of
+doing a full TCP + auth handshake per request. The pool is created lazily on
+first use and re-created if the process id changes, so it is never shared
+across a fork.
+
+Routes use it through:
+    with db_cursor(dictionary=True) as cur: ...      # read
+    with db_cursor(commit=True) as cur: ...          # write, commit on success
+    with db_connection() as conn: ...                # several cursors / manual commit
+
+get_db_connection() in app.py still works: it returns a pooled connection whose
+close() hands it back to the pool instead of closing the socket.
+
+An observer (metrics.py) can be attached with set_observer(); it is told about
+every execute()/executemany() and how long each connection was waited for and
+held. With no observer, cursors are the plain mysql.connector ones.
+
+Tuning (environment variables):
+    DB_POOL_SIZE          max connections per worker (default 4)
+    DB_POOL_TIMEOUT       seconds to wait for a free connection (default 10)
+    DB_POOL_RECYCLE       reconnect connections older than this (default 1800)
+    DB_POOL_PING_AFTER    ping connections idle longer than this (default 30)
+    DB_USE_PURE=1         pure-Python protocol (gevent workers, gunicorn.conf.py)
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import mysql.connector
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+_observer = None
+
+
+def set_observer(observer):
+    # observer.on_query(statement, params, seconds, many)
+    # observer.on_connection(wait_seconds, held_seconds)
+    global _observer
+    _observer = observer
+
+
+class ObservedCursor:
+    # Times execute()/executemany() for the observer; everything else passes through
+    def __init__(self, raw, observer):
+        self._raw = raw
+        self._observer = observer
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._raw.close()
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._raw.execute(operation, params, *args, **kwargs)
+        finally:
+            self._observer.on_query(operation, params, time.perf_counter() - start, False)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._raw.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            self._observer.on_query(operation, seq_params, time.perf_counter() - start, True)
+
+
+class PooledConnection:
+    # Proxy around a mysql.connector connection; close() returns it to the pool
+    def __init__(self, pool, raw, born, wait_seconds=0.0):
+        self._pool = pool
+        self._raw = raw
+        self._born = born
+        self._released = False
+        self._wait_seconds = wait_seconds
+        self._checked_out = time.perf_counter()
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._raw.cursor(*args, **kwargs)
+        observer = _observer
+        return ObservedCursor(cursor, observer) if observer is not None else cursor
+
+    def _observe_release(self):
+        observer = _observer
+        if observer is not None:
+            observer.on_connection(self._wait_seconds, time.perf_counter() - self._checked_out)
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._observe_release()
+            self._pool._release(self._raw, self._born)
+
+    def discard(self):
+        # Close the socket instead of pooling it (e.g. unread results pending)
+        if not self._released:
+            self._released = True
+            self._observe_release()
+            _quiet_close(self._raw)
+            self._pool._release(self._raw, self._born)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConnectionPool:
+    def __init__(self, config, size=4, timeout=10, recycle=1800, ping_after=30):
+        self.config = config
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_after = ping_after
+        self.pid = os.getpid()
+
+        self._cond = threading.Condition()
+        self._idle = []       # (raw, born, last_used), most recently used last
+        self._open = 0        # idle + checked out
+        self.stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "connects": 0,
+            "recycled": 0,
+            "failed_pings": 0,
+            "wait_seconds": 0.0,
+        }
+
+    # ---- checkout / return ----
+    def acquire(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+        entry = None
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    break
+                if not waited:
+                    waited = True
+                    self.stats["waits"] += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats["timeouts"] += 1
+                    raise PoolTimeout(
+                        f"No database connection free after {self.timeout}s "
+                        f"(pool size {self.size})"
+                    )
+                self._cond.wait(remaining)
+            self.stats["checkouts"] += 1
+            if waited:
+                self.stats["wait_seconds"] += time.monotonic() - start
+
+        # Connect / health-check outside the lock
+        try:
+            if entry is None:
+                raw, born = self._connect()
+            else:
+                raw, born = self._checked(*entry)
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        # wait = pool wait + connect / ping, i.e. time before the first query
+        return PooledConnection(self, raw, born, time.monotonic() - start)
+
+    def _release(self, raw, born):
+        try:
+            if raw.in_transaction:
+                raw.rollback()
+            healthy = raw.is_connected()
+        except Exception:
+            healthy = False
+
+        with self._cond:
+            if healthy and os.getpid() == self.pid:
+                self._idle.append((raw, born, time.monotonic()))
+            else:
+                self._open -= 1
+                _quiet_close(raw)
+            self._cond.notify()
+
+    def _connect(self):
+        raw = mysql.connector.connect(**self.config)
+        with self._cond:
+            self.stats["connects"] += 1
+        return raw, time.monotonic()
+
+    def _checked(self, raw, born, last_used):
+        now = time.monotonic()
+        if now - born > self.recycle:
+            with self._cond:
+                self.stats["recycled"] += 1
+            _quiet_close(raw)
+            return self._connect()
+        if now - last_used > self.ping_after:
+            try:
+                raw.ping(reconnect=False)
+            except Exception:
+                with self._cond:
+                    self.stats["failed_pings"] += 1
+                _quiet_close(raw)
+                return self._connect()
+        return raw, born
+
+    # ---- maintenance ----
+    def recycle_idle(self):
+        # Close idle connections past their lifetime; returns how many were dropped
+        now = time.monotonic()
+        with self._cond:
+            keep, drop = [], []
+            for entry in self._idle:
+                (drop if now - entry[1] > self.recycle else keep).append(entry)
+            self._idle = keep
+            self._open -= len(drop)
+            self.stats["recycled"] += len(drop)
+            self._cond.notify_all()
+        for raw, _, _ in drop:
+            _quiet_close(raw)
+        return len(drop)
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for raw, _, _ in idle:
+            _quiet_close(raw)
+
+    def snapshot(self):
+        with self._cond:
+            data = dict(self.stats)
+            data.update(
+                pid=self.pid,
+                size=self.size,
+                open=self._open,
+                idle=len(self._idle),
+                in_use=self._open - len(self._idle),
+            )
+        data["wait_seconds"] = round(data["wait_seconds"], 4)
+        return data
+
+
+def _quiet_close(raw):
+    try:
+        raw.close()
+    except Exception:
+        pass
+
+
+# ==== PER-WORKER POOL ====
+_config = {}
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def configure(db_config, **pool_options):
+    global _pool
+    _config.clear()
+    _config.update(db_config=dict(db_config), options=pool_options)
+    _pool = None
+
+
+def _pool_options():
+    options = {
+        "size": int(os.environ.get("DB_POOL_SIZE", 4)),
+        "timeout": float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+        "recycle": float(os.environ.get("DB_POOL_RECYCLE", 1800)),
+        "ping_after": float(os.environ.get("DB_POOL_PING_AFTER", 30)),
+    }
+    options.update(_config.get("options", {}))
+    return options
+
+
+def get_pool():
+    global _pool
+    pool = _pool
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+    with _pool_lock:
+        if _pool is None or _pool.pid != os.getpid():
+            if "db_config" not in _config:
+                raise RuntimeError("db.configure() has not been called")
+            # A pool inherited from the parent process is simply abandoned;
+            # its sockets belong to the parent.
+            db_config = dict(_config["db_config"])
+            if os.environ.get("DB_USE_PURE") == "1":
+                # The C extension blocks a gevent worker's whole event loop
+                db_config["use_pure"] = True
+            _pool = ConnectionPool(db_config, **_pool_options())
+        return _pool
+
+
+def connect():
+    return get_pool().acquire()
+
+
+@contextmanager
+def db_connection():
+    conn = connect()
+    try:
+        yield conn
+    except Exception:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        raise
+    finally:
+        conn.close()
+
+
+@contextmanager
+def db_cursor(dictionary=False, commit=False):
+    with db_connection() as conn:
+        cur = conn.cursor(dictionary=dictionary)
+        try:
+            yield cur
+            if commit:
+                conn.commit()
+        finally:
+            cur.close()
@@ -0,0 +1,266 @@
+"""
+Async, read-only JSON API for the donor pages (ASGI).
+
+The donor dashboard and detail pages are the busiest during donation drives,
+and each sync gunicorn worker serves one request at a time. This app serves
+the same data from a single asyncio process next to the Flask app; a request
+waiting on MySQL costs a coroutine, not a worker:
+
+    GET /api/donor/applications?cursor=&size=         approved and not held, newest first
+    GET /api/donor/applications/<application_no>      detail + fees
+    GET /api/donor/applications/<application_no>/image
+        photo metadata (ETag, URLs per size); the bytes stay on /image
+
+It reads the Flask session cookie (signed with settings.SECRET_KEY), so a
+donor logged in to the site is logged in here too. Paging uses the same
+keyset tokens as the HTML pages (pagination.py).
+
+Run:
+    uvicorn donor_api:app --host 127.0.0.1 --port 8001
+
+Database: aiomysql with DB_CONFIG. DONOR_API_DB=sqlite:///path/to.db uses
+aiosqlite over a SQLite copy of the tables instead (local runs and tests).
+Pool size per process: DONOR_API_POOL_SIZE (default 10).
+"""
+import hashlib
+import json
+import os
+import re
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask.sessions import session_json_serializer
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from pagination import PaginationError, page_from_rows, page_query, page_size
+from queries import APPLICATION_DETAIL_COLUMNS, APPLICATION_IMAGE_META, columns, has_picture
+from settings import DB_CONFIG, SECRET_KEY
+
+POOL_SIZE = int(os.environ.get("DONOR_API_POOL_SIZE", 10))
+SESSION_COOKIE = "session"
+SESSION_MAX_AGE = 31 * 24 * 3600      # Flask's default PERMANENT_SESSION_LIFETIME
+IMAGE_SIZES = ("thumb", "medium", "original")
+
+APPROVED_QUERY = """
+    SELECT a.id, a.created_at, a.application_no, a.student_name, a.father_name,
+           s.class_name, s.section, s.total
+    FROM applications a
+    JOIN students s ON a.application_no = s.application_no
+    WHERE a.status = 'Approved' AND a.held_until IS NULL
+"""
+APPROVED_KEYS = [("a.created_at", "created_at"), ("a.id", "id")]
+
+DETAIL_QUERY = f"""
+    SELECT {columns(APPLICATION_DETAIL_COLUMNS, "a")}, {has_picture("a")},
+           s.class_name, s.section, s.fee, s.books, s.uniform, s.total
+    FROM applications a
+    JOIN students s ON a.application_no = s.application_no
+    WHERE a.application_no = %s
+"""
+IMAGE_QUERY = f"SELECT {APPLICATION_IMAGE_META} FROM applications WHERE application_no = %s"
+
+
+# ==== DATABASE ====
+class MySQLDatabase:
+    def __init__(self, config, size=POOL_SIZE):
+        self.config = config
+        self.size = size
+        self.pool = None
+
+    async def open(self):
+        import aiomysql
+        self._cursor_class = aiomysql.DictCursor
+        self.pool = await aiomysql.create_pool(
+            host=self.config["host"], user=self.config["user"],
+            password=self.config["password"], db=self.config["database"],
+            minsize=1, maxsize=self.size, autocommit=True, charset="utf8mb4",
+            pool_recycle=1800,
+        )
+
+    async def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+
+    async def fetchall(self, sql, params=()):
+        async with self.pool.acquire() as conn:
+            async with conn.cursor(self._cursor_class) as cursor:
+                await cursor.execute(sql, tuple(params))
+                return list(await cursor.fetchall())
+
+
+class SQLiteDatabase:
+    # Stand-in for local runs: same SQL, "%s" placeholders become "?"
+    def __init__(self, path):
+        self.path = path
+        self.conn = None
+
+    async def open(self):
+        import aiosqlite
+        self.conn = await aiosqlite.connect(self.path)
+        self.conn.row_factory = aiosqlite.Row
+        # MySQL functions used by queries.py
+        await self.conn.create_function("IF", 3, lambda cond, a, b: a if cond else b)
+        await self.conn.create_function(
+            "SHA1", 1, lambda data: hashlib.sha1(data).hexdigest() if data is not None else None)
+
+    async def close(self):
+        if self.conn is not None:
+            await self.conn.close()
+
+    async def fetchall(self, sql, params=()):
+        async with self.conn.execute(sql.replace("%s", "?"), tuple(params)) as cursor:
+            return [dict(row) for row in await cursor.fetchall()]
+
+
+def create_database():
+    target = os.environ.get("DONOR_API_DB", "mysql")
+    if target.startswith("sqlite:///"):
+        return SQLiteDatabase(target[len("sqlite:///"):])
+    return MySQLDatabase(DB_CONFIG)
+
+
+async def fetchone(db, sql, params=()):
+    rows = await db.fetchall(sql, params)
+    return rows[0] if rows else None
+
+
+# ==== AUTH ====
+_sessions = URLSafeTimedSerializer(
+    SECRET_KEY, salt="cookie-session", serializer=session_json_serializer,
+    signer_kwargs={"key_derivation": "hmac", "digest_method": hashlib.sha1},
+)
+
+
+def session_user(request):
+    cookie = request.cookies.get(SESSION_COOKIE)
+    if not cookie:
+        return None
+    try:
+        data = _sessions.loads(cookie, max_age=SESSION_MAX_AGE)
+    except BadSignature:
+        return None
+    return data.get("user")
+
+
+def _denied(request):
+    user = session_user(request)
+    if not user or user.get("role") not in ("donor", "admin"):
+        return error(403, "Please login as a donor first.")
+    return None
+
+
+# ==== RESPONSES ====
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, bytes):
+        return None
+    raise TypeError(f"Cannot serialise {type(value).__name__}")
+
+
+class APIResponse(JSONResponse):
+    def render(self, content):
+        return json.dumps(content, default=_default, ensure_ascii=False,
+                          separators=(",", ":")).encode("utf-8")
+
+
+def error(status, message):
+    return APIResponse({"error": message}, status_code=status)
+
+
+_APPLICATION_NO_RE = re.compile(r"^[A-Za-z0-9-]{1,20}$")
+
+
+# ==== ROUTES ====
+async def approved_applications(request):
+    denied = _denied(request)
+    if denied:
+        return denied
+    token = request.query_params.get("cursor")
+    size = page_size(request.query_params.get("size"))
+    try:
+        sql, params, direction = page_query(APPROVED_QUERY, [], APPROVED_KEYS, token, size)
+    except PaginationError as e:
+        return error(400, str(e))
+    rows = await request.app.state.db.fetchall(sql, params)
+    page = page_from_rows(rows, APPROVED_KEYS, token, size, direction)
+    return APIResponse({
+        "items": page.rows,
+        "next": page.next_token,
+        "prev": page.prev_token,
+        "size": page.size,
+    })
+
+
+async def application_detail(request):
+    denied = _denied(request)
+    if denied:
+        return denied
+    application_no = request.path_params["application_no"]
+    if not _APPLICATION_NO_RE.match(application_no):
+        return error(404, "Application not found")
+    row = await fetchone(request.app.state.db, DETAIL_QUERY, (application_no,))
+    if row is None:
+        return error(404, "Application not found")
+    row["has_picture"] = bool(row["has_picture"])
+    return APIResponse(row)
+
+
+async def image_metadata(request):
+    denied = _denied(request)
+    if denied:
+        return denied
+    application_no = request.path_params["application_no"]
+    if not _APPLICATION_NO_RE.match(application_no):
+        return error(404, "Application not found")
+    row = await fetchone(request.app.state.db, IMAGE_QUERY, (application_no,))
+    if row is None:
+        return error(404, "Application not found")
+    key, blob_sha1 = row["picture_key"], row["picture_sha1"]
+    if not key and not blob_sha1:
+        return APIResponse({"application_no": application_no, "has_picture": False})
+    digest = key.split(".", 1)[0] if key else blob_sha1
+    # Same URLs and ETags as app.py's /image route; legacy blobs have no sizes
+    sizes = IMAGE_SIZES if key else ("original",)
+    return APIResponse({
+        "application_no": application_no,
+        "has_picture": True,
+        "updated_at": row["created_at"],
+        "images": {
+            size: {"url": f"/image/{application_no}?size={size}", "etag": f"{digest}-{size}"}
+            for size in sizes
+        },
+    })
+
+
+async def health(request):
+    await request.app.state.db.fetchall("SELECT 1")
+    return APIResponse({"ok": True})
+
+
+@asynccontextmanager
+async def lifespan(app):
+    app.state.db = create_database()
+    await app.state.db.open()
+    try:
+        yield
+    finally:
+        await app.state.db.close()
+
+
+app = Starlette(
+    routes=[
+        Route("/api/donor/health", health),
+        Route("/api/donor/applications", approved_applications),
+        Route("/api/donor/applications/{application_no}", application_detail),
+        Route("/api/donor/applications/{application_no}/image", image_metadata),
+    ],
+    lifespan=lifespan,
+)
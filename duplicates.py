@@ -0,0 +1,260 @@
+"""
+Duplicate-applicant detection.
+
+The same child is sometimes registered more than once by different
+volunteers: the name typed in Urdu once and in Roman Urdu the next time,
+the CNIC with and without dashes. Every application gets a few normalized
+blocking keys in the side table application_dup_keys (migrations/013),
+written in the same transaction as the application:
+
+    cnic_name     father CNIC digits + student name
+    mobile_name   mobile as 03xxxxxxxxx + student name
+    name_dob      student name + date of birth
+    cnic_sound    the same three with the name's skeleton: "similar name",
+    mobile_sound  a weaker tier for the same name typed in the other script
+    sound_dob
+    cnic, mobile  father CNIC / mobile alone - brothers and sisters share
+                  these, so they are only shown as "same family"
+
+The name is the folded name's words, sorted, so "Muhammad Ali" and "Ali
+Muhammad" give the same key. The skeleton is search.skeleton() of each word,
+sorted, which also matches "محمد علی" - but it is lossy ("Ali Ahmed" and
+"Ali Muhammad" are both "l md", "Ayesha" and "Asia" both "s"), so brothers
+often share it; similar-name matches never join a strong cluster.
+
+find_duplicates() looks the new application's keys up in the (kind, dup_key)
+index before the insert; new_registration shows the matches as a warning.
+clusters() reads the index once, in key order, and joins applications that
+share a key into clusters for the review report (the "duplicates_report"
+job): strong keys first, then similar-name keys for what is left. `flask reindex-duplicates` fills the table for
+existing rows.
+"""
+import csv
+from datetime import date, datetime
+from itertools import groupby
+
+from search import digits_only, fold_text, normalize_mobile, skeleton
+
+STRONG_KINDS = ("cnic_name", "mobile_name", "name_dob")
+SIMILAR_KINDS = ("cnic_sound", "mobile_sound", "sound_dob")
+FAMILY_KINDS = ("cnic", "mobile")
+KIND_LABELS = {
+    "cnic_name": "same father CNIC and name",
+    "mobile_name": "same mobile and name",
+    "name_dob": "same name and date of birth",
+    "cnic_sound": "same father CNIC and similar name",
+    "mobile_sound": "same mobile and similar name",
+    "sound_dob": "similar name and same date of birth",
+    "cnic": "same father CNIC",
+    "mobile": "same mobile",
+}
+MAX_KEY = 190
+CNIC_DIGITS = 13
+MOBILE_DIGITS = 11
+REPORT_CHUNK = 500
+
+REPORT_COLUMNS = (
+    "cluster", "match", "application_no", "student_name", "father_name", "dob", "father_cnic",
+    "mobile_no", "status", "created_at", "matched_on",
+)
+
+
+# ==== KEYS ====
+def name_key(student_name):
+    return " ".join(sorted(set(fold_text(student_name).split())))
+
+
+def sound_key(student_name):
+    words = sorted({s for w in fold_text(student_name).split() for s in [skeleton(w)] if s})
+    return " ".join(words)
+
+
+def _dob(value):
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    value = (value or "").strip()
+    return value[:10] if len(value) >= 10 else ""
+
+
+def dup_keys(student_name, dob, father_cnic, mobile_no):
+    # -> [(kind, key), ...]; parts that are missing or too short are skipped
+    name = name_key(student_name)
+    sound = sound_key(student_name)
+    born = _dob(dob)
+    cnic = digits_only(father_cnic)
+    cnic = cnic if len(cnic) == CNIC_DIGITS else ""
+    mobile = normalize_mobile(mobile_no)
+    mobile = mobile if len(mobile) == MOBILE_DIGITS else ""
+
+    keys = []
+    if cnic:
+        keys.append(("cnic", cnic))
+    if mobile:
+        keys.append(("mobile", mobile))
+    if name:
+        if cnic:
+            keys.append(("cnic_name", f"{cnic}|{name}"))
+        if mobile:
+            keys.append(("mobile_name", f"{mobile}|{name}"))
+        if born:
+            keys.append(("name_dob", f"{name}|{born}"))
+    if sound:
+        if cnic:
+            keys.append(("cnic_sound", f"{cnic}|{sound}"))
+        if mobile:
+            keys.append(("mobile_sound", f"{mobile}|{sound}"))
+        if born:
+            keys.append(("sound_dob", f"{sound}|{born}"))
+    return [(kind, key[:MAX_KEY]) for kind, key in keys]
+
+
+def index_duplicates(cursor, rows, replace=False):
+    # rows: (application_no, student_name, dob, father_cnic, mobile_no)
+    rows = list(rows)
+    if replace and rows:
+        placeholders = ",".join(["%s"] * len(rows))
+        cursor.execute(f"DELETE FROM application_dup_keys WHERE application_no IN ({placeholders})",
+                       tuple(row[0] for row in rows))
+    values = [(row[0], kind, key) for row in rows for kind, key in dup_keys(*row[1:])]
+    if values:
+        cursor.executemany(
+            "INSERT IGNORE INTO application_dup_keys (application_no, kind, dup_key) VALUES (%s,%s,%s)",
+            values)
+
+
+# ==== LOOKUP ====
+def find_duplicates(cursor, student_name, dob, father_cnic, mobile_no, exclude=None):
+    # -> [(application_no, [kind, ...]), ...], strong, then similar matches first
+    keys = dup_keys(student_name, dob, father_cnic, mobile_no)
+    if not keys:
+        return []
+    conditions = " OR ".join(["(kind=%s AND dup_key=%s)"] * len(keys))
+    cursor.execute(f"SELECT application_no, kind FROM application_dup_keys WHERE {conditions}",
+                   tuple(part for key in keys for part in key))
+    matches = {}
+    for row in cursor.fetchall():
+        number, kind = (row["application_no"], row["kind"]) if isinstance(row, dict) else row
+        if number != exclude:
+            matches.setdefault(number, []).append(kind)
+    return sorted(matches.items(), key=lambda m: (not is_strong(m[1]), not is_similar(m[1]), m[0]))
+
+
+def is_strong(kinds):
+    return any(kind in STRONG_KINDS for kind in kinds)
+
+
+def is_similar(kinds):
+    return any(kind in SIMILAR_KINDS for kind in kinds)
+
+
+def describe(kinds):
+    # The same name also has the same skeleton; only the stronger label is shown
+    shown = STRONG_KINDS + FAMILY_KINDS if is_strong(kinds) else SIMILAR_KINDS + FAMILY_KINDS
+    return ", ".join(KIND_LABELS[kind] for kind in shown if kind in kinds)
+
+
+# ==== CLUSTERING ====
+class _Clusters:
+    # Union-find over application numbers
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, x):
+        root = self.parent.setdefault(x, x)
+        while root != self.parent[root]:
+            root = self.parent[root]
+        while x != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+def _key_rows(cursor, kinds):
+    # (kind, dup_key, application_no) in index order, fetched in chunks
+    placeholders = ",".join(["%s"] * len(kinds))
+    cursor.execute(f"""
+        SELECT kind, dup_key, application_no FROM application_dup_keys
+        WHERE kind IN ({placeholders})
+        ORDER BY kind, dup_key, application_no
+    """, tuple(kinds))
+    while True:
+        rows = cursor.fetchmany(REPORT_CHUNK)
+        if not rows:
+            return
+        for row in rows:
+            yield (row["kind"], row["dup_key"], row["application_no"]) if isinstance(row, dict) else tuple(row)
+
+
+def clusters(cursor, check=None, kinds=STRONG_KINDS):
+    # One ordered pass over `kinds` -> [(application_nos, {no: {kind, ...}})].
+    # Grouped here rather than with GROUP_CONCAT, which group_concat_max_len
+    # would cut off mid-number for a large group
+    found = _Clusters()
+    reasons = {}
+    for i, (key, rows) in enumerate(groupby(_key_rows(cursor, kinds), key=lambda r: r[:2])):
+        if check and i % REPORT_CHUNK == 0:
+            check()
+        numbers = [row[2] for row in rows]
+        if len(numbers) < 2:
+            continue
+        for number in numbers:
+            reasons.setdefault(number, set()).add(key[0])
+            found.union(numbers[0], number)
+
+    groups = {}
+    for number in reasons:
+        groups.setdefault(found.find(number), []).append(number)
+    return [(sorted(members), {n: reasons[n] for n in members})
+            for _, members in sorted(groups.items())]
+
+
+def _similar_clusters(cursor, strong, check=None):
+    # Similar-name clusters that add something: not all inside one strong cluster
+    cluster_of = {n: i for i, (members, _) in enumerate(strong) for n in members}
+    found = []
+    for members, reasons in clusters(cursor, check, SIMILAR_KINDS):
+        owners = {cluster_of.get(n) for n in members}
+        if len(owners) > 1 or owners == {None}:
+            found.append((members, reasons))
+    return found
+
+
+def write_report(cursor, out_path, check=None):
+    # CSV: one row per application in a cluster; duplicate clusters largest
+    # first, then similar-name clusters
+    order = lambda g: (-len(g[0]), g[0][0])
+    strong = sorted(clusters(cursor, check), key=order)
+    similar = sorted(_similar_clusters(cursor, strong, check), key=order)
+    groups = [("duplicate", g) for g in strong] + [("similar name", g) for g in similar]
+    numbers = list(dict.fromkeys(n for _, (members, _) in groups for n in members))
+    details = {}
+    for start in range(0, len(numbers), REPORT_CHUNK):
+        if check:
+            check()
+        chunk = numbers[start:start + REPORT_CHUNK]
+        placeholders = ",".join(["%s"] * len(chunk))
+        cursor.execute(f"""
+            SELECT application_no, student_name, father_name, dob, father_cnic, mobile_no, status, created_at
+            FROM applications WHERE application_no IN ({placeholders})
+        """, tuple(chunk))
+        for row in cursor.fetchall():
+            row = row if isinstance(row, dict) else dict(zip(REPORT_COLUMNS[2:-1], row))
+            details[row["application_no"]] = row
+
+    with open(out_path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(REPORT_COLUMNS)
+        for cluster_no, (match, (members, reasons)) in enumerate(groups, 1):
+            for number in members:
+                row = details.get(number)
+                if row is None:
+                    continue    # deleted since it was indexed
+                writer.writerow([cluster_no, match] + [row[c] for c in REPORT_COLUMNS[2:-1]]
+                                + [describe(reasons[number])])
+    return {"clusters": len(strong), "similar": len(similar), "applications": len(numbers)}
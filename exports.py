@@ -0,0 +1,118 @@
+"""
+Streaming exports for the admin reports.
+
+Rows are read through an unbuffered (server-side) cursor in chunks and fed
+straight into the output, so memory use does not grow with the table:
+
+    CSV  - generated chunk by chunk as a streamed HTTP response
+    XLSX - written row by row with openpyxl's write-only workbook to a temp file
+
+Blob columns are never exported; the selectable columns are listed in
+APPLICATION_EXPORT_COLUMNS.
+"""
+import csv
+import io
+import os
+import tempfile
+
+from db import connect
+from filters import APPLICATIONS
+from queries import APPLICATION_DETAIL_COLUMNS, columns
+
+CHUNK_SIZE = 500
+
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+APPLICATION_EXPORT_COLUMNS = tuple(c for c in APPLICATION_DETAIL_COLUMNS if c != "picture_key")
+
+
+class ExportError(Exception):
+    pass
+
+
+def select_columns(requested, allowed=APPLICATION_EXPORT_COLUMNS):
+    # "a,b,c" from the query string -> validated tuple; empty means all allowed
+    if not requested:
+        return tuple(allowed)
+    names = tuple(name.strip() for name in requested.split(",") if name.strip())
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ExportError(f"Unknown export column(s): {', '.join(unknown)}")
+    return names
+
+
+def applications_query(names=APPLICATION_EXPORT_COLUMNS, filters=None):
+    # (query, params); filters: parsed filters.APPLICATIONS values, as on /report
+    if filters is None:
+        filters, _ = APPLICATIONS.parse({})
+    return APPLICATIONS.query(filters, select=columns(names), order_by="id")
+
+
+def iter_rows(query, params=(), chunk_size=CHUNK_SIZE):
+    # Yields the header row, then data rows, holding one chunk in memory at a time
+    conn = connect()
+    cursor = conn.cursor()
+    finished = False
+    try:
+        cursor.execute(query, params)
+        yield [d[0] for d in cursor.description]
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+        finished = True
+    finally:
+        if finished:
+            cursor.close()
+            conn.close()
+        else:
+            # Abandoned mid-stream (client went away): unread rows are still on
+            # the wire, so drop the connection rather than drain it
+            conn.discard()
+
+
+def with_checks(rows, check, every=CHUNK_SIZE):
+    # Call check() every `every` rows, e.g. to let a background job be cancelled
+    for i, row in enumerate(rows):
+        if i % every == 0:
+            check()
+        yield row
+
+
+def iter_csv(rows, chunk_size=CHUNK_SIZE):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so Excel opens the Urdu text as UTF-8
+    buffer.write("\ufeff")
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+
+def write_xlsx(rows, fileobj, sheet_name="Sheet1"):
+    from openpyxl import Workbook    # ~150 ms to import; only exports need it
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+    for row in rows:
+        sheet.append(list(row))
+    workbook.save(fileobj)
+
+
+def xlsx_tempfile(rows, sheet_name="Sheet1"):
+    # Returns an open, already-unlinked temp file positioned at the start
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        write_xlsx(rows, path, sheet_name)
+        f = open(path, "rb")
+    finally:
+        os.remove(path)
+    return f
@@ -0,0 +1,167 @@
+"""
+Private file storage and delivery: donation receipts and applicant photos.
+
+Receipts are stored like photos (image_store.py): once per content hash,
+sharded two directory levels deep, outside static/ so there is no public URL:
+
+    <RECEIPT_STORE_ROOT>/3f/a2/3fa2...e1.pdf
+
+donations.receipt_path holds the key "<sha256>.<ext>". Receipts saved before
+this (plain filenames under static/receipts) are still served from there until
+`flask migrate-receipts` moves them into the store.
+
+Routes check who may see a file and then call send_protected(). With
+FILE_DELIVERY=accel (production, behind nginx) the response is just headers:
+X-Accel-Redirect names the file under an `internal` nginx location, and nginx
+sends it with sendfile. The bytes never pass through a gunicorn worker:
+
+    location /_protected/receipts/ { internal; alias <RECEIPT_STORE_ROOT>/; }
+
+With FILE_DELIVERY=flask (default, for the dev server) Flask sends the file
+itself.
+
+static/receipts/ and static/uploads/ are no longer served by Flask's static
+route.
+
+Environment: RECEIPT_STORE_ROOT (default media/receipts), FILE_DELIVERY
+(flask | accel), FILE_MAX_AGE seconds (default 3600).
+"""
+import hashlib
+import os
+import re
+import threading
+
+from flask import Response, abort, request, send_file
+
+from image_store import place_file
+
+RECEIPT_STORE_ROOT = os.environ.get("RECEIPT_STORE_ROOT", "media/receipts")
+LEGACY_RECEIPT_FOLDER = "static/receipts"
+FILE_DELIVERY = os.environ.get("FILE_DELIVERY", "flask")
+FILE_MAX_AGE = int(os.environ.get("FILE_MAX_AGE", 3600))
+
+# Files under static/ that must not be public (old upload locations)
+PRIVATE_STATIC = ("receipts/", "uploads/")
+
+# kind -> nginx internal location prefix (see nginx.conf)
+ACCEL_PREFIXES = {
+    "receipts": "/_protected/receipts/",
+    "legacy_receipts": "/_protected/legacy_receipts/",
+    "images": "/_protected/images/",
+}
+
+MIMETYPES = {
+    "pdf": "application/pdf",
+    "jpg": "image/jpeg",
+    "png": "image/png",
+    "gif": "image/gif",
+    "webp": "image/webp",
+    "bmp": "image/bmp",
+}
+
+_KEY_RE = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]{1,5}$")
+CHUNK_SIZE = 64 * 1024
+
+
+class FileStoreError(Exception):
+    pass
+
+
+# ==== STORAGE ====
+def is_key(value):
+    return bool(value) and bool(_KEY_RE.match(value))
+
+
+class ContentStore:
+    def __init__(self, root):
+        self.root = root
+
+    def relative_path(self, key):
+        if not is_key(key):
+            raise FileStoreError(f"Invalid file key: {key!r}")
+        return os.path.join(key[:2], key[2:4], key)
+
+    def path(self, key):
+        return os.path.join(self.root, self.relative_path(key))
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def put_file(self, path, ext, sha256):
+        # Move a staged upload (uploads.StagedUpload) in under its hash; a
+        # file already stored under that hash is kept and `path` dropped
+        key = f"{sha256}.{ext}"
+        place_file(path, self.path(key))
+        return key
+
+    def copy_in(self, path, ext):
+        # Store a copy of an existing file (migrations); `path` is left alone
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+        key = f"{digest.hexdigest()}.{ext}"
+        place_file(path, self.path(key), move=False)
+        return key
+
+
+_receipts = None
+_receipts_lock = threading.Lock()
+
+
+def get_receipt_store():
+    global _receipts
+    if _receipts is None:
+        with _receipts_lock:
+            if _receipts is None:
+                _receipts = ContentStore(RECEIPT_STORE_ROOT)
+    return _receipts
+
+
+def receipt_location(receipt_path):
+    # donations.receipt_path -> (kind, path relative to that kind's root, full path)
+    if is_key(receipt_path):
+        store = get_receipt_store()
+        return "receipts", store.relative_path(receipt_path), store.path(receipt_path)
+    name = os.path.basename(receipt_path or "")
+    if not name or name != receipt_path:
+        raise FileStoreError(f"Invalid receipt path: {receipt_path!r}")
+    return "legacy_receipts", name, os.path.join(LEGACY_RECEIPT_FOLDER, name)
+
+
+def mimetype_for(name):
+    return MIMETYPES.get(name.rsplit(".", 1)[-1].lower(), "application/octet-stream")
+
+
+# ==== DELIVERY ====
+def send_protected(kind, relative_path, full_path, mimetype=None, download_name=None, etag=None,
+                   max_age=FILE_MAX_AGE):
+    # Call only after the route has checked access
+    mimetype = mimetype or mimetype_for(relative_path)
+    if FILE_DELIVERY == "accel":
+        if not os.path.exists(full_path):
+            abort(404)
+        response = Response(mimetype=mimetype)
+        response.headers["X-Accel-Redirect"] = ACCEL_PREFIXES[kind] + relative_path.replace(os.sep, "/")
+        if download_name:
+            response.headers["Content-Disposition"] = f'inline; filename="{download_name}"'
+        if etag:
+            response.set_etag(etag)
+    else:
+        try:
+            response = send_file(full_path, mimetype=mimetype, download_name=download_name,
+                                 etag=etag or True, conditional=True)
+        except FileNotFoundError:
+            abort(404)
+    # Per-user content: browsers may keep it, shared caches may not
+    response.cache_control.no_cache = None
+    response.cache_control.private = True
+    response.cache_control.max_age = max_age
+    return response
+
+
+def init_app(app):
+    @app.before_request
+    def hide_private_static():
+        if request.endpoint == "static" and (request.view_args or {}).get("filename", "").startswith(PRIVATE_STATIC):
+            abort(404)
@@ -0,0 +1,221 @@
+"""
+Declarative filters for the report routes and their exports.
+
+A FilterSpec lists the filters a list accepts; each filter names its query
+argument (plus older aliases still found in bookmarks), how to parse it and
+the SQL condition it adds:
+
+    values, errors = APPLICATIONS.parse(request.args)
+    values.resolve(cursor)                          # probes, see below
+    query, params = APPLICATIONS.query(values)      # no ORDER BY, for list_page()
+    values.key                                      # cache key part
+    values.args                                     # canonical query args
+
+Conditions are always added in spec order and only for filters that are set,
+so the same filters give the same SQL text whatever the order or spelling of
+the query string, and MySQL sees a small, fixed set of statement shapes.
+values.key is built the same way: normalized values ("10" and " 10 " are one
+key, empty filters and "All" are left out).
+
+Invalid values (age "ten", an unknown status) are dropped, and a message for
+each is returned in `errors` for the route to flash.
+
+A filter may also name a probe and a fallback condition (the Student filter:
+FULLTEXT, else LIKE). values.resolve(cursor) runs the probes, once, and
+query() uses the fallback for each probe that found nothing. Call it where
+the query is about to run (inside the cached loader), not on every request;
+unresolved values always use the main condition.
+"""
+from decimal import Decimal, InvalidOperation
+
+from queries import APPLICATION_LIST, like_pattern
+from search import name_filter, name_probe
+
+MAX_TEXT = 100
+STATUSES = ("Pending", "Approved", "Rejected", "Disapproved", "Assigned", "Confirmed", "Sponsored")
+
+
+# ==== PARSERS ====
+# value from the query string -> converted value; ValueError if invalid,
+# None if the filter is not set
+def text(value):
+    value = (value or "").strip()
+    if len(value) > MAX_TEXT:
+        raise ValueError(f"is longer than {MAX_TEXT} characters")
+    return value or None
+
+
+def integer(low, high):
+    def parse(value):
+        value = (value or "").strip()
+        if not value:
+            return None
+        if not value.isdigit() or not low <= int(value) <= high:
+            raise ValueError(f"must be a whole number from {low} to {high}")
+        return int(value)
+    return parse
+
+
+def amount(value):
+    value = (value or "").strip().replace(",", "")
+    if not value:
+        return None
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        raise ValueError("must be a number")
+    if not number.is_finite() or number < 0:
+        raise ValueError("must be zero or more")
+    return number.quantize(Decimal("0.01"))
+
+
+def choice(options, everything="All"):
+    def parse(value):
+        value = (value or "").strip()
+        if not value or value == everything:
+            return None
+        for option in options:
+            if value.lower() == option.lower():
+                return option
+        raise ValueError("must be one of " + ", ".join((everything,) + tuple(options)))
+    return parse
+
+
+# ==== CONDITIONS ====
+# converted value -> (sql, params)
+def equals(column):
+    return lambda value: (f"{column} = %s", [value])
+
+
+def at_least(column):
+    return lambda value: (f"{column} >= %s", [value])
+
+
+def contains(column):
+    return lambda value: (f"{column} LIKE %s", [like_pattern(value)])
+
+
+def names(key_column, name_column):
+    # Student name through the search index (search.name_filter)
+    return lambda value: name_filter(value, key_column, name_column)
+
+
+# ==== SPECS ====
+class Filter:
+    def __init__(self, name, condition, parse=text, aliases=(), label=None, probe=None, fallback=None):
+        # probe: value -> (sql, params) returning a row if `condition` can
+        # match anything, or None; fallback: the condition to use if not
+        self.name = name
+        self.condition = condition
+        self.parse = parse
+        self.aliases = tuple(aliases)
+        self.label = label or name.replace("_", " ").capitalize()
+        self.probe = probe
+        self.fallback = fallback
+
+    def raw(self, args):
+        for arg in (self.name,) + self.aliases:
+            if args.get(arg) not in (None, ""):
+                return args.get(arg)
+        return None
+
+
+class FilterValues:
+    def __init__(self, spec, values):
+        self.spec = spec
+        self.values = values
+        self.fallbacks = None   # filter names, once resolve() has run
+
+    def resolve(self, cursor):
+        if self.fallbacks is not None:
+            return self
+        self.fallbacks = set()
+        for f in self.spec.filters:
+            probe = f.probe(self.values[f.name]) if f.probe and f.name in self.values else None
+            if probe is not None:
+                cursor.execute(*probe)
+                if not cursor.fetchall():
+                    self.fallbacks.add(f.name)
+        return self
+
+    def get(self, name, default=""):
+        value = self.values.get(name)
+        return default if value is None else value
+
+    @property
+    def args(self):
+        # Canonical query string arguments, e.g. for export links
+        return {name: str(value) for name, value in self.values.items()}
+
+    @property
+    def key(self):
+        return [self.spec.name] + [[name, str(value)] for name, value in self.values.items()]
+
+
+class FilterSpec:
+    def __init__(self, name, base_query, select, filters):
+        # base_query: "SELECT {select} FROM ... WHERE 1=1"; select: default columns
+        self.name = name
+        self.base_query = base_query
+        self.select = select
+        self.filters = list(filters)
+
+    def parse(self, args, forced=None):
+        # args: request.args or a dict; forced: {name: value} that the
+        # caller sets regardless of args (a registrar's own mobile)
+        values, errors = {}, []
+        forced = forced or {}
+        for f in self.filters:
+            if f.name in forced:
+                value = forced[f.name]
+            else:
+                try:
+                    value = f.parse(f.raw(args))
+                except ValueError as e:
+                    errors.append(f"{f.label} {e}; filter ignored")
+                    continue
+            if value is not None:
+                values[f.name] = value
+        return FilterValues(self, values), errors
+
+    def query(self, values, select=None, order_by=None):
+        query = self.base_query.format(select=select or self.select)
+        params = []
+        for f in self.filters:
+            if f.name in values.values:
+                condition = f.fallback if f.name in (values.fallbacks or ()) else f.condition
+                sql, extra = condition(values.values[f.name])
+                query += f" AND {sql}"
+                params += extra
+        if order_by:
+            query += f" ORDER BY {order_by}"
+        return query, params
+
+
+# status_report, report, /export_excel and the applications export job;
+# see migrations/008 for the indexes behind each condition
+APPLICATIONS = FilterSpec("applications", "SELECT {select} FROM applications WHERE 1=1", APPLICATION_LIST, [
+    Filter("mobile", equals("mobile_no")),
+    Filter("status", equals("status"), choice(STATUSES)),
+    Filter("student", names("application_no", "student_name"), aliases=("student_filter",),
+           label="Student", probe=name_probe, fallback=contains("student_name")),
+    Filter("class", contains("class"), aliases=("class_filter",)),
+    Filter("age", equals("age"), integer(0, 120), aliases=("age_filter",)),
+    Filter("min_income", at_least("father_income"), amount, aliases=("income_filter",),
+           label="Father income"),
+])
+
+# donor_assignments and its export job
+DONATIONS = FilterSpec("donations", """
+        SELECT {select}
+        FROM applications a
+        JOIN donations d ON a.application_no = d.application_no
+        LEFT JOIN users u ON d.donor_id = u.id
+        WHERE 1=1""", """a.application_no, a.student_name, a.father_name,
+               d.name AS donor_name, u.mobile AS donor_mobile, d.receipt_path,
+               a.status, d.created_at, d.id AS donation_id""", [
+    Filter("student_name", names("a.application_no", "a.student_name"), label="Student",
+           probe=name_probe, fallback=contains("a.student_name")),
+    Filter("donor_name", contains("d.name"), label="Donor"),
+    Filter("application_no", contains("a.application_no"), label="Application no"),
+])
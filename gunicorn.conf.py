@@ -0,0 +1,60 @@
+"""
+gunicorn settings for afaqschool.service:
+
+    gunicorn -c gunicorn.conf.py
+
+Worker model: gthread by default, so each worker process serves
+GUNICORN_THREADS requests at once. Most of a request is spent waiting on
+MySQL, and the old 3 sync workers meant 3 requests at a time in total. Every
+shared object in app.py (DB pool, caches, metrics, job runner, PDF pool) is
+locked or per thread, and DB_POOL_SIZE follows the thread count unless set.
+
+GUNICORN_WORKER_CLASS=gevent (pip install gevent) serves many more slow
+clients per worker; DB_USE_PURE=1 is then set, because the mysql-connector C
+extension would block the event loop.
+
+preload_app: the master imports app.py once and calls create_app(warm=True),
+which also imports the lazily imported libraries and compiles the templates.
+Workers are forked from it: they start at once and share those pages. A
+reload (HUP) forks new workers from the same master, so new code needs a new
+master: `systemctl restart afaqschool`, or auto_deploy.sh, which stops the
+service, kills any gunicorn left over and starts a fresh master in the
+background on 127.0.0.1:8000. Set GUNICORN_PRELOAD=0 to load the app in each
+worker instead and reload code with HUP.
+
+Measure with `python -m bench.startup`.
+
+Environment: GUNICORN_BIND, GUNICORN_WORKERS (default 3), GUNICORN_WORKER_CLASS
+(gthread | gevent | sync), GUNICORN_THREADS (default 4),
+GUNICORN_WORKER_CONNECTIONS (gevent, default 100), GUNICORN_PRELOAD (default
+1), GUNICORN_TIMEOUT seconds (default 120).
+"""
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "unix:/var/www/afaqschool/afaqschool.sock")
+umask = 0o007
+
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.environ.get("GUNICORN_WORKERS", 3))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 100))
+
+if worker_class == "gevent":
+    os.environ.setdefault("DB_USE_PURE", "1")
+    os.environ.setdefault("DB_POOL_SIZE", str(min(worker_connections, 10)))
+elif worker_class == "gthread":
+    os.environ.setdefault("DB_POOL_SIZE", str(threads))
+
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+wsgi_app = "app:create_app(warm=True)" if preload_app else "app:create_app()"
+
+# gthread / gevent workers heartbeat from the main loop, so this only ends
+# requests that are truly stuck (large exports and PDFs run as jobs)
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then (per-worker caches, fragmentation); the jitter
+# keeps them from all restarting at once
+max_requests = 2000
+max_requests_jitter = 200
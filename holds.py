@@ -0,0 +1,138 @@
+"""
+Short-lived donor holds on approved applications.
+
+During a donation drive many donors open the same student at once. Before
+this, donor_confirm inserted a donation and set status 'Assigned' without
+checking anything, so two donors could pay for one child. Locking the table
+would serialize every donor; instead each step is one conditional UPDATE of
+the application row (migrations/014), and InnoDB locks just that row:
+
+    place()    "Donate" on donor_view. Succeeds if the row is Approved and
+               not held, held by the same donor (renewal), or its hold has
+               expired. Sets held_by / held_until and bumps hold_version.
+    confirm()  the receipt POST. Succeeds only for the donor holding it, with
+               the hold_version from the confirm form, before held_until;
+               sets Assigned and clears the hold in the same UPDATE.
+    release()  the donor gives the student back.
+    sweep()    clears expired holds in one UPDATE (index on held_until).
+
+If an UPDATE matches no row, somebody else won; nothing waits on a lock held
+across requests. hold_version means a stale confirm form (e.g. from before
+the hold expired and was placed again) cannot confirm the newer hold.
+
+Held students are left out of the donor dashboard (held_until IS NULL), so
+expired holds come back once swept. donor_dashboard sweeps at most every
+HOLD_SWEEP_INTERVAL seconds per worker; `flask sweep-holds` does it from cron.
+
+Environment: HOLD_MINUTES (default 15), HOLD_SWEEP_INTERVAL seconds
+(default 30).
+"""
+import os
+import threading
+import time
+
+from stats import STATUS_PREFIX, bump
+
+HOLD_MINUTES = int(os.environ.get("HOLD_MINUTES", 15))
+HOLD_SWEEP_INTERVAL = float(os.environ.get("HOLD_SWEEP_INTERVAL", 30))
+MAX_HOLDER = 150
+HOLD_COLUMNS = ("application_no", "held_by", "held_until", "hold_version")
+
+
+class HoldError(Exception):
+    pass
+
+
+def holder_for(user):
+    # Same "name - mobile" string donor_confirm stores in donations.name
+    return f"{user['name']} - {user['mobile']}"[:MAX_HOLDER]
+
+
+def _fetch_hold(cursor):
+    row = cursor.fetchone()
+    if row is not None and not isinstance(row, dict):
+        row = dict(zip(HOLD_COLUMNS, row))
+    return row
+
+
+# ==== HOLDS ====
+def place(cursor, application_no, holder, minutes=HOLD_MINUTES):
+    # -> the hold {application_no, held_by, held_until, hold_version}
+    cursor.execute("""
+        UPDATE applications
+        SET held_by=%s, held_until=NOW() + INTERVAL %s MINUTE, hold_version=hold_version + 1
+        WHERE application_no=%s AND status='Approved'
+          AND (held_by IS NULL OR held_by=%s OR held_until < NOW())
+    """, (holder, minutes, application_no, holder))
+    if cursor.rowcount != 1:
+        raise HoldError("Another donor is already sponsoring this student. Please choose another.")
+    cursor.execute(f"SELECT {', '.join(HOLD_COLUMNS)} FROM applications WHERE application_no=%s",
+                   (application_no,))
+    return _fetch_hold(cursor)
+
+
+def current(cursor, application_no, holder):
+    # The donor's live hold on this application, or None
+    cursor.execute(f"""
+        SELECT {', '.join(HOLD_COLUMNS)} FROM applications
+        WHERE application_no=%s AND status='Approved' AND held_by=%s AND held_until >= NOW()
+    """, (application_no, holder))
+    return _fetch_hold(cursor)
+
+
+def held_by(cursor, holder):
+    # The donor's live holds, soonest to expire first
+    cursor.execute("""
+        SELECT application_no, student_name, held_until, hold_version FROM applications
+        WHERE held_by=%s AND status='Approved' AND held_until >= NOW()
+        ORDER BY held_until
+    """, (holder,))
+    return cursor.fetchall()
+
+
+def confirm(cursor, application_no, holder, version):
+    # Approved -> Assigned for the hold owner; run in the donation's transaction
+    cursor.execute("""
+        UPDATE applications
+        SET status='Assigned', held_by=NULL, held_until=NULL, hold_version=hold_version + 1
+        WHERE application_no=%s AND status='Approved'
+          AND held_by=%s AND hold_version=%s AND held_until >= NOW()
+    """, (application_no, holder, version))
+    if cursor.rowcount != 1:
+        raise HoldError("Your reservation has expired or was released. "
+                        "Please reserve the student again before uploading the receipt.")
+    bump(cursor, {STATUS_PREFIX + "Approved": -1, STATUS_PREFIX + "Assigned": 1})
+
+
+def release(cursor, application_no, holder):
+    cursor.execute("""
+        UPDATE applications SET held_by=NULL, held_until=NULL, hold_version=hold_version + 1
+        WHERE application_no=%s AND held_by=%s
+    """, (application_no, holder))
+    return cursor.rowcount == 1
+
+
+# ==== SWEEP ====
+def sweep(cursor):
+    # Clear every expired hold; -> number cleared
+    cursor.execute("""
+        UPDATE applications SET held_by=NULL, held_until=NULL, hold_version=hold_version + 1
+        WHERE held_until < NOW()
+    """)
+    return cursor.rowcount
+
+
+class Sweeper:
+    # Runs sweep() at most every `interval` seconds per process
+    def __init__(self, interval=HOLD_SWEEP_INTERVAL):
+        self.interval = interval
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def due(self):
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next:
+                return False
+            self._next = now + self.interval
+            return True
@@ -0,0 +1,266 @@
+"""
+Content-addressed storage for applicant photos.
+
+A photo is written once under the SHA-256 of its bytes, sharded into two
+directory levels so no single directory grows too large:
+
+    <root>/3f/a2/3fa2...e1.jpg          original, exactly as uploaded
+    <root>/3f/a2/3fa2...e1.medium.jpg   downscaled to fit MEDIUM px
+    <root>/3f/a2/3fa2...e1.thumb.jpg    downscaled to fit THUMB px
+
+The key stored in applications.picture_key is "<sha256>.<ext>". Uploading the
+same photo twice yields the same key and no extra files. put() writes the
+derivatives at once; put_file() (streamed uploads) leaves them to a background
+job calling ensure_derivatives(), and read() serves the original until then.
+
+get_image_store() returns the store configured by IMAGE_STORE (only "file" for
+now); another backend just has to implement put/path/read/exists/delete.
+"""
+import errno
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+SIZES = {
+    "thumb": 160,
+    "medium": 640,
+}
+
+# (magic prefix, mimetype, extension)
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png", "png"),
+    (b"GIF87a", "image/gif", "gif"),
+    (b"GIF89a", "image/gif", "gif"),
+    (b"BM", "image/bmp", "bmp"),
+)
+
+
+class ImageStoreError(Exception):
+    pass
+
+
+def sniff_image_type(data):
+    # Return (mimetype, extension) from the leading bytes, or (None, None)
+    head = bytes(data[:16])
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp", "webp"
+    for magic, mimetype, ext in _SIGNATURES:
+        if head.startswith(magic):
+            return mimetype, ext
+    return None, None
+
+
+def mimetype_for_key(key):
+    ext = key.rsplit(".", 1)[-1].lower()
+    for _, mimetype, known in _SIGNATURES:
+        if known == ext:
+            return mimetype
+    if ext == "webp":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+class FileImageStore:
+    def __init__(self, root, sizes=None):
+        self.root = root
+        self.sizes = dict(SIZES if sizes is None else sizes)
+
+    # ---- keys & paths ----
+    def _digest(self, key):
+        digest = key.split(".", 1)[0]
+        if len(digest) != 64 or any(c not in "0123456789abcdef" for c in digest):
+            raise ImageStoreError(f"Invalid image key: {key!r}")
+        return digest
+
+    def path(self, key, size=None):
+        digest = self._digest(key)
+        folder = os.path.join(self.root, digest[:2], digest[2:4])
+        if size is None or size == "original":
+            return os.path.join(folder, key)
+        if size not in self.sizes:
+            raise ImageStoreError(f"Unknown image size: {size!r}")
+        return os.path.join(folder, f"{digest}.{size}.jpg")
+
+    def relative_path(self, key, size=None):
+        return os.path.relpath(self.path(key, size), self.root)
+
+    # ---- read / write ----
+    def put(self, data):
+        mimetype, ext = sniff_image_type(data)
+        if mimetype is None:
+            raise ImageStoreError("Uploaded file is not a supported image")
+
+        key = f"{hashlib.sha256(data).hexdigest()}.{ext}"
+        original = self.path(key)
+        if not os.path.exists(original):
+            _atomic_write(original, data)
+        self.ensure_derivatives(key)
+        return key
+
+    def put_file(self, path, ext, sha256):
+        # Move an already-hashed staged upload in as the original. Derivatives
+        # are left to ensure_derivatives(), normally from a background job.
+        key = f"{sha256}.{ext}"
+        place_file(path, self.path(key))
+        return key
+
+    def ensure_derivatives(self, key):
+        # Returns the sizes that had to be written
+        written = []
+        for size in self.sizes:
+            if not os.path.exists(self.path(key, size)):
+                self._write_derivative(key, size)
+                written.append(size)
+        return written
+
+    def _write_derivative(self, key, size):
+        bound = self.sizes[size]
+        try:
+            with Image.open(self.path(key)) as img:
+                img = ImageOps.exif_transpose(img)
+                img.thumbnail((bound, bound))
+                if img.mode not in ("RGB", "L"):
+                    img = img.convert("RGB")
+                out = BytesIO()
+                img.save(out, format="JPEG", quality=82, optimize=True, progressive=True)
+        except OSError as e:
+            raise ImageStoreError(f"Could not resize image: {e}")
+        _atomic_write(self.path(key, size), out.getvalue())
+
+    def exists(self, key, size=None):
+        return os.path.exists(self.path(key, size))
+
+    def read(self, key, size=None):
+        path = self.path(key, size)
+        if size not in (None, "original") and not os.path.exists(path):
+            # Derivative missing (e.g. sizes added later): fall back to original
+            path = self.path(key)
+        with open(path, "rb") as f:
+            return f.read()
+
+    def delete(self, key):
+        for size in [None] + list(self.sizes):
+            try:
+                os.remove(self.path(key, size))
+            except FileNotFoundError:
+                pass
+
+
+def _atomic_write(path, data):
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=folder, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def place_file(path, target, move=True):
+    # Put the file at `path` in a content-addressed store at `target` (also
+    # used by files.ContentStore). An existing target holds the same bytes and
+    # is kept. A move within one filesystem is a rename; anything else is
+    # copied to a temp file beside `target` and renamed over it, so readers
+    # never see part of a file. move=False leaves `path` alone.
+    if os.path.exists(target):
+        if move:
+            os.remove(path)
+        return
+    folder = os.path.dirname(target)
+    os.makedirs(folder, exist_ok=True)
+    if move:
+        try:
+            os.replace(path, target)
+            return
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+    fd, tmp = tempfile.mkstemp(dir=folder, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as out, open(path, "rb") as f:
+            shutil.copyfileobj(f, out)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp, target)
+    except Exception:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+    if move:
+        os.remove(path)
+
+
+class ImageCache:
+    # Byte-capped LRU of image bodies, keyed by ETag. One per worker process.
+    def __init__(self, max_bytes, max_item_bytes=None):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes or max_bytes // 8
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, etag):
+        with self._lock:
+            item = self._items.get(etag)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(etag)
+            self.hits += 1
+            return item
+
+    def put(self, etag, data, mimetype, last_modified=None):
+        if len(data) > self.max_item_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(etag, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._items[etag] = (data, mimetype, last_modified)
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, (evicted, _, _) = self._items.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {"items": len(self._items), "bytes": self._bytes,
+                    "max_bytes": self.max_bytes, "hits": self.hits, "misses": self.misses}
+
+
+# ==== CONFIGURED STORE ====
+BACKENDS = {
+    "file": lambda: FileImageStore(os.environ.get("IMAGE_STORE_ROOT", "media/images")),
+}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_image_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                backend = os.environ.get("IMAGE_STORE", "file")
+                if backend not in BACKENDS:
+                    raise ImageStoreError(f"Unknown IMAGE_STORE backend: {backend!r}")
+                _store = BACKENDS[backend]()
+    return _store
@@ -0,0 +1,313 @@
+"""
+Bulk import of applications from CSV / XLSX sheets filled in offline.
+
+The sheet is read row by row (csv.reader, or openpyxl in read-only mode), so
+memory holds one batch, not the file. Each row is validated on its own; good
+rows are inserted BATCH_SIZE at a time in one transaction per batch:
+
+    allocate(cursor, count=n)          one block of application numbers
+    executemany(APPLICATION_INSERT)    one multi-row INSERT
+    index_applications(...)            search rows, same transaction
+    record_new_application(cursor, n)  summary counters, same transaction
+
+Rejected rows go to an error report (CSV: sheet row number, names, reasons).
+Values are checked against the column sizes, so a bad cell rejects its row;
+if MySQL still refuses a batch (DataError), it is retried row by row and the
+refused rows go to the report too.
+Headers are matched by name, so an export from /export_excel can be fed back
+in; unknown columns (id, application_no, status, ...) are ignored and every
+imported row gets a new number with status Pending.
+"""
+import csv
+import os
+import re
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+import mysql.connector
+from mysql.connector import errorcode
+
+from db import db_connection, db_cursor
+from duplicates import index_duplicates
+from queries import APPLICATION_INSERT
+from search import digits_only, index_applications, normalize_mobile
+from sequences import allocate, format_application_no, skip_past_existing
+from stats import record_new_application
+
+BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", 500))
+IMPORT_EXTENSIONS = (".csv", ".xlsx")
+
+# Sheet column -> field, after lower-casing and turning spaces into "_"
+IMPORT_COLUMNS = (
+    "student_name", "father_name", "dob", "age", "class", "sabika_school",
+    "father_cnic", "mobile_no", "father_income", "is_orphan", "loss_flood",
+    "donation_percentage",
+)
+REQUIRED_COLUMNS = ("student_name", "father_name", "mobile_no")
+HEADER_ALIASES = {
+    "mobile": "mobile_no",
+    "class_name": "class",
+    "cnic": "father_cnic",
+    "income": "father_income",
+    "donation_percent": "donation_percentage",
+}
+
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y-%m-%d %H:%M:%S")
+AGE_TOLERANCE = 1
+MAX_AGE = 120
+# varchar sizes in applications (afaqschool.sql)
+MAX_LENGTHS = {
+    "student_name": 100, "father_name": 100, "class": 50, "sabika_school": 100,
+    "father_cnic": 20,
+}
+# decimal(10,2) / decimal(12,2): largest absolute value
+MAX_AMOUNTS = {"father_income": Decimal("99999999.99"), "loss_flood": Decimal("9999999999.99")}
+_MOBILE_RE = re.compile(r"^03\d{9}$")
+_YES = {"yes", "y", "true", "1", "ہاں"}
+_NO = {"no", "n", "false", "0", "نہیں", ""}
+
+
+class ImportFileError(Exception):
+    pass
+
+
+# ==== READING ====
+def _header_names(cells):
+    names = []
+    for cell in cells:
+        name = re.sub(r"\s+", "_", str(cell or "").strip().lower())
+        names.append(HEADER_ALIASES.get(name, name))
+    missing = [name for name in REQUIRED_COLUMNS if name not in names]
+    if missing:
+        raise ImportFileError(f"Missing column(s): {', '.join(missing)}")
+    return names
+
+
+def _rows(path):
+    # Yields raw rows (lists of cell values), header first
+    if path.lower().endswith(".csv"):
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            yield from csv.reader(f)
+    elif path.lower().endswith(".xlsx"):
+        from openpyxl import load_workbook    # slow import; only .xlsx imports need it
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            yield from workbook.active.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+    else:
+        raise ImportFileError("Only .csv and .xlsx files can be imported")
+
+
+def iter_records(path):
+    # Yields (sheet row number, {field: value}); blank lines are skipped
+    rows = _rows(path)
+    header = next(rows, None)
+    if header is None:
+        raise ImportFileError("The file is empty")
+    names = _header_names(header)
+    for number, row in enumerate(rows, start=2):
+        if not any(str(cell).strip() for cell in row if cell is not None):
+            continue
+        yield number, {name: row[i] for i, name in enumerate(names)
+                       if name in IMPORT_COLUMNS and i < len(row)}
+
+
+# ==== VALIDATION ====
+def _text(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)      # Excel stores CNIC / mobile as numbers
+    return str(value).strip()
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = _text(value)
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(text)
+
+
+def _age_on(dob, today):
+    return today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
+
+
+def _decimal(value, field, errors):
+    text = _text(value).replace(",", "")
+    if not text:
+        return None
+    try:
+        number = Decimal(text)
+    except InvalidOperation:
+        errors.append(f"{field}: not a number")
+        return None
+    if not number.is_finite():
+        errors.append(f"{field}: not a number")
+        return None
+    if number < 0:
+        errors.append(f"{field}: negative")
+    elif field in MAX_AMOUNTS and number > MAX_AMOUNTS[field]:
+        errors.append(f"{field}: too large")
+    return number
+
+
+def _check_length(value, field, errors):
+    if value and len(value) > MAX_LENGTHS[field]:
+        errors.append(f"{field}: longer than {MAX_LENGTHS[field]} characters")
+
+
+def validate(record, today=None):
+    # -> (fields for APPLICATION_INSERT after application_no, [error, ...])
+    today = today or date.today()
+    errors = []
+
+    student_name = _text(record.get("student_name"))
+    father_name = _text(record.get("father_name"))
+    if not student_name:
+        errors.append("student_name: required")
+    if not father_name:
+        errors.append("father_name: required")
+
+    mobile = normalize_mobile(_text(record.get("mobile_no")))
+    if not _MOBILE_RE.match(mobile):
+        errors.append("mobile_no: expected 03xxxxxxxxx")
+
+    cnic = _text(record.get("father_cnic"))
+    if cnic and len(digits_only(cnic)) != 13:
+        errors.append("father_cnic: expected 13 digits")
+
+    dob = None
+    if _text(record.get("dob")):
+        try:
+            dob = _parse_date(record["dob"])
+        except ValueError:
+            errors.append("dob: unrecognised date")
+        else:
+            if dob >= today:
+                errors.append("dob: in the future")
+
+    age = None
+    if _text(record.get("age")):
+        try:
+            age = int(Decimal(_text(record["age"])))
+        except (InvalidOperation, ValueError, OverflowError):    # "x", NaN, Infinity
+            errors.append("age: not a number")
+        else:
+            if not 0 <= age <= MAX_AGE:
+                errors.append(f"age: must be 0-{MAX_AGE}")
+    if dob and dob < today:
+        expected = _age_on(dob, today)
+        if age is None:
+            age = expected
+        elif abs(age - expected) > AGE_TOLERANCE:
+            errors.append(f"age: {age} does not match dob ({expected})")
+
+    income = _decimal(record.get("father_income"), "father_income", errors)
+    loss_flood = _decimal(record.get("loss_flood"), "loss_flood", errors)
+    percent = _decimal(record.get("donation_percentage"), "donation_percentage", errors)
+    if percent is not None and not 0 <= percent <= 100:
+        errors.append("donation_percentage: must be 0-100")
+
+    orphan = _text(record.get("is_orphan")).casefold()
+    if orphan not in _YES and orphan not in _NO:
+        errors.append("is_orphan: expected Yes or No")
+
+    class_name = _text(record.get("class"))
+    school = _text(record.get("sabika_school"))
+    for field, value in (("student_name", student_name), ("father_name", father_name),
+                         ("class", class_name), ("sabika_school", school), ("father_cnic", cnic)):
+        _check_length(value, field, errors)
+
+    fields = (
+        student_name, father_name, dob, age, class_name or None,
+        school or None, cnic or None, mobile,
+        income, "Yes" if orphan in _YES else "No", loss_flood,
+        int(percent) if percent is not None else None,
+        None,   # picture_key: sheets carry no photos
+    )
+    return fields, errors
+
+
+# ==== WRITING ====
+def insert_batch(batch, user_id="1"):
+    # batch: [fields, ...] -> application numbers, in the same order
+    for attempt in range(2):
+        try:
+            with db_connection() as conn:
+                cursor = conn.cursor()
+                numbers = [format_application_no(n) for n in allocate(cursor, count=len(batch))]
+                cursor.executemany(APPLICATION_INSERT, [
+                    (number,) + fields + ("Pending", user_id) for number, fields in zip(numbers, batch)
+                ])
+                index_applications(cursor, [
+                    (number, fields[0], fields[1], fields[6], fields[7])
+                    for number, fields in zip(numbers, batch)
+                ])
+                index_duplicates(cursor, [
+                    (number, fields[0], fields[2], fields[6], fields[7])
+                    for number, fields in zip(numbers, batch)
+                ])
+                record_new_application(cursor, len(batch))
+                conn.commit()
+                cursor.close()
+            return numbers
+        except mysql.connector.IntegrityError as e:
+            # A legacy row holds a number in the block: move past it, retry once
+            if e.errno != errorcode.ER_DUP_ENTRY or attempt:
+                raise
+            with db_cursor(commit=True) as cursor:
+                skip_past_existing(cursor)
+
+
+def import_file(path, report_path, check_cancelled=None, batch_size=BATCH_SIZE):
+    # Returns a summary dict; rejected rows are written to report_path (CSV)
+    summary = {"imported": 0, "rejected": 0, "first_application_no": None,
+               "last_application_no": None}
+    batch = []    # (sheet row number, fields)
+
+    def imported(numbers):
+        summary["imported"] += len(numbers)
+        summary["first_application_no"] = summary["first_application_no"] or numbers[0]
+        summary["last_application_no"] = numbers[-1]
+
+    def reject(number, fields, errors):
+        summary["rejected"] += 1
+        writer.writerow([number, fields[0], fields[1], "; ".join(errors)])
+
+    def flush():
+        try:
+            imported(insert_batch([fields for _, fields in batch]))
+        except mysql.connector.DataError:
+            # A value validate() let through; the batch was rolled back, so
+            # insert row by row and report the ones MySQL refuses
+            for number, fields in batch:
+                try:
+                    imported(insert_batch([fields]))
+                except mysql.connector.DataError as e:
+                    reject(number, fields, [f"database: {e.msg}"])
+        batch.clear()
+        if check_cancelled:
+            check_cancelled()
+
+    with open(report_path, "w", encoding="utf-8-sig", newline="") as report:
+        writer = csv.writer(report)
+        writer.writerow(["row", "student_name", "father_name", "errors"])
+        for number, record in iter_records(path):
+            fields, errors = validate(record)
+            if errors:
+                reject(number, fields, errors)
+                continue
+            batch.append((number, fields))
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    return summary
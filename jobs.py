@@ -0,0 +1,310 @@
+"""
+Background jobs for heavy exports and reports.
+
+Jobs are rows in a local SQLite database (JOBS_DIR/jobs.sqlite3), so every
+gunicorn worker sees the same queue without an outside broker. Each job kind
+belongs to a queue with its own limit: "default" for exports, imports and
+reports, "uploads" for the quick tidy-ups after an upload (thumbnails,
+receipt re-encoding), so new photos never wait behind a long export. Each
+worker process starts one small runner thread per queue on first use (the
+first submit() or request); runners claim queued jobs atomically, so at most
+the queue's limit of its jobs execute at once across all workers. Finished
+files are written to JOBS_DIR and removed together with their row once they
+are older than JOBS_TTL seconds.
+
+A job kind is a function registered with @job_kind("name"):
+
+    @job_kind("applications_export")
+    def run(params, out_path, check_cancelled):
+        ...  # write the result to out_path, call check_cancelled() now and then
+        return {"filename": "applications.xlsx", "mimetype": "..."}
+
+Environment:
+    JOBS_DIR            where the queue and results live (default var/jobs)
+    JOBS_MAX_RUNNING    concurrent "default" jobs across all workers (default 1)
+    JOBS_MAX_UPLOADS    concurrent "uploads" jobs across all workers (default 2)
+    JOBS_TTL            seconds a finished job is kept (default 86400)
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+
+JOBS_DIR = os.environ.get("JOBS_DIR", "var/jobs")
+MAX_RUNNING = int(os.environ.get("JOBS_MAX_RUNNING", 1))
+# queue -> jobs of its kinds running at once across all workers
+QUEUES = {
+    "default": MAX_RUNNING,
+    "uploads": int(os.environ.get("JOBS_MAX_UPLOADS", 2)),
+}
+TTL = int(os.environ.get("JOBS_TTL", 24 * 3600))
+POLL_INTERVAL = 1.0
+# A running job whose worker has not touched it for this long is presumed dead;
+# _run() touches it every HEARTBEAT_INTERVAL while the job function runs
+STALE_AFTER = 300
+HEARTBEAT_INTERVAL = 30
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+_kinds = {}
+_queues = {}    # kind -> queue
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobError(Exception):
+    pass
+
+
+def job_kind(name, queue="default"):
+    if queue not in QUEUES:
+        raise JobError(f"Unknown job queue: {queue}")
+
+    def register(func):
+        _kinds[name] = func
+        _queues[name] = queue
+        return func
+    return register
+
+
+# ==== STORAGE ====
+def _db():
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(JOBS_DIR, "jobs.sqlite3"), timeout=30,
+                           isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            owner TEXT,
+            params TEXT NOT NULL,
+            status TEXT NOT NULL,
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            result TEXT,
+            error TEXT,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL,
+            heartbeat_at REAL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+    return conn
+
+
+def output_path(job_id):
+    return os.path.join(JOBS_DIR, f"{job_id}.out")
+
+
+def _as_dict(row):
+    if row is None:
+        return None
+    job = dict(row)
+    job["params"] = json.loads(job["params"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+def submit(kind, params, owner=None):
+    if kind not in _kinds:
+        raise JobError(f"Unknown job kind: {kind}")
+    job_id = uuid.uuid4().hex
+    conn = _db()
+    try:
+        conn.execute(
+            "INSERT INTO jobs (id, kind, owner, params, status, created_at) VALUES (?,?,?,?,?,?)",
+            (job_id, kind, owner, json.dumps(params), QUEUED, time.time()),
+        )
+    finally:
+        conn.close()
+    ensure_runner()
+    return job_id
+
+
+def get(job_id):
+    conn = _db()
+    try:
+        return _as_dict(conn.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone())
+    finally:
+        conn.close()
+
+
+def cancel(job_id):
+    # Queued jobs are cancelled at once; running ones stop at their next check
+    conn = _db()
+    try:
+        conn.execute(
+            "UPDATE jobs SET status=?, finished_at=? WHERE id=? AND status=?",
+            (CANCELLED, time.time(), job_id, QUEUED),
+        )
+        conn.execute(
+            "UPDATE jobs SET cancel_requested=1 WHERE id=? AND status=?",
+            (job_id, RUNNING),
+        )
+    finally:
+        conn.close()
+
+
+def cleanup(now=None):
+    now = now or time.time()
+    conn = _db()
+    try:
+        # Runner died mid-job (worker killed / restarted)
+        conn.execute(
+            "UPDATE jobs SET status=?, error=?, finished_at=? WHERE status=? AND heartbeat_at < ?",
+            (FAILED, "Worker stopped while running", now, RUNNING, now - STALE_AFTER),
+        )
+        expired = [r["id"] for r in conn.execute(
+            "SELECT id FROM jobs WHERE status IN (?,?,?) AND finished_at < ?",
+            FINISHED + (now - TTL,),
+        )]
+        for job_id in expired:
+            try:
+                os.remove(output_path(job_id))
+            except FileNotFoundError:
+                pass
+            conn.execute("DELETE FROM jobs WHERE id=?", (job_id,))
+        return len(expired)
+    finally:
+        conn.close()
+
+
+# ==== RUNNER ====
+def _claim(conn, queue):
+    kinds = tuple(kind for kind, q in _queues.items() if q == queue)
+    if not kinds:
+        return None
+    in_queue = f"kind IN ({','.join('?' * len(kinds))})"
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        running = conn.execute(f"SELECT COUNT(*) FROM jobs WHERE status=? AND {in_queue}",
+                               (RUNNING,) + kinds).fetchone()[0]
+        if running >= QUEUES[queue]:
+            conn.execute("COMMIT")
+            return None
+        row = conn.execute(
+            f"SELECT * FROM jobs WHERE status=? AND {in_queue} ORDER BY created_at LIMIT 1",
+            (QUEUED,) + kinds,
+        ).fetchone()
+        if row is not None:
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status=?, started_at=?, heartbeat_at=? WHERE id=?",
+                (RUNNING, now, now, row["id"]),
+            )
+        conn.execute("COMMIT")
+        return _as_dict(row)
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _heartbeat(job_id, stop):
+    # Runs beside the job function, so a long step that never calls
+    # check_cancelled() (one big query, image work) is not taken for dead
+    while not stop.wait(HEARTBEAT_INTERVAL):
+        try:
+            conn = _db()
+            try:
+                conn.execute("UPDATE jobs SET heartbeat_at=? WHERE id=? AND status=?",
+                             (time.time(), job_id, RUNNING))
+            finally:
+                conn.close()
+        except Exception:
+            traceback.print_exc()
+
+
+def _run(job):
+    job_id = job["id"]
+
+    def check_cancelled():
+        conn = _db()
+        try:
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE id=?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None or row[0]:
+            raise JobCancelled()
+
+    path = output_path(job_id)
+    stop = threading.Event()
+    beat = threading.Thread(target=_heartbeat, args=(job_id, stop),
+                            name=f"job-heartbeat-{job_id[:8]}", daemon=True)
+    beat.start()
+    try:
+        result = _kinds[job["kind"]](job["params"], path, check_cancelled)
+        status, error = DONE, None
+    except JobCancelled:
+        result, status, error = None, CANCELLED, None
+    except Exception as e:
+        result, status, error = None, FAILED, f"{e}\n{traceback.format_exc(limit=5)}"
+    finally:
+        stop.set()
+        beat.join()
+    if status != DONE:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    conn = _db()
+    try:
+        conn.execute(
+            "UPDATE jobs SET status=?, result=?, error=?, finished_at=? WHERE id=?",
+            (status, json.dumps(result) if result else None, error, time.time(), job_id),
+        )
+    finally:
+        conn.close()
+
+
+def _runner_loop(queue):
+    last_cleanup = 0
+    while True:
+        try:
+            if queue == "default" and time.time() - last_cleanup > 60:
+                cleanup()
+                last_cleanup = time.time()
+            conn = _db()
+            try:
+                job = _claim(conn, queue)
+            finally:
+                conn.close()
+            if job is None:
+                time.sleep(POLL_INTERVAL)
+                continue
+            _run(job)
+        except Exception:
+            traceback.print_exc()
+            time.sleep(POLL_INTERVAL)
+
+
+_runners = {}
+_runner_pid = None
+_runner_lock = threading.Lock()
+
+
+def ensure_runner():
+    # One daemon runner thread per queue per process, started lazily (never
+    # before fork); cheap enough to call on every request
+    global _runner_pid
+    if _runner_pid == os.getpid() and all(t.is_alive() for t in _runners.values()):
+        return
+    with _runner_lock:
+        if _runner_pid != os.getpid():
+            _runners.clear()    # threads do not survive fork
+            _runner_pid = os.getpid()
+        for queue in QUEUES:
+            runner = _runners.get(queue)
+            if runner is None or not runner.is_alive():
+                runner = threading.Thread(target=_runner_loop, args=(queue,),
+                                          name=f"job-runner-{queue}", daemon=True)
+                _runners[queue] = runner
+                runner.start()
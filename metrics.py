@@ -0,0 +1,406 @@
+"""
+Per-request instrumentation for app.py, exported at /metrics (Prometheus).
+
+For every request, keyed by route rule (e.g. "/review/<application_no>"):
+
+    afaq_http_request_duration_seconds   histogram of latency
+    afaq_http_requests_total             by status code
+    afaq_http_response_bytes_total       bytes sent (streamed bodies counted as sent;
+                                         send_file() bodies by Content-Length, so
+                                         the server can still use sendfile)
+    afaq_db_queries_per_request          histogram of DB round-trips
+    afaq_db_query_seconds_total          time inside execute()/executemany()
+    afaq_db_connection_seconds_total     time connections were checked out
+    afaq_db_connection_wait_seconds_total  time spent getting one (pool + connect)
+    afaq_slow_queries_total              statements slower than SLOW_QUERY_MS
+
+Statements slower than SLOW_QUERY_MS are also logged to the
+"afaqschool.slow_query" logger with whitespace collapsed and every parameter
+replaced by its type and length, so no CNIC / mobile / name reaches the log.
+
+Numbers are kept per worker process and written to METRICS_DIR/<pid>.json
+every few seconds; /metrics adds up the files of all live workers, so a scrape
+sees the whole gunicorn service whichever worker answers it. When a worker has
+exited (gunicorn recycles them after max_requests), its last snapshot is
+folded into METRICS_DIR/retired.json before its file is removed, so the
+service-wide counters never go down (Prometheus would read that as a reset).
+Each snapshot records its process's start time as well as its pid, so a new
+process that happens to get a dead worker's pid does not keep it "alive".
+
+With SERVER_TIMING=1 every response carries a Server-Timing header
+(app, db, conn) that browser dev tools show in the network panel.
+
+Environment: METRICS_DIR (default var/metrics), SLOW_QUERY_MS (200),
+SERVER_TIMING (0), METRICS_TOKEN (bearer token for scrapers; admins can
+always read /metrics).
+"""
+import fcntl
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from flask import request
+
+METRICS_DIR = os.environ.get("METRICS_DIR", "var/metrics")
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 200))
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "0") == "1"
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+FLUSH_INTERVAL = 5.0
+RETIRED = "retired"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+PREFIX = "afaq_"
+HELP = {
+    "http_request_duration_seconds": ("histogram", "Request latency by route"),
+    "http_requests_total": ("counter", "Requests by route, method and status"),
+    "http_response_bytes_total": ("counter", "Response body bytes by route"),
+    "db_queries_per_request": ("histogram", "Database round-trips per request"),
+    "db_query_seconds_total": ("counter", "Time spent in execute()/executemany()"),
+    "db_connection_seconds_total": ("counter", "Time database connections were checked out"),
+    "db_connection_wait_seconds_total": ("counter", "Time spent acquiring connections"),
+    "slow_queries_total": ("counter", "Statements slower than SLOW_QUERY_MS"),
+}
+
+slow_log = logging.getLogger("afaqschool.slow_query")
+
+
+# ==== REGISTRY ====
+class Registry:
+    # Counters and histograms keyed by (name, sorted label items)
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value, buckets):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = {"buckets": list(buckets),
+                                               "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(hist["buckets"]):
+                if value <= bound:
+                    hist["counts"][i] += 1
+            hist["sum"] += value
+            hist["count"] += 1
+
+    def dump(self):
+        with self._lock:
+            return {
+                "counters": [[name, dict(labels), value] for (name, labels), value in self.counters.items()],
+                "histograms": [[name, dict(labels), dict(hist, counts=list(hist["counts"]))]
+                               for (name, labels), hist in self.histograms.items()],
+            }
+
+
+def merge(dumps):
+    total = Registry()
+    for data in dumps:
+        for name, labels, value in data.get("counters", []):
+            total.inc(name, labels, value)
+        for name, labels, hist in data.get("histograms", []):
+            key = (name, tuple(sorted(labels.items())))
+            mine = total.histograms.get(key)
+            if mine is None or mine["buckets"] != hist["buckets"]:
+                total.histograms[key] = dict(hist, counts=list(hist["counts"]))
+                continue
+            mine["counts"] = [a + b for a, b in zip(mine["counts"], hist["counts"])]
+            mine["sum"] += hist["sum"]
+            mine["count"] += hist["count"]
+    return total
+
+
+def _num(value):
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(round(float(value), 6))
+
+
+def _labels(labels, extra=None):
+    items = dict(labels, **(extra or {}))
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for v in items.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(items, escaped)) + "}"
+
+
+def render_prometheus(registry):
+    lines = []
+    by_name = {}
+    for (name, labels), value in registry.counters.items():
+        by_name.setdefault(name, []).append(("c", labels, value))
+    for (name, labels), hist in registry.histograms.items():
+        by_name.setdefault(name, []).append(("h", labels, hist))
+
+    for name in sorted(by_name):
+        kind, text = HELP.get(name, ("untyped", name))
+        full = PREFIX + name
+        lines.append(f"# HELP {full} {text}")
+        lines.append(f"# TYPE {full} {kind}")
+        for entry_kind, labels, value in sorted(by_name[name], key=lambda e: e[1]):
+            labels = dict(labels)
+            if entry_kind == "c":
+                lines.append(f"{full}{_labels(labels)} {_num(value)}")
+                continue
+            for bound, count in zip(value["buckets"], value["counts"]):
+                lines.append(f"{full}_bucket{_labels(labels, {'le': f'{bound:g}'})} {count}")
+            lines.append(f"{full}_bucket{_labels(labels, {'le': '+Inf'})} {value['count']}")
+            lines.append(f"{full}_sum{_labels(labels)} {_num(value['sum'])}")
+            lines.append(f"{full}_count{_labels(labels)} {value['count']}")
+    return "\n".join(lines) + "\n"
+
+
+# ==== SLOW QUERY LOG ====
+_WHITESPACE = re.compile(r"\s+")
+
+
+def redact(params):
+    # Types and sizes only: ('str:13', 'int', 'None')
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {k: redact([v])[0] for k, v in params.items()}
+    out = []
+    for value in params:
+        if value is None:
+            out.append("None")
+        elif isinstance(value, (str, bytes, bytearray)):
+            out.append(f"{type(value).__name__}:{len(value)}")
+        elif isinstance(value, (list, tuple)):
+            out.append(f"{type(value).__name__}:{len(value)}")
+        else:
+            out.append(type(value).__name__)
+    return tuple(out)
+
+
+# ==== PER-REQUEST STATE ====
+class _RequestStats:
+    __slots__ = ("start", "queries", "query_seconds", "conn_seconds", "conn_wait", "recorded")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.conn_seconds = 0.0
+        self.conn_wait = 0.0
+        self.recorded = False
+
+
+class Instrumentation:
+    # db.set_observer() target and Flask request hooks
+    def __init__(self, directory=METRICS_DIR, slow_ms=SLOW_QUERY_MS, server_timing=SERVER_TIMING):
+        self.directory = directory
+        self.slow_seconds = slow_ms / 1000.0
+        self.server_timing = server_timing
+        self.registry = Registry()
+        self._local = threading.local()
+        self._pid = os.getpid()
+        self._last_flush = 0.0
+
+    # ---- db observer ----
+    def _current(self):
+        return getattr(self._local, "stats", None)
+
+    def _route(self):
+        return getattr(self._local, "route", None) or "-"
+
+    def on_query(self, statement, params, seconds, many):
+        stats = self._current()
+        if stats is not None:
+            stats.queries += 1
+            stats.query_seconds += seconds
+        if seconds >= self.slow_seconds:
+            route = self._route()
+            self.registry.inc("slow_queries_total", {"route": route})
+            sql = _WHITESPACE.sub(" ", statement if isinstance(statement, str) else repr(statement)).strip()
+            shown = f"{len(params)} rows" if many and params is not None else redact(params)
+            slow_log.warning("slow query %.1f ms route=%s sql=%s params=%s",
+                             seconds * 1000, route, sql[:2000], shown)
+
+    def on_connection(self, wait_seconds, held_seconds):
+        stats = self._current()
+        if stats is not None:
+            stats.conn_wait += wait_seconds
+            stats.conn_seconds += held_seconds
+
+    # ---- flask hooks ----
+    def init_app(self, app):
+        app.before_request(self._before)
+        app.after_request(self._after)
+        app.teardown_request(self._teardown)
+
+    def _before(self):
+        self._local.stats = _RequestStats()
+        self._local.route = request.url_rule.rule if request.url_rule else "unmatched"
+
+    def _record(self, stats, status):
+        # Once per request, from _after() or, when it never ran, _teardown()
+        stats.recorded = True
+        route = self._route()
+        elapsed = time.perf_counter() - stats.start
+        labels = {"route": route}
+        reg = self.registry
+        reg.observe("http_request_duration_seconds", labels, elapsed, LATENCY_BUCKETS)
+        reg.inc("http_requests_total", {"route": route, "method": request.method,
+                                        "status": str(status)})
+        reg.observe("db_queries_per_request", labels, stats.queries, QUERY_COUNT_BUCKETS)
+        reg.inc("db_query_seconds_total", labels, stats.query_seconds)
+        reg.inc("db_connection_seconds_total", labels, stats.conn_seconds)
+        reg.inc("db_connection_wait_seconds_total", labels, stats.conn_wait)
+        return labels, elapsed
+
+    def _after(self, response):
+        stats = self._current()
+        if stats is None:
+            return response
+        labels, elapsed = self._record(stats, response.status_code)
+        reg = self.registry
+
+        if response.is_streamed and not response.direct_passthrough:
+            response.response = self._counting(response.response, labels)
+        else:
+            reg.inc("http_response_bytes_total", labels, response.content_length or 0)
+
+        if self.server_timing:
+            response.headers["Server-Timing"] = (
+                f'app;dur={elapsed * 1000:.1f}, '
+                f'db;dur={stats.query_seconds * 1000:.1f};desc="{stats.queries} queries", '
+                f'conn;dur={stats.conn_seconds * 1000:.1f}'
+            )
+        return response
+
+    def _counting(self, body, labels):
+        # Streamed bodies (CSV exports): count bytes as they are sent
+        sent = 0
+        try:
+            for chunk in body:
+                sent += len(chunk)
+                yield chunk
+        finally:
+            self.registry.inc("http_response_bytes_total", labels, sent)
+            close = getattr(body, "close", None)
+            if close:
+                close()
+
+    def _teardown(self, exc):
+        # An exception that escaped every handler (PROPAGATE_EXCEPTIONS, or
+        # one raised by an after_request hook) skips _after(); count it as a 500
+        stats = self._current()
+        if stats is not None and not stats.recorded:
+            self._record(stats, 500)
+        self._local.stats = None
+        self._local.route = None
+        self.maybe_flush()
+
+    # ---- sharing across workers ----
+    def _path(self, pid):
+        return os.path.join(self.directory, f"{pid}.json")
+
+    def maybe_flush(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_flush < FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+        pid = os.getpid()
+        if pid != self._pid:
+            # Forked after import: start from zero, the parent's numbers are its own
+            self._pid = pid
+            self.registry = Registry()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = self._path(pid) + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(dict(self.registry.dump(), started=_start_time(pid)), f)
+            os.replace(tmp, self._path(pid))
+        except OSError:
+            pass
+
+    def _read(self, name):
+        try:
+            with open(self._path(name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _retire(self, pids):
+        # Fold exited workers into retired.json; the lock keeps two workers
+        # collecting at once from adding the same snapshot twice
+        with open(os.path.join(self.directory, ".retire.lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            dumps = [self._read(RETIRED) or {}]
+            gone = []
+            for pid in pids:
+                if os.path.exists(self._path(pid)):
+                    dumps.append(self._read(pid) or {})
+                    gone.append(pid)
+            if not gone:
+                return
+            tmp = self._path(RETIRED) + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(merge(dumps).dump(), f)
+            os.replace(tmp, self._path(RETIRED))
+            for pid in gone:
+                os.remove(self._path(pid))
+
+    def collect(self):
+        # Merge the snapshots of every live worker (this one flushed first)
+        # and of the retired ones
+        self.maybe_flush(force=True)
+        live, dead = [], []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json") and name[:-5].isdigit():
+                pid = int(name[:-5])
+                data = self._read(pid)
+                if data is None:
+                    continue
+                if _alive(pid, data.get("started")):
+                    live.append(data)
+                else:
+                    dead.append(pid)
+        if dead:
+            try:
+                self._retire(dead)
+            except OSError:
+                pass
+        return merge(d for d in live + [self._read(RETIRED)] if d)
+
+    def authorized(self, user):
+        if user and user.get("role") == "admin":
+            return True
+        header = request.headers.get("Authorization", "")
+        return bool(METRICS_TOKEN) and header == f"Bearer {METRICS_TOKEN}"
+
+
+def _start_time(pid):
+    # Clock ticks since boot at which `pid` started (Linux /proc), or None
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # Field 22; the command name (field 2) may itself contain spaces
+    return int(stat.rsplit(")", 1)[1].split()[19])
+
+
+def _alive(pid, started=None):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    # Same pid, different start time: the worker exited and the pid was reused
+    now = _start_time(pid) if started is not None else None
+    return now is None or now == started
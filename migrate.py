@@ -0,0 +1,56 @@
+"""
+Schema migrations for the afaqschool database.
+
+Each file in migrations/ is applied once, in file-name order, and recorded in
+the schema_migrations table. Run with:
+
+    flask --app app migrate
+"""
+import os
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+
+def _statements(sql):
+    statement = []
+    for line in sql.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith("--"):
+            continue
+        statement.append(line)
+        if stripped.endswith(";"):
+            yield "\n".join(statement).rstrip().rstrip(";")
+            statement = []
+    if statement:
+        yield "\n".join(statement)
+
+
+def pending_migrations(cursor, folder=MIGRATIONS_DIR):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            name varchar(100) NOT NULL PRIMARY KEY,
+            applied_at timestamp NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("SELECT name FROM schema_migrations")
+    applied = {row[0] for row in cursor.fetchall()}
+    return [name for name in sorted(os.listdir(folder))
+            if name.endswith(".sql") and name not in applied]
+
+
+def apply_migrations(conn, folder=MIGRATIONS_DIR, echo=print):
+    cursor = conn.cursor()
+    try:
+        names = pending_migrations(cursor, folder)
+        for name in names:
+            echo(f"Applying {name}")
+            with open(os.path.join(folder, name), encoding="utf-8") as f:
+                sql = f.read()
+            # MySQL DDL commits implicitly, so each migration should be re-runnable
+            for statement in _statements(sql):
+                cursor.execute(statement)
+            cursor.execute("INSERT INTO schema_migrations (name) VALUES (%s)", (name,))
+            conn.commit()
+        return names
+    finally:
+        cursor.close()
@@ -0,0 +1,4 @@
+-- Photos move out of applications.picture into the image store (image_store.py).
+-- picture_key is "<sha256>.<ext>"; picture stays until `flask migrate-images` drains it.
+ALTER TABLE applications
+  ADD COLUMN picture_key varchar(80) COLLATE utf8mb4_unicode_ci DEFAULT NULL AFTER picture;
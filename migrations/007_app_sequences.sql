@@ -0,0 +1,15 @@
+-- Counter rows for sequences.py; application numbers are allocated from here
+-- inside the insert transaction instead of via SELECT MAX(id).
+CREATE TABLE IF NOT EXISTS app_sequences (
+  name varchar(50) COLLATE utf8mb4_unicode_ci NOT NULL,
+  next_value bigint NOT NULL,
+  PRIMARY KEY (name)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Start after the highest number already handed out (APP-0021 -> 22)
+INSERT INTO app_sequences (name, next_value)
+SELECT 'application_no',
+       GREATEST(COALESCE(MAX(id), 0),
+                COALESCE(MAX(CAST(SUBSTRING(application_no, 5) AS UNSIGNED)), 0)) + 1
+FROM applications
+ON DUPLICATE KEY UPDATE next_value = next_value;
@@ -0,0 +1,15 @@
+-- Access paths of status_report, report, review and donor_dashboard.
+-- Each index ends in created_at so "ORDER BY created_at DESC" is read in index
+-- order instead of a filesort. Check plans with `flask check-plans`.
+ALTER TABLE applications
+  ADD KEY idx_applications_mobile_created (mobile_no, created_at),
+  ADD KEY idx_applications_status_created (status, created_at),
+  ADD KEY idx_applications_age_created (age, created_at),
+  ADD KEY idx_applications_created (created_at),
+  ADD KEY idx_applications_income (father_income),
+  -- used by prefix matching (NAME_MATCH=prefix): LIKE 'term%'
+  ADD KEY idx_applications_student_name (student_name),
+  ADD KEY idx_applications_class (class);
+
+ALTER TABLE donations
+  ADD KEY idx_donations_created (created_at);
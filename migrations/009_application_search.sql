@@ -0,0 +1,13 @@
+-- Side table for search.py: folded names + skeletons under an ngram FULLTEXT
+-- index, and digits-only CNIC / mobile for prefix lookups.
+-- Fill it for existing rows with `flask reindex-search`.
+CREATE TABLE IF NOT EXISTS application_search (
+  application_no varchar(20) COLLATE utf8mb4_unicode_ci NOT NULL,
+  search_text varchar(1000) COLLATE utf8mb4_unicode_ci NOT NULL,
+  cnic_digits varchar(20) COLLATE utf8mb4_unicode_ci DEFAULT NULL,
+  mobile_digits varchar(20) COLLATE utf8mb4_unicode_ci DEFAULT NULL,
+  PRIMARY KEY (application_no),
+  KEY idx_search_cnic (cnic_digits),
+  KEY idx_search_mobile (mobile_digits),
+  FULLTEXT KEY ft_search_text (search_text) WITH PARSER ngram
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,27 @@
+-- Counters for stats.py, updated in the same transaction as the write routes.
+-- Seeded from the existing rows; `flask rebuild-stats` recomputes them later.
+CREATE TABLE IF NOT EXISTS app_stats (
+  name varchar(50) COLLATE utf8mb4_unicode_ci NOT NULL,
+  value decimal(14,2) NOT NULL DEFAULT 0,
+  PRIMARY KEY (name)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS donation_daily (
+  day date NOT NULL,
+  donations int NOT NULL DEFAULT 0,
+  PRIMARY KEY (day)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+INSERT INTO app_stats (name, value)
+SELECT CONCAT('status:', COALESCE(status, 'Pending')), COUNT(*)
+FROM applications GROUP BY COALESCE(status, 'Pending')
+ON DUPLICATE KEY UPDATE value = VALUES(value);
+
+INSERT INTO app_stats (name, value)
+SELECT 'sponsored_total', COALESCE(SUM(total), 0) FROM students
+ON DUPLICATE KEY UPDATE value = VALUES(value);
+
+INSERT INTO donation_daily (day, donations)
+SELECT DATE(created_at), COUNT(*) FROM donations
+WHERE created_at IS NOT NULL GROUP BY DATE(created_at)
+ON DUPLICATE KEY UPDATE donations = VALUES(donations);
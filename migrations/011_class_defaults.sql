@@ -0,0 +1,11 @@
+-- Per-class fee defaults for bulk approval (bulk_review.py). Edited at
+-- /admin/class_defaults; class_name matches applications.class.
+CREATE TABLE IF NOT EXISTS class_defaults (
+  class_name varchar(50) COLLATE utf8mb4_unicode_ci NOT NULL,
+  section varchar(50) COLLATE utf8mb4_unicode_ci DEFAULT NULL,
+  fee decimal(10,2) NOT NULL DEFAULT 0,
+  books decimal(10,2) NOT NULL DEFAULT 0,
+  uniform decimal(10,2) NOT NULL DEFAULT 0,
+  updated_at timestamp NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (class_name)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
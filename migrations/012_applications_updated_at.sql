@@ -0,0 +1,6 @@
+-- Row version for templating.py's per-row fragment cache: MySQL sets it on
+-- every UPDATE that changes the row. Microseconds, so two changes within one
+-- second still get different versions. Existing rows start at migration time.
+ALTER TABLE applications
+  ADD COLUMN updated_at timestamp(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6)
+    ON UPDATE CURRENT_TIMESTAMP(6) AFTER created_at;
@@ -0,0 +1,11 @@
+-- Blocking keys for duplicates.py: normalized father CNIC, mobile and student
+-- name skeleton (+ date of birth), one row per key. Looked up by (kind, dup_key)
+-- at registration; grouped by the same index for the duplicates report.
+-- Fill it for existing rows with `flask reindex-duplicates`.
+CREATE TABLE IF NOT EXISTS application_dup_keys (
+  application_no varchar(20) COLLATE utf8mb4_unicode_ci NOT NULL,
+  kind varchar(16) COLLATE utf8mb4_unicode_ci NOT NULL,
+  dup_key varchar(190) COLLATE utf8mb4_unicode_ci NOT NULL,
+  PRIMARY KEY (application_no, kind, dup_key),
+  KEY idx_dup_keys_key (kind, dup_key, application_no)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,11 @@
+-- Donor holds (holds.py): who is sponsoring an Approved application, until
+-- when, and a version bumped by every hold change so a stale confirm form
+-- cannot confirm a newer hold. held_by is donations.name ("name - mobile").
+ALTER TABLE applications
+  ADD COLUMN held_by varchar(150) COLLATE utf8mb4_unicode_ci DEFAULT NULL,
+  ADD COLUMN held_until datetime DEFAULT NULL,
+  ADD COLUMN hold_version int unsigned NOT NULL DEFAULT 0,
+  -- sweep(): WHERE held_until < NOW()
+  ADD KEY idx_applications_held_until (held_until),
+  -- a donor's own holds on the dashboard
+  ADD KEY idx_applications_held_by (held_by);
@@ -0,0 +1,7 @@
+-- Folded student name alone, for the report filters (search.name_filter):
+-- search_text also holds the father's name and lossy skeletons, which suit
+-- ranked /search but not a "Student" filter. NULL until `flask reindex-search`
+-- rewrites the row; such rows are matched with LIKE meanwhile.
+ALTER TABLE application_search
+  ADD COLUMN name_text varchar(300) COLLATE utf8mb4_unicode_ci DEFAULT NULL AFTER search_text,
+  ADD FULLTEXT KEY ft_search_name (name_text) WITH PARSER ngram;
@@ -0,0 +1,175 @@
+"""
+Keyset (cursor) pagination for the list routes.
+
+Lists are ordered newest first on (created_at, id). A page token encodes the
+key of the last (or first) row shown, so the next page is
+
+    ... AND (created_at < %s OR created_at IS NULL OR (created_at = %s AND id < %s))
+    ORDER BY created_at DESC, id DESC LIMIT n+1
+
+which reads n+1 rows off the (…, created_at) indexes no matter how deep the
+page is, unlike OFFSET. The extra row tells us whether another page exists.
+The condition is spelled out because MySQL does not range-scan the row
+constructor form (created_at, id) < (%s, %s). MySQL sorts NULL lowest, so
+rows without a created_at come last, and the condition includes them.
+
+Page size comes from ?size= (capped at MAX_PAGE_SIZE). Totals are optional
+and cached per filter for COUNT_TTL seconds so paging does not re-count.
+"""
+import base64
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+PAGE_SIZE = int(os.environ.get("PAGE_SIZE", 50))
+MAX_PAGE_SIZE = 200
+COUNT_TTL = int(os.environ.get("PAGE_COUNT_TTL", 60))
+# Show "N total" on list pages (one cached COUNT(*) per filter)
+PAGE_TOTALS = os.environ.get("PAGE_TOTALS", "1") == "1"
+
+NEXT, PREV = "n", "p"
+
+
+class PaginationError(Exception):
+    pass
+
+
+class Page:
+    def __init__(self, rows, next_token=None, prev_token=None, size=PAGE_SIZE, total=None):
+        self.rows = rows
+        self.next_token = next_token
+        self.prev_token = prev_token
+        self.size = size
+        self.total = total
+
+
+def page_size(value):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+# ==== TOKENS ====
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_token(direction, values):
+    raw = json.dumps([direction] + [_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_token(token, key_count):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction, values = data[0], [_decode_value(v) for v in data[1:]]
+    except (ValueError, TypeError, IndexError):
+        raise PaginationError("Invalid page token")
+    if direction not in (NEXT, PREV) or len(values) != key_count:
+        raise PaginationError("Invalid page token")
+    return direction, values
+
+
+# ==== QUERIES ====
+def _beyond(exprs, values, direction):
+    # Rows after `values` in the list's order: past the first key, or equal
+    # on it and beyond on the rest. Every key but the last (unique, NOT NULL)
+    # may be NULL, which sorts lowest
+    expr, value = exprs[0], values[0]
+    op = "<" if direction == NEXT else ">"
+    if len(exprs) == 1:
+        return f"{expr} {op} %s", [value]
+    rest, rest_params = _beyond(exprs[1:], values[1:], direction)
+    if value is None:
+        past, params = (None, []) if direction == NEXT else (f"{expr} IS NOT NULL", [])
+        tie, tie_params = f"{expr} IS NULL", []
+    else:
+        past, params = f"{expr} {op} %s", [value]
+        if direction == NEXT:
+            past += f" OR {expr} IS NULL"
+        tie, tie_params = f"{expr} = %s", [value]
+    tied = f"({tie} AND ({rest}))"
+    if past is None:
+        return tied, tie_params + rest_params
+    return f"{past} OR {tied}", params + tie_params + rest_params
+
+
+def page_query(query, params, keys, token=None, size=PAGE_SIZE):
+    # Wrap a "SELECT ... WHERE ..." (no ORDER BY / LIMIT) into one page.
+    # keys: [(sql_expression, row_field), ...], most significant first; the
+    # list is ordered by them descending. Returns (sql, params, direction).
+    exprs = [expr for expr, _ in keys]
+    params = list(params)
+    direction = NEXT
+    if token:
+        direction, values = decode_token(token, len(keys))
+        condition, extra = _beyond(exprs, values, direction)
+        query += f" AND ({condition})"
+        params += extra
+    order = "DESC" if direction == NEXT else "ASC"
+    query += " ORDER BY " + ", ".join(f"{expr} {order}" for expr in exprs)
+    query += " LIMIT %s"
+    params.append(size + 1)
+    return query, params, direction
+
+
+def fetch_page(cursor, query, params, keys, token=None, size=PAGE_SIZE, total=None):
+    # cursor must be a dictionary cursor
+    sql, sql_params, direction = page_query(query, params, keys, token, size)
+    cursor.execute(sql, tuple(sql_params))
+    return page_from_rows(cursor.fetchall(), keys, token, size, direction, total)
+
+
+def page_from_rows(rows, keys, token, size, direction, total=None):
+    # Second half of fetch_page, for callers that run page_query() themselves
+    # (donor_api.py with an async driver)
+    has_more = len(rows) > size
+    rows = rows[:size]
+    if direction == PREV:
+        rows.reverse()
+
+    def key_of(row):
+        return [row[field] for _, field in keys]
+
+    next_token = prev_token = None
+    if rows:
+        if has_more or direction == PREV:
+            next_token = encode_token(NEXT, key_of(rows[-1]))
+        if token and (has_more or direction == NEXT):
+            prev_token = encode_token(PREV, key_of(rows[0]))
+    return Page(rows, next_token, prev_token, size, total)
+
+
+# ==== CACHED TOTALS ====
+_counts = {}
+_counts_lock = threading.Lock()
+
+
+def cached_count(cursor, query, params, ttl=COUNT_TTL):
+    cache_key = (query, tuple(str(p) for p in params))
+    now = time.monotonic()
+    with _counts_lock:
+        hit = _counts.get(cache_key)
+        if hit and hit[1] > now:
+            return hit[0]
+    cursor.execute(f"SELECT COUNT(*) AS total FROM ({query}) AS counted", tuple(params))
+    row = cursor.fetchone()
+    total = row["total"] if isinstance(row, dict) else row[0]
+    with _counts_lock:
+        if len(_counts) > 1000:
+            _counts.clear()
+        _counts[cache_key] = (total, now + ttl)
+    return total
@@ -0,0 +1,511 @@
+"""
+PDF reports: the filtered applications report (/report/pdf) and a one-page
+sponsorship sheet per student (/sponsorship/<application_no>.pdf).
+
+Rendering runs in a small process pool (PDF_WORKERS "spawn" processes per
+gunicorn worker, started on first use), so a long report burns CPU in a child
+process instead of the web worker. The child reads the rows itself through an
+unbuffered cursor (exports.iter_rows) and writes pages as they fill, so memory
+does not grow with the report. Two renderers:
+
+    builtin      the small PDF writer below: Helvetica tables, one compressed
+                 content stream per page, written out page by page. The core
+                 PDF fonts cover Latin text only; other characters print as "?".
+    wkhtmltopdf  renders templates/report_pdf.html / sponsorship_pdf.html in
+                 chunks of PDF_HTML_CHUNK rows and joins them in one
+                 wkhtmltopdf run. Needs the binary and an Urdu font
+                 (fonts-noto), and then prints Urdu names as typed.
+
+Finished files are cached in PDF_CACHE_DIR under a hash of the report, its
+filters and a data version read with one aggregate query:
+
+    report   COUNT(*) and MAX(updated_at) of the filtered rows (migrations/012
+             bumps updated_at on every change to a row)
+    sheet    the application's updated_at and its students row
+
+so a repeat download of unchanged data is a file send. Files beyond
+PDF_CACHE_MAX_FILES are removed least recently used first. Reports over
+PDF_SYNC_ROWS rows are rendered by the "pdf_report" background job instead of
+inside the request.
+
+Environment: PDF_RENDERER (auto | builtin | wkhtmltopdf; auto picks
+wkhtmltopdf when it is on PATH), PDF_WORKERS (default 2), PDF_CACHE_DIR
+(default var/pdf), PDF_CACHE_MAX_FILES (default 200), PDF_SYNC_ROWS (default
+2000), PDF_TIMEOUT seconds (default 300), PDF_HTML_CHUNK rows (default 500).
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from db import configure as configure_db, db_cursor
+from exports import iter_rows
+from filters import APPLICATIONS
+from queries import columns
+from settings import DB_CONFIG
+
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", 2))
+PDF_CACHE_DIR = os.environ.get("PDF_CACHE_DIR", "var/pdf")
+PDF_CACHE_MAX_FILES = int(os.environ.get("PDF_CACHE_MAX_FILES", 200))
+PDF_SYNC_ROWS = int(os.environ.get("PDF_SYNC_ROWS", 2000))
+PDF_TIMEOUT = float(os.environ.get("PDF_TIMEOUT", 300))
+PDF_HTML_CHUNK = int(os.environ.get("PDF_HTML_CHUNK", 500))
+WKHTMLTOPDF = shutil.which("wkhtmltopdf")
+PDF_RENDERER = os.environ.get("PDF_RENDERER", "auto")
+if PDF_RENDERER == "auto":
+    PDF_RENDERER = "wkhtmltopdf" if WKHTMLTOPDF else "builtin"
+
+# Bump when a layout changes, so cached files from the old layout are not served
+LAYOUT_VERSION = 1
+PDF_MIMETYPE = "application/pdf"
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+WAIT_SLICE = 1.0      # seconds between cancellation checks while waiting
+
+REPORT_COLUMNS = (
+    # field, heading, share of the table width
+    ("id", "ID", 0.06),
+    ("application_no", "Application No", 0.13),
+    ("student_name", "Student", 0.21),
+    ("father_name", "Father", 0.21),
+    ("mobile_no", "Mobile", 0.12),
+    ("status", "Status", 0.10),
+    ("created_at", "Created", 0.17),
+)
+
+SHEET_QUERY = """
+    SELECT a.application_no, a.student_name, a.father_name, a.dob, a.age, a.class,
+           a.mobile_no, a.is_orphan, a.status, a.updated_at,
+           s.class_name, s.section, s.fee, s.books, s.uniform, s.total
+    FROM applications a
+    LEFT JOIN students s ON a.application_no = s.application_no
+    WHERE a.application_no = %s
+"""
+SHEET_FIELDS = (
+    ("application_no", "Application No"), ("student_name", "Student Name"),
+    ("father_name", "Father Name"), ("dob", "Date of Birth"), ("age", "Age"),
+    ("class", "Class Applied For"), ("class_name", "Class"), ("section", "Section"),
+    ("mobile_no", "Mobile"), ("is_orphan", "Orphan"), ("status", "Status"),
+)
+SHEET_FEES = (("fee", "Fee"), ("books", "Books"), ("uniform", "Uniform"), ("total", "Total"))
+
+
+class PdfReportError(Exception):
+    pass
+
+
+# ==== WRITER ====
+# Helvetica advance widths (1/1000 em) for ASCII 32..126, from the core AFM
+_HELVETICA = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+BOLD_FACTOR = 1.08    # Helvetica-Bold runs about this much wider
+ELLIPSIS = "…"
+
+
+def text_width(text, size, bold=False):
+    units = sum(_HELVETICA[ord(ch) - 32] if 32 <= ord(ch) < 127 else 556 for ch in text)
+    return units * size / 1000 * (BOLD_FACTOR if bold else 1)
+
+
+def fit(text, width, size, bold=False):
+    # Cut `text` with an ellipsis so it fits in `width` points
+    if text_width(text, size, bold) <= width:
+        return text
+    while text and text_width(text + ELLIPSIS, size, bold) > width:
+        text = text[:-1]
+    return text + ELLIPSIS
+
+
+def _literal(text):
+    data = text.encode("cp1252", errors="replace")
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+class Page:
+    # Drawing operations for one page; y is measured from the top edge
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.ops = []
+
+    def text(self, x, y, text, size=9, bold=False):
+        font = b"/F2" if bold else b"/F1"
+        self.ops.append(b"BT %s %g Tf %.2f %.2f Td %s Tj ET" % (
+            font, size, x, self.height - y, _literal(text)))
+
+    def line(self, x1, y1, x2, y2, width=0.5):
+        self.ops.append(b"%g w %.2f %.2f m %.2f %.2f l S" % (
+            width, x1, self.height - y1, x2, self.height - y2))
+
+    def fill(self, x, y, w, h, gray=0.87):
+        self.ops.append(b"q %g g %.2f %.2f %.2f %.2f re f Q" % (gray, x, self.height - y - h, w, h))
+
+    def content(self):
+        return b"\n".join(self.ops)
+
+
+class PdfWriter:
+    # Writes objects as they are produced; only the page list stays in memory.
+    # Object 1 is the catalog, 2 the page tree, 3 and 4 the fonts.
+    def __init__(self, f, title=""):
+        self.f = f
+        self.offsets = {}
+        self.page_ids = []
+        self.next_id = 5
+        self.title = title
+        self.f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        for number, name in ((3, b"Helvetica"), (4, b"Helvetica-Bold")):
+            self._object(number, b"<< /Type /Font /Subtype /Type1 /BaseFont /%s "
+                                 b"/Encoding /WinAnsiEncoding >>" % name)
+
+    def _object(self, number, body):
+        self.offsets[number] = self.f.tell()
+        self.f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+    def _new_id(self):
+        self.next_id += 1
+        return self.next_id - 1
+
+    def add_page(self, page):
+        data = zlib.compress(page.content(), 6)
+        contents = self._new_id()
+        self._object(contents, b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(data)
+                     + data + b"\nendstream")
+        number = self._new_id()
+        self._object(number, b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %g %g] "
+                             b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>"
+                     % (page.width, page.height, contents))
+        self.page_ids.append(number)
+
+    def close(self):
+        kids = b" ".join(b"%d 0 R" % n for n in self.page_ids)
+        self._object(2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.page_ids)))
+        self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        info = self._new_id()
+        self._object(info, b"<< /Title %s /Producer (afaqschool) /CreationDate (D:%s) >>" % (
+            _literal(self.title), datetime.now().strftime("%Y%m%d%H%M%S").encode()))
+        xref = self.f.tell()
+        self.f.write(b"xref\n0 %d\n0000000000 65535 f \n" % self.next_id)
+        for number in range(1, self.next_id):
+            self.f.write(b"%010d 00000 n \n" % self.offsets[number])
+        self.f.write(b"trailer\n<< /Size %d /Root 1 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                     % (self.next_id, info, xref))
+        return len(self.page_ids)
+
+
+# ==== BUILTIN LAYOUTS ====
+A4 = (595.0, 842.0)
+MARGIN = 36
+ROW_HEIGHT = 15
+FONT_SIZE = 8
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M")
+    return str(value)
+
+
+def write_table(f, title, subtitle, table_columns, rows):
+    # rows: iterable of dicts; a page is written as soon as it is full
+    width, height = A4
+    usable = width - 2 * MARGIN
+    spans = [(field, heading, share * usable) for field, heading, share in table_columns]
+    writer = PdfWriter(f, title)
+    page, y, count = None, 0, 0
+
+    def finish(page):
+        page.text(MARGIN, height - MARGIN / 2, f"Page {len(writer.page_ids) + 1}", size=7)
+        writer.add_page(page)
+
+    def start():
+        page = Page(width, height)
+        y = MARGIN
+        if not writer.page_ids:
+            page.text(MARGIN, y + 14, title, size=14, bold=True)
+            page.text(MARGIN, y + 30, subtitle, size=8)
+            y += 42
+        page.fill(MARGIN, y, usable, ROW_HEIGHT)
+        x = MARGIN
+        for _, heading, span in spans:
+            page.text(x + 3, y + 10.5, fit(heading, span - 6, FONT_SIZE, True), FONT_SIZE, bold=True)
+            x += span
+        return page, y + ROW_HEIGHT
+
+    for row in rows:
+        if page is None or y + ROW_HEIGHT > height - MARGIN:
+            if page is not None:
+                finish(page)
+            page, y = start()
+        x = MARGIN
+        for field, _, span in spans:
+            page.text(x + 3, y + 10.5, fit(_cell(row.get(field)), span - 6, FONT_SIZE), FONT_SIZE)
+            x += span
+        page.line(MARGIN, y + ROW_HEIGHT, MARGIN + usable, y + ROW_HEIGHT, 0.3)
+        y += ROW_HEIGHT
+        count += 1
+    if page is None:
+        page, y = start()
+        page.text(MARGIN + 3, y + 10.5, "No applications match these filters.", FONT_SIZE)
+    finish(page)
+    return {"rows": count, "pages": writer.close()}
+
+
+def write_sheet(f, row):
+    width, height = A4
+    writer = PdfWriter(f, f"Sponsorship sheet {row['application_no']}")
+    page = Page(width, height)
+    page.text(MARGIN, MARGIN + 16, "Sponsorship Sheet", size=16, bold=True)
+    y = MARGIN + 40
+    label_width = 150
+    for fields in (SHEET_FIELDS, SHEET_FEES):
+        for field, label in fields:
+            bold = field == "total"
+            page.text(MARGIN, y + 11, label, size=10, bold=True)
+            page.text(MARGIN + label_width, y + 11,
+                      fit(_cell(row.get(field)), width - 2 * MARGIN - label_width, 10), size=10, bold=bold)
+            page.line(MARGIN, y + 16, width - MARGIN, y + 16, 0.3)
+            y += 18
+        y += 18
+    page.text(MARGIN, height - MARGIN, f"Generated {datetime.now():%Y-%m-%d %H:%M}", size=7)
+    writer.add_page(page)
+    return {"rows": 1, "pages": writer.close()}
+
+
+# ==== WKHTMLTOPDF ====
+def _templates():
+    return Environment(loader=FileSystemLoader(TEMPLATE_DIR), autoescape=select_autoescape(["html"]))
+
+
+def _wkhtmltopdf(html_paths, out_path):
+    if not WKHTMLTOPDF:
+        raise PdfReportError("wkhtmltopdf is not installed (set PDF_RENDERER=builtin)")
+    try:
+        subprocess.run([WKHTMLTOPDF, "--quiet", "--encoding", "utf-8", "--page-size", "A4",
+                        *html_paths, out_path], check=True, capture_output=True, timeout=PDF_TIMEOUT)
+    except subprocess.CalledProcessError as e:
+        raise PdfReportError(f"wkhtmltopdf failed: {e.stderr.decode(errors='replace')[:500]}")
+
+
+def _html_report(rows, out_path, title, subtitle):
+    # One HTML file per PDF_HTML_CHUNK rows, joined by wkhtmltopdf into one PDF
+    template = _templates().get_template("report_pdf.html")
+    workdir = tempfile.mkdtemp(prefix="pdf-")
+    try:
+        paths, chunk, count = [], [], 0
+
+        def flush():
+            path = os.path.join(workdir, f"{len(paths):05d}.html")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(template.render(applications=chunk, first=not paths, title=title, subtitle=subtitle))
+            paths.append(path)
+
+        for row in rows:
+            chunk.append(row)
+            count += 1
+            if len(chunk) >= PDF_HTML_CHUNK:
+                flush()
+                chunk = []
+        if chunk or not paths:
+            flush()
+        _wkhtmltopdf(paths, out_path)
+        return {"rows": count, "pages": None}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _html_sheet(row, out_path):
+    template = _templates().get_template("sponsorship_pdf.html")
+    fd, path = tempfile.mkstemp(suffix=".html")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(template.render(app=row, fields=SHEET_FIELDS, fees=SHEET_FEES,
+                                    generated=datetime.now()))
+        _wkhtmltopdf([path], out_path)
+        return {"rows": 1, "pages": 1}
+    finally:
+        os.remove(path)
+
+
+# ==== DATA ====
+def report_query(values, select, order_by="id"):
+    return APPLICATIONS.query(values, select=select, order_by=order_by)
+
+
+def _report_rows(values):
+    with db_cursor() as cursor:
+        values.resolve(cursor)
+    rows = iter_rows(*report_query(values, columns([field for field, _, _ in REPORT_COLUMNS])))
+    header = next(rows)
+    for row in rows:
+        yield dict(zip(header, row))
+
+
+def _describe(values):
+    shown = ", ".join(f"{name}={value}" for name, value in values.args.items()) or "none"
+    return f"Filters: {shown}. Generated {datetime.now():%Y-%m-%d %H:%M}."
+
+
+def fetch_sheet(cursor, application_no):
+    cursor.execute(SHEET_QUERY, (application_no,))
+    row = cursor.fetchone()
+    if row is not None and not isinstance(row, dict):
+        row = dict(zip([d[0] for d in cursor.description], row))
+    return row
+
+
+def _init_worker():
+    # Pool processes are spawned fresh and need their own database pool
+    configure_db(DB_CONFIG)
+
+
+def render(kind, params, out_path, renderer=PDF_RENDERER):
+    # Runs in a pool process: read the data, write out_path -> {"rows", "pages"}
+    if kind == "report":
+        values, _ = APPLICATIONS.parse(params)
+        title = "Applications Report"
+        if renderer == "builtin":
+            with open(out_path, "wb") as f:
+                return write_table(f, title, _describe(values), REPORT_COLUMNS, _report_rows(values))
+        return _html_report(_report_rows(values), out_path, title, _describe(values))
+    if kind == "sheet":
+        with db_cursor(dictionary=True) as cursor:
+            row = fetch_sheet(cursor, params["application_no"])
+        if row is None:
+            raise PdfReportError(f"Application {params['application_no']} not found")
+        if renderer == "builtin":
+            with open(out_path, "wb") as f:
+                return write_sheet(f, row)
+        return _html_sheet(row, out_path)
+    raise PdfReportError(f"Unknown PDF report: {kind}")
+
+
+# ==== SERVICE ====
+class PdfReports:
+    # Used by app.py: data version, cache lookup, rendering through the pool
+    def __init__(self, cache_dir=PDF_CACHE_DIR, workers=PDF_WORKERS, max_files=PDF_CACHE_MAX_FILES,
+                 renderer=PDF_RENDERER):
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.max_files = max_files
+        self.renderer = renderer
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "renders": 0, "failures": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _executor(self):
+        # One pool per gunicorn worker, created after the fork
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    # -- versions: one aggregate query each --
+    def report_version(self, cursor, values):
+        # -> (rows, version); rows decides between rendering now and a job
+        # No ORDER BY: beside an aggregate it is an error under ONLY_FULL_GROUP_BY
+        cursor.execute(*report_query(values.resolve(cursor), "COUNT(*), MAX(updated_at)", order_by=None))
+        count, latest = cursor.fetchone()
+        return count, [count, str(latest)]
+
+    def sheet_version(self, cursor, application_no):
+        row = fetch_sheet(cursor, application_no)
+        return None if row is None else [str(row[field]) for field in ("updated_at", "total", "section")]
+
+    def key(self, kind, params, version):
+        data = json.dumps([LAYOUT_VERSION, self.renderer, kind, params, version], sort_keys=True, default=str)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    # -- cache --
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    def cached(self, key):
+        path = self._path(key)
+        try:
+            os.utime(path)      # mtime = last use, for _prune()
+        except FileNotFoundError:
+            return None
+        self._count("hits")
+        return path
+
+    def _prune(self):
+        entries = [e for e in os.scandir(self.cache_dir) if e.name.endswith(".pdf")]
+        if len(entries) <= self.max_files:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_files]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    # -- rendering --
+    def render(self, kind, params, key, check=None):
+        # Render in the pool into the cache; -> path. check() is called every
+        # WAIT_SLICE seconds while waiting (background jobs: cancellation)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix=".tmp-", suffix=".pdf")
+        os.close(fd)
+        future = self._executor().submit(render, kind, params, tmp, self.renderer)
+        deadline = time.monotonic() + PDF_TIMEOUT
+        try:
+            while True:
+                try:
+                    future.result(timeout=WAIT_SLICE)
+                    break
+                except FutureTimeout:
+                    if time.monotonic() > deadline:
+                        raise PdfReportError("The PDF took too long to render; try narrower filters")
+                    if check:
+                        check()
+        except BaseException:
+            self._count("failures")
+            # A render still running in the pool finishes into tmp; drop it then
+            future.add_done_callback(lambda _: _remove(tmp))
+            raise
+        path = self._path(key)
+        os.replace(tmp, path)
+        self._count("renders")
+        self._prune()
+        return path
+
+    def get(self, kind, params, key, check=None):
+        return self.cached(key) or self.render(kind, params, key, check)
+
+    def stats(self):
+        with self._lock:
+            data = dict(self.counters)
+        data["renderer"] = self.renderer
+        return data
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,34 @@
+"""
+EXPLAIN-based guard against query plans regressing to full table scans.
+
+`flask check-plans` (see PLAN_CHECKS in app.py) runs EXPLAIN on the queries
+the list routes issue and exits non-zero if one of them scans a whole table or
+needs a filesort it is not allowed. Run it against a database with realistic
+row counts: on a table of a few dozen rows MySQL may prefer a scan anyway.
+"""
+
+
+def explain(cursor, query, params=()):
+    cursor.execute("EXPLAIN " + query, tuple(params))
+    names = [d[0] for d in cursor.description]
+    return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+
+def plan_problems(plan, allow_scan=(), allow_filesort=False):
+    problems = []
+    for row in plan:
+        table = row.get("table")
+        extra = row.get("Extra") or ""
+        if row.get("type") == "ALL" and table not in allow_scan:
+            problems.append(f"full table scan on {table}")
+        if "Using filesort" in extra and not allow_filesort:
+            problems.append(f"filesort on {table}")
+    return problems
+
+
+def format_plan(plan):
+    return "\n".join(
+        f"    {row.get('table')}: type={row.get('type')} key={row.get('key')} "
+        f"rows={row.get('rows')} extra={row.get('Extra') or ''}"
+        for row in plan
+    )
@@ -0,0 +1,66 @@
+"""
+Column projections for the applications table.
+
+Never SELECT * from applications: the `picture` LONGBLOB would be pulled into
+every row. Pick the projection for the view instead:
+
+    LIST    - scalar columns shown in tables (status_report, review, report)
+    DETAIL  - every scalar column plus a has_picture flag (detail pages)
+    IMAGE   - the photo key (or legacy blob), fetched only by /image/<application_no>
+              (APPLICATION_IMAGE_META first, APPLICATION_IMAGE_BLOB on a miss)
+"""
+import os
+
+# How text filters match: "contains" -> LIKE '%x%' (always a full scan),
+# "prefix" -> LIKE 'x%' (can use idx_applications_student_name / _class)
+NAME_MATCH = os.environ.get("NAME_MATCH", "contains")
+
+APPLICATION_LIST_COLUMNS = (
+    "id", "application_no", "student_name", "father_name", "mobile_no",
+    "class", "age", "father_income", "is_orphan", "status", "created_at",
+)
+
+APPLICATION_DETAIL_COLUMNS = APPLICATION_LIST_COLUMNS + (
+    "dob", "sabika_school", "father_cnic", "loss_flood", "donation_percentage",
+    "user_id", "DonarPercentage", "donor_mobile", "receipt", "picture_key",
+)
+
+def columns(names, alias=None):
+    prefix = f"{alias}." if alias else ""
+    return ", ".join(f"{prefix}`{name}`" for name in names)
+
+
+def has_picture(alias=None):
+    prefix = f"{alias}." if alias else ""
+    return f"({prefix}picture_key IS NOT NULL OR {prefix}picture IS NOT NULL) AS has_picture"
+
+
+# updated_at (migrations/012) is the row version for templating.cached_row()
+APPLICATION_LIST = columns(APPLICATION_LIST_COLUMNS + ("updated_at",))
+APPLICATION_DETAIL = columns(APPLICATION_DETAIL_COLUMNS) + ", " + has_picture()
+# Validators for /image: the store key, or a digest of a legacy blob computed by
+# MySQL so the blob itself is only sent when the client's copy is stale
+APPLICATION_IMAGE_META = (
+    "picture_key, IF(picture_key IS NULL, SHA1(picture), NULL) AS picture_sha1, created_at"
+)
+APPLICATION_IMAGE_BLOB = "picture"
+
+# Columns written for a new application, in VALUES order. Shared by
+# new_registration (one row) and imports.py (executemany per batch).
+APPLICATION_INSERT_COLUMNS = (
+    "application_no", "student_name", "father_name", "dob", "age", "class", "sabika_school",
+    "father_cnic", "mobile_no", "father_income", "is_orphan", "loss_flood", "donation_percentage",
+    "picture_key", "status", "user_id",
+)
+APPLICATION_INSERT = (
+    f"INSERT INTO applications ({columns(APPLICATION_INSERT_COLUMNS)}) "
+    f"VALUES ({', '.join(['%s'] * len(APPLICATION_INSERT_COLUMNS))})"
+)
+
+
+def like_pattern(value, match=None):
+    # User input is matched literally: % and _ are escaped
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    if (match or NAME_MATCH) == "prefix":
+        return f"{escaped}%"
+    return f"%{escaped}%"
@@ -0,0 +1,199 @@
+"""
+Name / CNIC / mobile search over applications.
+
+Staff type names in Urdu script or in Roman Urdu, with or without diacritics,
+and CNICs / phone numbers with or without dashes and country code. Searching
+`applications` with LIKE '%term%' can do none of that and never uses an index,
+so every application gets a row in the side table application_search
+(migrations/009):
+
+    search_text    folded student + father names, plus a consonant "skeleton"
+                   of each word that is the same for "Muhammad" and "محمد";
+                   indexed FULLTEXT WITH PARSER ngram. Ranked /search only:
+                   skeletons are lossy (Ahmed, Hamid and Muhammad are all "md")
+    name_text      folded student name alone (FULLTEXT ngram, migrations/015),
+                   for the report filters' "Student" condition
+    cnic_digits    father_cnic, digits only        (B-tree, prefix match)
+    mobile_digits  mobile_no as 03xxxxxxxxx         (B-tree, prefix match)
+
+The row is written by index_application() in the same transaction as the
+application insert; `flask reindex-search` rebuilds it for existing rows.
+The report filters fall back to LIKE on the name column only for terms
+shorter than the ngram size, or when name_probe() finds no indexed match at
+all (filters.FilterValues.resolve()), never as an OR beside the index.
+"""
+import re
+import unicodedata
+
+from queries import like_pattern
+
+# Arabic-script letters that Urdu keyboards and Arabic keyboards type differently
+_URDU_FOLD = str.maketrans({
+    "ي": "ی", "ى": "ی", "ئ": "ی",
+    "ك": "ک",
+    "ه": "ہ", "ة": "ہ", "ۃ": "ہ", "ە": "ہ",
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ؤ": "و",
+    "ـ": None,   # tatweel
+    "ء": None,
+})
+
+# Urdu letters -> Roman approximations, used only to build skeletons
+_ROMAN = {
+    "ا": "a", "ب": "b", "پ": "p", "ت": "t", "ٹ": "t", "ث": "s", "ج": "j",
+    "چ": "ch", "ح": "h", "خ": "kh", "د": "d", "ڈ": "d", "ذ": "z", "ر": "r",
+    "ڑ": "r", "ز": "z", "ژ": "zh", "س": "s", "ش": "sh", "ص": "s", "ض": "z",
+    "ط": "t", "ظ": "z", "ع": "", "غ": "gh", "ف": "f", "ق": "q", "ک": "k",
+    "گ": "g", "ل": "l", "م": "m", "ن": "n", "ں": "n", "و": "w", "ہ": "h",
+    "ھ": "h", "ی": "y", "ے": "e",
+}
+
+_NON_WORD = re.compile(r"[^\w]+", re.UNICODE)
+_SKELETON_DROP = re.compile(r"[aeiouyhw]")
+_SKELETON_MAP = str.maketrans({"q": "k", "c": "k", "v": "w", "x": "ks"})
+
+MIN_TERM = 2          # ngram_token_size
+DIGITS_MIN = 4        # shorter digit strings are treated as text
+
+
+def fold_text(value):
+    # Case, diacritic and letter-variant folding; punctuation -> single spaces
+    if not value:
+        return ""
+    text = unicodedata.normalize("NFKD", value)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = text.translate(_URDU_FOLD).casefold()
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+def skeleton(word):
+    # "Muhammad" -> "mmd" -> "md", "محمد" -> "mhmd" -> "md"
+    roman = "".join(_ROMAN.get(ch, ch) for ch in word)
+    roman = roman.replace("ph", "f").translate(_SKELETON_MAP)
+    roman = _SKELETON_DROP.sub("", roman)
+    roman = re.sub(r"(.)\1+", r"\1", roman)
+    return roman if roman.isascii() and roman.isalpha() else ""
+
+
+def digits_only(value):
+    return re.sub(r"\D", "", value or "")
+
+
+def normalize_mobile(value):
+    # +92 300 1234567 / 0092-300... / 3001234567 -> 03001234567
+    digits = digits_only(value)
+    if digits.startswith("0092"):
+        digits = digits[4:]
+    elif digits.startswith("92") and len(digits) == 12:
+        digits = digits[2:]
+    if len(digits) == 10 and digits.startswith("3"):
+        digits = "0" + digits
+    return digits
+
+
+def search_document(*names):
+    words = []
+    for name in names:
+        folded = fold_text(name)
+        if folded:
+            words.append(folded)
+    skeletons = {s for text in words for w in text.split() for s in [skeleton(w)] if len(s) >= MIN_TERM}
+    return " ".join(words + sorted(skeletons))
+
+
+_SEARCH_UPSERT = """
+    INSERT INTO application_search (application_no, search_text, name_text, cnic_digits, mobile_digits)
+    VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE search_text=VALUES(search_text), name_text=VALUES(name_text),
+        cnic_digits=VALUES(cnic_digits), mobile_digits=VALUES(mobile_digits)
+"""
+
+
+def _search_row(application_no, student_name, father_name, father_cnic, mobile_no):
+    return (
+        application_no,
+        search_document(student_name, father_name),
+        fold_text(student_name),
+        digits_only(father_cnic) or None,
+        normalize_mobile(mobile_no) or None,
+    )
+
+
+def index_application(cursor, application_no, student_name, father_name, father_cnic, mobile_no):
+    cursor.execute(_SEARCH_UPSERT, _search_row(
+        application_no, student_name, father_name, father_cnic, mobile_no))
+
+
+def index_applications(cursor, rows):
+    # rows: (application_no, student_name, father_name, father_cnic, mobile_no)
+    cursor.executemany(_SEARCH_UPSERT, [_search_row(*row) for row in rows])
+
+
+# ==== QUERYING ====
+def _is_number(term):
+    return len(digits_only(term)) >= DIGITS_MIN and not re.search(r"[^\d\s+\-()]", term)
+
+
+def _fulltext_terms(term):
+    folded = fold_text(term)
+    words = [w for w in folded.split() if len(w) >= MIN_TERM]
+    words += [s for w in folded.split() for s in [skeleton(w)] if len(s) >= MIN_TERM]
+    return " ".join(dict.fromkeys(words))
+
+
+def _name_phrase(term):
+    # The folded term as one required phrase, which over ngrams behaves like a
+    # substring match on the folded name; None if shorter than the ngram size
+    folded = fold_text(term)
+    if len(folded.replace(" ", "")) < MIN_TERM:
+        return None
+    return '+"' + folded + '"'
+
+
+def name_filter(term, column="application_no", name_column="student_name"):
+    # SQL restricting `column` to applications whose student name contains
+    # `term`, as (sql, params): through the index, or LIKE on `name_column`
+    # for terms the index cannot match
+    phrase = _name_phrase(term)
+    if phrase is None:
+        return f"{name_column} LIKE %s", [like_pattern(term)]
+    return (
+        f"{column} IN (SELECT application_no FROM application_search "
+        "WHERE MATCH(name_text) AGAINST (%s IN BOOLEAN MODE))",
+        [phrase],
+    )
+
+
+def name_probe(term):
+    # (sql, params) returning a row if name_filter() finds anything through
+    # the index, or None when it uses LIKE anyway. Nothing found (rows not
+    # reindexed yet): the caller uses LIKE instead
+    phrase = _name_phrase(term)
+    if phrase is None:
+        return None
+    return ("SELECT 1 FROM application_search "
+            "WHERE MATCH(name_text) AGAINST (%s IN BOOLEAN MODE) LIMIT 1", [phrase])
+
+
+def ranked_search(cursor, term, limit=50):
+    # Best matches first: (application_no, score) over names, CNIC and mobile
+    if _is_number(term):
+        digits = digits_only(term)
+        cursor.execute("""
+            SELECT application_no, 1.0 AS score FROM application_search
+            WHERE cnic_digits LIKE %s OR mobile_digits LIKE %s
+            LIMIT %s
+        """, (digits + "%", normalize_mobile(digits) + "%", limit))
+        return cursor.fetchall()
+
+    terms = _fulltext_terms(term)
+    if not terms:
+        return []
+    cursor.execute("""
+        SELECT application_no, MATCH(search_text) AGAINST (%s) AS score
+        FROM application_search
+        WHERE MATCH(search_text) AGAINST (%s)
+        ORDER BY score DESC
+        LIMIT %s
+    """, (terms, terms, limit))
+    return cursor.fetchall()
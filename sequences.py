@@ -0,0 +1,64 @@
+"""
+Gap-tolerant counters for application numbers (table app_sequences).
+
+allocate() bumps the counter with a single UPDATE using MySQL's
+LAST_INSERT_ID(expr) trick, so it needs no extra SELECT MAX() and no table
+lock. Call it on the same cursor as the INSERT: the counter row stays locked
+until that transaction commits, so two registrations can never receive the
+same number. A rolled-back insert also rolls back its number.
+
+Bulk callers can reserve a block at once with allocate(cursor, count=n).
+"""
+import re
+
+APPLICATION_NO = "application_no"
+_APPLICATION_NO_RE = re.compile(r"^APP-(\d+)$")
+
+
+class SequenceError(Exception):
+    pass
+
+
+def allocate(cursor, name=APPLICATION_NO, count=1):
+    # Returns range(first, first + count)
+    cursor.execute(
+        "UPDATE app_sequences SET next_value = LAST_INSERT_ID(next_value + %s) WHERE name = %s",
+        (count, name),
+    )
+    if cursor.rowcount != 1:
+        raise SequenceError(f"Sequence {name!r} is missing; run `flask migrate`")
+    cursor.execute("SELECT LAST_INSERT_ID()")
+    end = cursor.fetchone()[0]
+    return range(end - count, end)
+
+
+def skip_past(cursor, value, name=APPLICATION_NO):
+    # Move the counter beyond a value that is already taken (legacy rows)
+    cursor.execute(
+        "UPDATE app_sequences SET next_value = GREATEST(next_value, %s) WHERE name = %s",
+        (value + 1, name),
+    )
+
+
+def skip_past_existing(cursor, name=APPLICATION_NO):
+    # Bulk inserts do not know which number collided; move past the highest one
+    cursor.execute(
+        "SELECT MAX(CAST(SUBSTRING(application_no, 5) AS UNSIGNED)) FROM applications "
+        "WHERE application_no LIKE 'APP-%'"
+    )
+    top = cursor.fetchone()[0]
+    if top:
+        skip_past(cursor, int(top), name)
+
+
+def format_application_no(value):
+    return f"APP-{value:04d}"
+
+
+def parse_application_no(application_no):
+    match = _APPLICATION_NO_RE.match(application_no or "")
+    return int(match.group(1)) if match else None
+
+
+def next_application_no(cursor):
+    return format_application_no(allocate(cursor)[0])
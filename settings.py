@@ -0,0 +1,29 @@
+"""
+Settings shared by app.py and donor_api.py.
+
+The async donor API runs as its own process and must not import the Flask
+app, so the database credentials and the session secret live here. Both can
+be overridden from the environment (SECRET_KEY, DB_HOST, DB_USER, DB_PASSWORD,
+DB_NAME).
+"""
+import os
+
+# Signs the Flask session cookie; donor_api.py verifies the same cookie
+SECRET_KEY = os.environ.get("SECRET_KEY", "supersecret123")
+
+#Remote
+DB_CONFIG = {
+    "host": os.environ.get("DB_HOST", "localhost"),
+    "user": os.environ.get("DB_USER", "root"),
+    "password": os.environ.get("DB_PASSWORD", "SecureRootPass123!"),
+    "database": os.environ.get("DB_NAME", "afaqschool1"),
+}
+
+
+#Local
+#DB_CONFIG = {
+ #   "host": "localhost",
+  #  "user": "root",
+   # "password": "Zain12345",
+   # "database": "afaqschool"
+#}
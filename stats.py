@@ -0,0 +1,155 @@
+"""
+Summary numbers for the home card and /stats, kept as counters.
+
+Counting applications by status, summing students.total and grouping donations
+by day means scanning three tables on every view. Instead the write routes
+adjust two small tables (migrations/010) in the same transaction as their own
+change, so the numbers commit or roll back together with it:
+
+    app_stats        name -> value, e.g. "status:Pending" -> 12,
+                     "sponsored_total" -> 480000.00
+    donation_daily   day -> donations confirmed that day
+
+Reading the card is two primary-key / range queries whatever the table sizes.
+
+    with db_cursor(commit=True) as cur:
+        set_status(cur, application_no, "Approved")   # moves the status counts
+        add_sponsored(cur, total)
+
+set_statuses() does the same for many rows at once (bulk review).
+
+`flask rebuild-stats` recomputes both tables from scratch if they ever drift
+(e.g. rows edited by hand in phpMyAdmin).
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+STATUS_PREFIX = "status:"
+SPONSORED_TOTAL = "sponsored_total"
+DAILY_DAYS = 14       # donations-per-day window shown on the card
+
+
+class StatsError(Exception):
+    pass
+
+
+def bump(cursor, deltas):
+    # deltas: {name: amount}; zero amounts are skipped
+    rows = [(name, amount) for name, amount in deltas.items() if amount]
+    if rows:
+        cursor.executemany("""
+            INSERT INTO app_stats (name, value) VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE value = value + VALUES(value)
+        """, rows)
+
+
+def record_new_application(cursor, count=1):
+    bump(cursor, {STATUS_PREFIX + "Pending": count})
+
+
+def set_status(cursor, application_no, status):
+    # Change one application's status and move it between status counters.
+    # The row lock from FOR UPDATE keeps two concurrent reviews from both
+    # decrementing the old status. Returns the previous status.
+    cursor.execute("SELECT status FROM applications WHERE application_no=%s FOR UPDATE",
+                   (application_no,))
+    row = cursor.fetchone()
+    if row is None:
+        raise StatsError(f"Application {application_no} not found")
+    old = (row["status"] if isinstance(row, dict) else row[0]) or "Pending"
+    cursor.execute("UPDATE applications SET status=%s WHERE application_no=%s",
+                   (status, application_no))
+    if old != status:
+        bump(cursor, {STATUS_PREFIX + old: -1, STATUS_PREFIX + status: 1})
+    return old
+
+
+def set_statuses(cursor, application_nos, status, allowed_from=None):
+    # Multi-row set_status: one locking SELECT, one UPDATE, one counter write.
+    # Rows that are missing, already `status`, or not in allowed_from are left
+    # alone. Returns {application_no: previous status} for the rows changed.
+    if not application_nos:
+        return {}
+    placeholders = ",".join(["%s"] * len(application_nos))
+    cursor.execute(f"SELECT application_no, status FROM applications "
+                   f"WHERE application_no IN ({placeholders}) FOR UPDATE", tuple(application_nos))
+    previous = {}
+    for row in cursor.fetchall():
+        number, old = (row["application_no"], row["status"]) if isinstance(row, dict) else row
+        old = old or "Pending"
+        if old != status and (allowed_from is None or old in allowed_from):
+            previous[number] = old
+    if not previous:
+        return previous
+
+    placeholders = ",".join(["%s"] * len(previous))
+    cursor.execute(f"UPDATE applications SET status=%s WHERE application_no IN ({placeholders})",
+                   (status,) + tuple(previous))
+    deltas = {STATUS_PREFIX + status: len(previous)}
+    for old in previous.values():
+        deltas[STATUS_PREFIX + old] = deltas.get(STATUS_PREFIX + old, 0) - 1
+    bump(cursor, deltas)
+    return previous
+
+
+def add_sponsored(cursor, amount):
+    bump(cursor, {SPONSORED_TOTAL: Decimal(str(amount or 0))})
+
+
+def record_donation(cursor):
+    cursor.execute("""
+        INSERT INTO donation_daily (day, donations) VALUES (CURDATE(), 1)
+        ON DUPLICATE KEY UPDATE donations = donations + 1
+    """)
+
+
+# ==== READING ====
+def read_stats(cursor, days=DAILY_DAYS):
+    cursor.execute("SELECT name, value FROM app_stats")
+    values = {}
+    for row in cursor.fetchall():
+        name, value = (row["name"], row["value"]) if isinstance(row, dict) else row
+        values[name] = value
+
+    statuses = {name[len(STATUS_PREFIX):]: int(value)
+                for name, value in values.items() if name.startswith(STATUS_PREFIX)}
+
+    since = date.today() - timedelta(days=days - 1)
+    cursor.execute("SELECT day, donations FROM donation_daily WHERE day >= %s ORDER BY day",
+                   (since,))
+    by_day = {}
+    for row in cursor.fetchall():
+        day, count = (row["day"], row["donations"]) if isinstance(row, dict) else row
+        by_day[day] = int(count)
+    daily = [{"day": (since + timedelta(days=i)).isoformat(),
+              "donations": by_day.get(since + timedelta(days=i), 0)} for i in range(days)]
+
+    return {
+        "applications": sum(statuses.values()),
+        "by_status": statuses,
+        "pending_review": statuses.get("Pending", 0),
+        "sponsored_total": float(values.get(SPONSORED_TOTAL, 0)),
+        "donations_per_day": daily,
+        "donations_today": daily[-1]["donations"],
+    }
+
+
+# ==== REBUILD ====
+def rebuild(cursor):
+    # Recompute everything from the source tables; run inside one transaction
+    cursor.execute("DELETE FROM app_stats")
+    cursor.execute("""
+        INSERT INTO app_stats (name, value)
+        SELECT CONCAT(%s, COALESCE(status, 'Pending')), COUNT(*)
+        FROM applications GROUP BY COALESCE(status, 'Pending')
+    """, (STATUS_PREFIX,))
+    cursor.execute("""
+        INSERT INTO app_stats (name, value)
+        SELECT %s, COALESCE(SUM(total), 0) FROM students
+    """, (SPONSORED_TOTAL,))
+    cursor.execute("DELETE FROM donation_daily")
+    cursor.execute("""
+        INSERT INTO donation_daily (day, donations)
+        SELECT DATE(created_at), COUNT(*) FROM donations
+        WHERE created_at IS NOT NULL GROUP BY DATE(created_at)
+    """)
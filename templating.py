@@ -0,0 +1,152 @@
+"""
+Template rendering setup for app.py.
+
+Bytecode cache: compiled templates are written to JINJA_CACHE_DIR, so a
+restarted gunicorn worker loads them instead of parsing and compiling every
+template again. `flask compile-templates` fills the cache at deploy time.
+
+Row fragments: the big list pages (review, report, status_report) render each
+table row through a macro and cached_row():
+
+    {% macro row(a) %}<tr>...</tr>{% endmacro %}
+    {% for a in applications %}{{ cached_row("report", row, a) }}{% endfor %}
+
+The rendered HTML is kept per worker, keyed by application_no and the row's
+updated_at (migrations/012), which MySQL bumps on every change to the row. An
+edited row gets a new key; the old entry ages out of the LRU. Finalized
+applications (Approved / Assigned / Rejected) keep their key indefinitely, so
+after the first page view they cost a dictionary lookup. Rows without
+updated_at are rendered every time.
+
+Bootstrap: BOOTSTRAP_SOURCE=local serves the stylesheet from
+static/vendor/bootstrap-<version>/ (fetch it once with `flask vendor-bootstrap`)
+with a one-year immutable Cache-Control; the versioned path changes on upgrade.
+The default, cdn, keeps cdn.jsdelivr.net.
+
+Environment: JINJA_CACHE_DIR (default var/jinja, empty disables),
+FRAGMENT_CACHE_ITEMS (default 5000, 0 disables), FRAGMENT_CACHE_TTL seconds
+(default 86400), BOOTSTRAP_SOURCE (cdn).
+"""
+import base64
+import hashlib
+import os
+import threading
+import urllib.request
+
+from flask import request, url_for
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+
+from cache import MemoryBackend
+
+JINJA_CACHE_DIR = os.environ.get("JINJA_CACHE_DIR", "var/jinja")
+FRAGMENT_CACHE_ITEMS = int(os.environ.get("FRAGMENT_CACHE_ITEMS", 5000))
+FRAGMENT_CACHE_TTL = float(os.environ.get("FRAGMENT_CACHE_TTL", 24 * 3600))
+BOOTSTRAP_SOURCE = os.environ.get("BOOTSTRAP_SOURCE", "cdn")
+
+BOOTSTRAP_VERSION = "5.3.2"
+BOOTSTRAP_CDN = f"https://cdn.jsdelivr.net/npm/bootstrap@{BOOTSTRAP_VERSION}/dist/css/bootstrap.min.css"
+BOOTSTRAP_SHA384 = "T3c6CoIi6uLrA9TneNEoa7RxnatzjcDSCmG1MXxSR1GAsXEV/Dwwykc2MPK8M2HN"
+BOOTSTRAP_STATIC = f"vendor/bootstrap-{BOOTSTRAP_VERSION}/bootstrap.min.css"
+VENDOR_MAX_AGE = 365 * 24 * 3600
+
+
+class TemplatingError(Exception):
+    pass
+
+
+class BytecodeCache(FileSystemBytecodeCache):
+    # Creates its directory on first write rather than at import, so importing
+    # app.py touches no files (gunicorn preload_app, gunicorn.conf.py)
+    def dump_bytecode(self, bucket):
+        os.makedirs(self.directory, exist_ok=True)
+        super().dump_bytecode(bucket)
+
+
+# ==== ROW FRAGMENTS ====
+class FragmentCache:
+    def __init__(self, max_items=FRAGMENT_CACHE_ITEMS, ttl=FRAGMENT_CACHE_TTL):
+        self.enabled = max_items > 0
+        self.backend = MemoryBackend(max_items=max_items)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "uncached": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def render(self, name, macro, row):
+        # name: which table the row belongs to; macro(row) renders it
+        version = row.get("updated_at")
+        number = row.get("application_no")
+        if not self.enabled or version is None or number is None:
+            self._count("uncached")
+            return macro(row)
+        key = (name, number, str(version))
+        hit = self.backend.get(key)
+        if hit is not None:
+            self._count("hits")
+            return hit[0]
+        self._count("misses")
+        html = Markup(macro(row))
+        self.backend.set(key, html, self.ttl)
+        return html
+
+    def stats(self):
+        with self._lock:
+            data = dict(self.counters)
+        lookups = data["hits"] + data["misses"]
+        data["hit_ratio"] = round(data["hits"] / lookups, 3) if lookups else None
+        data["items"] = len(self.backend)
+        return data
+
+
+# ==== BOOTSTRAP ====
+def bootstrap_path(static_folder):
+    return os.path.join(static_folder, *BOOTSTRAP_STATIC.split("/"))
+
+
+def vendor_bootstrap(static_folder):
+    # Download the CDN stylesheet into static/, checked against its SRI hash
+    with urllib.request.urlopen(BOOTSTRAP_CDN, timeout=30) as response:
+        data = response.read()
+    digest = hashlib.sha384(data).digest()
+    if base64.b64encode(digest).decode() != BOOTSTRAP_SHA384:
+        raise TemplatingError(f"{BOOTSTRAP_CDN} does not match its published sha384")
+    path = bootstrap_path(static_folder)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return path
+
+
+# ==== FLASK ====
+def init_app(app, fragments):
+    # Call right after Flask(): the bytecode cache must be set before the
+    # Jinja environment is first used
+    if JINJA_CACHE_DIR:
+        app.jinja_options = dict(app.jinja_options, bytecode_cache=BytecodeCache(JINJA_CACHE_DIR))
+
+    local = BOOTSTRAP_SOURCE == "local"
+    if local and not os.path.exists(bootstrap_path(app.static_folder)):
+        app.logger.warning("BOOTSTRAP_SOURCE=local but %s is missing; using the CDN "
+                           "(run `flask vendor-bootstrap`)", BOOTSTRAP_STATIC)
+        local = False
+
+    def bootstrap_css():
+        return url_for("static", filename=BOOTSTRAP_STATIC) if local else BOOTSTRAP_CDN
+
+    app.jinja_env.globals.update(cached_row=fragments.render, bootstrap_css=bootstrap_css)
+
+    @app.after_request
+    def vendor_cache_headers(response):
+        # Versioned vendor files never change under the same URL
+        if request.endpoint == "static" and request.view_args.get("filename", "").startswith("vendor/"):
+            response.cache_control.public = True
+            response.cache_control.max_age = VENDOR_MAX_AGE
+            response.cache_control.immutable = True
+            response.cache_control.no_cache = None
+        return response
@@ -0,0 +1,109 @@
+"""
+Shared test helpers. No MySQL is needed: modules that build SQL are run
+against SQLite through SQLiteCursor, and routes get a fake db_cursor.
+
+Every on-disk location the app writes to is pointed at one temporary
+directory before anything is imported.
+"""
+import contextlib
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_STATE = tempfile.mkdtemp(prefix="afaq-tests-")
+for _name in ("JOBS_DIR", "CACHE_DIR", "METRICS_DIR", "PDF_CACHE_DIR", "IMAGE_STORE_ROOT",
+              "RECEIPT_STORE_ROOT"):
+    os.environ[_name] = os.path.join(_STATE, _name.lower())
+
+import pytest  # noqa: E402
+
+
+class SQLiteCursor:
+    # Enough of a mysql-connector cursor for the statements under test:
+    # %s placeholders, NOW() and NOW() + INTERVAL n MINUTE
+    _INTERVAL = re.compile(r"NOW\(\) \+ INTERVAL %s MINUTE")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.statements = []
+        self._cursor = None
+
+    def _sql(self, statement):
+        statement = self._INTERVAL.sub("datetime('now', '+' || %s || ' minutes')", statement)
+        return statement.replace("NOW()", "datetime('now')").replace("%s", "?")
+
+    def execute(self, statement, params=()):
+        self.statements.append((statement, tuple(params)))
+        self._cursor = self.conn.execute(self._sql(statement), tuple(params))
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+
+@pytest.fixture
+def sqlite_db():
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def sqlite_cursor(sqlite_db):
+    return SQLiteCursor(sqlite_db)
+
+
+class FakeCursor:
+    # For routes: answers every fetch from a list of prepared results
+    def __init__(self, results):
+        self.results = list(results)
+        self.statements = []
+
+    def execute(self, statement, params=()):
+        self.statements.append((statement, params))
+
+    def fetchone(self):
+        return self.results.pop(0) if self.results else None
+
+    def fetchall(self):
+        return self.results.pop(0) if self.results else []
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    # fake_db(result, ...) makes app.db_cursor yield a FakeCursor over them
+    import app as app_module
+
+    def install(*results):
+        cursor = FakeCursor(results)
+
+        @contextlib.contextmanager
+        def db_cursor(*args, **kwargs):
+            yield cursor
+        monkeypatch.setattr(app_module, "db_cursor", db_cursor)
+        return cursor
+    return install
+
+
+@pytest.fixture
+def client():
+    import app as app_module
+    app_module.app.config["TESTING"] = True
+    return app_module.app.test_client()
+
+
+def login(client, role="admin", name="Admin", mobile="03000000000"):
+    with client.session_transaction() as session:
+        session["user"] = {"role": role, "name": name, "mobile": mobile, "id": 1}
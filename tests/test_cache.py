@@ -0,0 +1,62 @@
+import pytest
+
+from cache import APPROVED, PENDING, MemoryBackend, QueryCache, SQLiteBackend, TagVersions
+
+
+@pytest.fixture
+def tags_path(tmp_path):
+    return str(tmp_path / "tags.sqlite3")
+
+
+def _loader(calls, value):
+    def load():
+        calls.append(value)
+        return value
+    return load
+
+
+def test_invalidate_retires_only_entries_with_that_tag(tags_path):
+    cache = QueryCache(MemoryBackend(), TagVersions(tags_path))
+    calls = []
+    assert cache.get_or_set("review", [1], _loader(calls, "a"), tags=(PENDING,)) == "a"
+    assert cache.get_or_set("donor", [1], _loader(calls, "b"), tags=(APPROVED,)) == "b"
+    assert cache.get_or_set("review", [1], _loader(calls, "a"), tags=(PENDING,)) == "a"
+    assert calls == ["a", "b"]
+
+    cache.invalidate(PENDING)
+    cache.get_or_set("review", [1], _loader(calls, "a2"), tags=(PENDING,))
+    cache.get_or_set("donor", [1], _loader(calls, "b2"), tags=(APPROVED,))
+    assert calls == ["a", "b", "a2"]
+
+
+def test_entry_with_several_tags_is_retired_by_any_of_them(tags_path):
+    cache = QueryCache(MemoryBackend(), TagVersions(tags_path))
+    calls = []
+    for tag in (None, APPROVED, PENDING):
+        if tag:
+            cache.invalidate(tag)
+        cache.get_or_set("report", [], _loader(calls, tag), tags=(PENDING, APPROVED))
+    assert calls == [None, APPROVED, PENDING]
+
+
+def test_invalidation_reaches_other_workers(tags_path):
+    # Two workers: separate memory backends, one shared tag file
+    worker_a = QueryCache(MemoryBackend(), TagVersions(tags_path))
+    worker_b = QueryCache(MemoryBackend(), TagVersions(tags_path))
+    calls = []
+    worker_b.get_or_set("review", [], _loader(calls, "old"), tags=(PENDING,))
+    worker_a.invalidate(PENDING)
+    assert worker_b.get_or_set("review", [], _loader(calls, "new"), tags=(PENDING,)) == "new"
+    assert calls == ["old", "new"]
+
+
+def test_shared_sqlite_backend_hits_across_instances(tmp_path, tags_path):
+    entries = str(tmp_path / "entries.sqlite3")
+    worker_a = QueryCache(SQLiteBackend(entries), TagVersions(tags_path))
+    worker_b = QueryCache(SQLiteBackend(entries), TagVersions(tags_path))
+    calls = []
+    worker_a.get_or_set("donor", ["x"], _loader(calls, [1, 2]), tags=(APPROVED,))
+    assert worker_b.get_or_set("donor", ["x"], _loader(calls, []), tags=(APPROVED,)) == [1, 2]
+    worker_b.invalidate(APPROVED)
+    assert worker_a.get_or_set("donor", ["x"], _loader(calls, [3]), tags=(APPROVED,)) == [3]
+    assert calls == [[1, 2], [3]]
@@ -0,0 +1,93 @@
+import hashlib
+import os
+
+import pytest
+
+from conftest import login
+from files import ContentStore, FileStoreError, get_receipt_store, is_key, receipt_location
+from image_store import FileImageStore, ImageStoreError
+from holds import MAX_HOLDER
+
+PDF = b"%PDF-1.4 receipt\n%%EOF"
+
+
+def _staged(tmp_path, name, data=PDF):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path), hashlib.sha256(data).hexdigest()
+
+
+# ==== content store ====
+def test_same_content_is_stored_once(tmp_path):
+    store = ContentStore(str(tmp_path / "store"))
+    first, digest = _staged(tmp_path, "a.pdf")
+    second, _ = _staged(tmp_path, "b.pdf")
+    key = store.put_file(first, "pdf", digest)
+    assert store.put_file(second, "pdf", digest) == key == f"{digest}.pdf"
+    assert not os.path.exists(first) and not os.path.exists(second)
+    stored = [files for _, _, files in os.walk(store.root) if files]
+    assert stored == [[key]]
+    with open(store.path(key), "rb") as f:
+        assert f.read() == PDF
+
+
+def test_copy_in_hashes_and_leaves_the_source(tmp_path):
+    store = ContentStore(str(tmp_path / "store"))
+    source, digest = _staged(tmp_path, "legacy.pdf")
+    assert store.copy_in(source, "pdf") == f"{digest}.pdf"
+    assert store.copy_in(source, "pdf") == f"{digest}.pdf"
+    assert os.path.exists(source)
+    assert store.relative_path(f"{digest}.pdf") == os.path.join(digest[:2], digest[2:4], f"{digest}.pdf")
+
+
+def test_photo_store_shares_the_write_path(tmp_path):
+    store = FileImageStore(str(tmp_path / "images"))
+    first, digest = _staged(tmp_path, "a.jpg", b"\xff\xd8\xff photo")
+    second, _ = _staged(tmp_path, "b.jpg", b"\xff\xd8\xff photo")
+    key = store.put_file(first, "jpg", digest)
+    assert store.put_file(second, "jpg", digest) == key
+    assert store.exists(key) and not os.path.exists(second)
+
+
+@pytest.mark.parametrize("key", [
+    "", None, "../../etc/passwd", "a" * 64, "A" * 64 + ".pdf", "a" * 63 + ".pdf",
+    "a" * 64 + ".pdf/../x", "a" * 64 + ".toolong",
+])
+def test_malformed_keys_are_refused(tmp_path, key):
+    assert not is_key(key)
+    with pytest.raises(FileStoreError):
+        ContentStore(str(tmp_path)).path(key)
+
+
+@pytest.mark.parametrize("key", ["../../etc/passwd", "x.jpg", "g" * 64 + ".jpg"])
+def test_malformed_image_keys_are_refused(tmp_path, key):
+    with pytest.raises(ImageStoreError):
+        FileImageStore(str(tmp_path)).path(key)
+
+
+@pytest.mark.parametrize("value", ["../app.py", "sub/receipt.pdf", ""])
+def test_legacy_receipt_paths_stay_in_their_folder(value):
+    with pytest.raises(FileStoreError):
+        receipt_location(value)
+
+
+# ==== routes ====
+def test_get_image_with_a_malformed_key_is_404(client, fake_db):
+    login(client)
+    fake_db(("../../settings.py", None, None, "Approved", "03000000000"))
+    assert client.get("/image/A-1").status_code == 404
+    fake_db(("../../settings.py", None, None, "Approved", "03000000000"))
+    assert client.get("/image/A-1?size=thumb").status_code == 404
+
+
+def test_donor_with_a_long_name_gets_their_receipt(client, fake_db, tmp_path):
+    name = "N" * 200
+    source, _ = _staged(tmp_path, "r.pdf")
+    key = get_receipt_store().copy_in(source, "pdf")
+    holder = f"{name} - 03001234567"[:MAX_HOLDER]
+    login(client, role="donor", name=name, mobile="03001234567")
+
+    fake_db({"application_no": "A-1", "name": holder, "receipt_path": key})
+    assert client.get("/receipts/1").status_code == 200
+    fake_db({"application_no": "A-1", "name": "Someone - 03009999999", "receipt_path": key})
+    assert client.get("/receipts/1").status_code == 403
@@ -0,0 +1,102 @@
+import pytest
+
+import holds
+from holds import HoldError, confirm, current, place, release, sweep
+
+ALICE = "Alice - 03001111111"
+BOB = "Bob - 03002222222"
+
+
+@pytest.fixture
+def cursor(sqlite_db, sqlite_cursor, monkeypatch):
+    # The columns migrations/014 adds, on SQLite; NOW() runs in UTC on both sides
+    sqlite_db.execute("""
+        CREATE TABLE applications (
+            application_no TEXT PRIMARY KEY, student_name TEXT, status TEXT,
+            held_by TEXT, held_until TEXT, hold_version INTEGER NOT NULL DEFAULT 0)
+    """)
+    sqlite_db.execute("INSERT INTO applications (application_no, student_name, status) "
+                      "VALUES ('A-1', 'Ali', 'Approved'), ('A-2', 'Sara', 'Pending')")
+    bumped = []
+    monkeypatch.setattr(holds, "bump", lambda cursor, deltas: bumped.append(deltas))
+    sqlite_cursor.bumped = bumped
+    return sqlite_cursor
+
+
+def _row(cursor):
+    return cursor.conn.execute("SELECT * FROM applications WHERE application_no='A-1'").fetchone()
+
+
+def _expire(cursor):
+    cursor.conn.execute("UPDATE applications SET held_until=datetime('now', '-1 minutes') "
+                        "WHERE held_by IS NOT NULL")
+
+
+def test_second_donor_cannot_take_a_held_student(cursor):
+    hold = place(cursor, "A-1", ALICE)
+    assert hold["held_by"] == ALICE and hold["hold_version"] == 1
+    with pytest.raises(HoldError):
+        place(cursor, "A-1", BOB)
+    assert _row(cursor)["held_by"] == ALICE
+
+
+def test_only_approved_students_can_be_held(cursor):
+    with pytest.raises(HoldError):
+        place(cursor, "A-2", ALICE)
+
+
+def test_renewal_bumps_the_version_and_retires_the_old_form(cursor):
+    old = place(cursor, "A-1", ALICE)
+    new = place(cursor, "A-1", ALICE)
+    assert new["hold_version"] == old["hold_version"] + 1
+    with pytest.raises(HoldError):
+        confirm(cursor, "A-1", ALICE, old["hold_version"])
+    confirm(cursor, "A-1", ALICE, new["hold_version"])
+    assert _row(cursor)["status"] == "Assigned"
+
+
+def test_stale_form_cannot_confirm_a_newer_hold(cursor):
+    # Alice's hold expires, Bob holds the student, Alice's hold comes back:
+    # the confirm form from her first hold must not go through
+    first = place(cursor, "A-1", ALICE)
+    _expire(cursor)
+    bob = place(cursor, "A-1", BOB)
+    assert bob["hold_version"] == first["hold_version"] + 1
+    with pytest.raises(HoldError):
+        confirm(cursor, "A-1", ALICE, first["hold_version"])
+    release(cursor, "A-1", BOB)
+    again = place(cursor, "A-1", ALICE)
+    with pytest.raises(HoldError):
+        confirm(cursor, "A-1", ALICE, first["hold_version"])
+    confirm(cursor, "A-1", ALICE, again["hold_version"])
+    assert cursor.bumped == [{"status:Approved": -1, "status:Assigned": 1}]
+
+
+def test_expired_hold_cannot_be_confirmed(cursor):
+    hold = place(cursor, "A-1", ALICE)
+    _expire(cursor)
+    assert current(cursor, "A-1", ALICE) is None
+    with pytest.raises(HoldError):
+        confirm(cursor, "A-1", ALICE, hold["hold_version"])
+    assert _row(cursor)["status"] == "Approved"
+
+
+def test_confirm_twice_fails_the_second_time(cursor):
+    hold = place(cursor, "A-1", ALICE)
+    confirm(cursor, "A-1", ALICE, hold["hold_version"])
+    with pytest.raises(HoldError):
+        confirm(cursor, "A-1", ALICE, hold["hold_version"])
+    assert len(cursor.bumped) == 1
+
+
+def test_release_and_sweep_bump_the_version(cursor):
+    hold = place(cursor, "A-1", ALICE)
+    assert not release(cursor, "A-1", BOB)
+    assert release(cursor, "A-1", ALICE)
+    assert _row(cursor)["hold_version"] == hold["hold_version"] + 1
+
+    place(cursor, "A-1", BOB)
+    _expire(cursor)
+    assert sweep(cursor) == 1
+    row = _row(cursor)
+    assert row["held_by"] is None and row["hold_version"] == hold["hold_version"] + 3
@@ -0,0 +1,90 @@
+import csv
+from datetime import date
+
+import mysql.connector
+import pytest
+
+import imports
+
+HEADER = "student_name,father_name,mobile_no,age,father_income,class\n"
+GOOD = {"student_name": "Ali", "father_name": "Ahmed", "mobile_no": "0300-1234567"}
+
+
+def _report(path):
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        return list(csv.reader(f))[1:]
+
+
+@pytest.fixture
+def inserted(monkeypatch):
+    # insert_batch stand-in: numbers rows, and refuses any batch holding a
+    # student named "Refused" the way MySQL would (DataError, batch rolled back)
+    batches = []
+
+    def insert_batch(batch, user_id="1"):
+        batches.append([fields[0] for fields in batch])
+        if any(fields[0] == "Refused" for fields in batch):
+            raise mysql.connector.DataError(msg="Data too long for column", errno=1406)
+        return [f"A-{sum(map(len, batches))}-{i}" for i in range(len(batch))]
+    monkeypatch.setattr(imports, "insert_batch", insert_batch)
+    return batches
+
+
+@pytest.mark.parametrize("record, error", [
+    (dict(GOOD, age="NaN"), "age: not a number"),
+    (dict(GOOD, age="Infinity"), "age: not a number"),
+    (dict(GOOD, age="300"), "age: must be 0-120"),
+    (dict(GOOD, father_income="NaN"), "father_income"),
+    (dict(GOOD, loss_flood="1e20"), "loss_flood"),
+    (dict(GOOD, student_name="x" * 101), "student_name: longer than 100 characters"),
+    (dict(GOOD, **{"class": "c" * 51}), "class: longer than 50 characters"),
+    (dict(GOOD, mobile_no="12345"), "mobile_no: expected 03xxxxxxxxx"),
+    (dict(GOOD, dob="2090-01-01"), "dob: in the future"),
+])
+def test_validate_rejects_bad_cells(record, error):
+    _, errors = imports.validate(record, today=date(2024, 6, 1))
+    assert any(e.startswith(error) for e in errors), errors
+
+
+def test_validate_accepts_a_good_row():
+    fields, errors = imports.validate(dict(GOOD, age="9", father_income="25,000"))
+    assert errors == []
+    assert fields[0] == "Ali" and fields[3] == 9 and fields[7] == "03001234567"
+
+
+def test_bad_rows_are_reported_and_good_rows_imported(tmp_path, inserted):
+    sheet = tmp_path / "sheet.csv"
+    sheet.write_text(HEADER
+                     + "Ali,Ahmed,03001234567,9,,\n"
+                     + ",Nadeem,03001234567,,,\n"
+                     + "Sara,Bilal,03001234567,NaN,,\n"
+                     + "\n"
+                     + "Zara,Imran,03001234567,,,\n", encoding="utf-8")
+    summary = imports.import_file(str(sheet), str(tmp_path / "report.csv"), batch_size=10)
+    assert summary["imported"] == 2 and summary["rejected"] == 2
+    assert inserted == [["Ali", "Zara"]]
+    rows = _report(tmp_path / "report.csv")
+    assert [row[0] for row in rows] == ["3", "4"]
+    assert "student_name: required" in rows[0][3]
+    assert "age: not a number" in rows[1][3]
+
+
+def test_batch_refused_by_mysql_is_retried_row_by_row(tmp_path, inserted):
+    sheet = tmp_path / "sheet.csv"
+    sheet.write_text(HEADER
+                     + "Ali,Ahmed,03001234567,,,\n"
+                     + "Refused,Ahmed,03001234567,,,\n"
+                     + "Zara,Imran,03001234567,,,\n", encoding="utf-8")
+    summary = imports.import_file(str(sheet), str(tmp_path / "report.csv"), batch_size=10)
+    assert inserted == [["Ali", "Refused", "Zara"], ["Ali"], ["Refused"], ["Zara"]]
+    assert summary["imported"] == 2 and summary["rejected"] == 1
+    assert summary["first_application_no"] and summary["last_application_no"]
+    rows = _report(tmp_path / "report.csv")
+    assert rows == [["3", "Refused", "Ahmed", "database: Data too long for column"]]
+
+
+def test_missing_required_column_is_a_file_error(tmp_path):
+    sheet = tmp_path / "sheet.csv"
+    sheet.write_text("student_name,father_name\nAli,Ahmed\n", encoding="utf-8")
+    with pytest.raises(imports.ImportFileError):
+        imports.import_file(str(sheet), str(tmp_path / "report.csv"))
@@ -0,0 +1,95 @@
+import os
+import threading
+import time
+
+import pytest
+
+import jobs
+from conftest import login
+
+
+@pytest.fixture
+def jobs_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _insert_running(job_id, heartbeat_at):
+    conn = jobs._db()
+    try:
+        conn.execute(
+            "INSERT INTO jobs (id, kind, params, status, created_at, started_at, heartbeat_at) "
+            "VALUES (?,?,?,?,?,?,?)",
+            (job_id, "applications_export", "{}", jobs.RUNNING, heartbeat_at, heartbeat_at, heartbeat_at),
+        )
+    finally:
+        conn.close()
+
+
+# ==== /jobs/export ====
+@pytest.mark.parametrize("kind", ["applications_import", "pdf_report", "image_derivatives", "nope"])
+def test_export_route_rejects_other_job_kinds(client, monkeypatch, kind):
+    submitted = []
+    monkeypatch.setattr(jobs, "submit", lambda *args, **kwargs: submitted.append(args) or "x")
+    login(client)
+    response = client.post("/jobs/export", data={"kind": kind, "path": "/etc/passwd"})
+    assert response.status_code == 302
+    assert submitted == []
+    with client.session_transaction() as session:
+        assert ("danger", "Unknown export") in session["_flashes"]
+
+
+def test_export_route_queues_export_kinds(client, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(jobs, "submit", lambda kind, params, owner=None: submitted.append(kind) or "abc")
+    login(client)
+    response = client.post("/jobs/export", data={"kind": "donor_assignments_export", "format": "csv"})
+    assert response.status_code == 302
+    assert submitted == ["donor_assignments_export"]
+
+
+def test_import_job_deletes_only_staged_uploads(jobs_dir, tmp_path_factory):
+    import app
+
+    outside = tmp_path_factory.mktemp("elsewhere") / "keep.csv"
+    outside.write_text("student_name\n")
+    with pytest.raises(jobs.JobError):
+        app.applications_import_job({"path": str(outside)}, str(jobs_dir / "out"), lambda: None)
+    assert outside.exists()
+
+    staged = app.import_upload_path(".csv")
+    assert app.is_import_upload(staged)
+    assert not app.is_import_upload(os.path.join(str(jobs_dir), "..", os.path.basename(staged)))
+    assert not app.is_import_upload(os.path.join(str(jobs_dir), "jobs.sqlite3"))
+
+
+# ==== stale jobs ====
+def test_cleanup_fails_only_jobs_without_a_recent_heartbeat(jobs_dir):
+    now = time.time()
+    _insert_running("stale", now - jobs.STALE_AFTER - 1)
+    _insert_running("alive", now - jobs.STALE_AFTER + 60)
+    jobs.cleanup(now)
+    assert jobs.get("stale")["status"] == jobs.FAILED
+    assert jobs.get("alive")["status"] == jobs.RUNNING
+
+
+def test_heartbeat_runs_while_the_job_function_blocks(jobs_dir, monkeypatch):
+    # A job that never calls check_cancelled() must still look alive
+    monkeypatch.setattr(jobs, "HEARTBEAT_INTERVAL", 0.05)
+    _insert_running("blocking", time.time() - 1)
+    job = dict(jobs.get("blocking"), kind="test_blocking")
+    seen = []
+
+    def blocking(params, out_path, check_cancelled):
+        first = jobs.get("blocking")["heartbeat_at"]
+        deadline = time.time() + 5
+        while time.time() < deadline and jobs.get("blocking")["heartbeat_at"] == first:
+            time.sleep(0.02)
+        seen.append(jobs.get("blocking")["heartbeat_at"] > first)
+        return {"filename": "x"}
+
+    monkeypatch.setitem(jobs._kinds, "test_blocking", blocking)
+    jobs._run(job)
+    assert seen == [True]
+    assert jobs.get("blocking")["status"] == jobs.DONE
+    assert not any(t.name.startswith("job-heartbeat-") for t in threading.enumerate())
@@ -0,0 +1,77 @@
+import pytest
+
+from pagination import NEXT, PREV, PaginationError, _beyond, decode_token, encode_token, fetch_page
+
+KEYS = [("created_at", "created_at"), ("id", "id")]
+QUERY = "SELECT id, created_at FROM items WHERE 1=1"
+
+
+@pytest.fixture
+def items(sqlite_db, sqlite_cursor):
+    # Ties on created_at and five rows without one, which sort last
+    sqlite_db.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, created_at TEXT)")
+    created = ["2024-01-03", "2024-01-02", "2024-01-02", "2024-01-02", "2024-01-01",
+               None, None, None, None, None, "2024-01-04"]
+    for i, value in enumerate(created, 1):
+        sqlite_db.execute("INSERT INTO items (id, created_at) VALUES (?, ?)", (i, value))
+    expected = [row["id"] for row in sqlite_db.execute(
+        "SELECT id FROM items ORDER BY created_at DESC, id DESC")]
+    return sqlite_cursor, expected
+
+
+def _walk(cursor, size, token=None, direction="next"):
+    pages = []
+    while True:
+        page = fetch_page(cursor, QUERY, [], KEYS, token, size)
+        pages.append([row["id"] for row in page.rows])
+        token = page.next_token if direction == "next" else page.prev_token
+        if token is None:
+            return pages, page
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 4, 20])
+def test_forward_walk_visits_every_row_once_in_order(items, size):
+    cursor, expected = items
+    pages, _ = _walk(cursor, size)
+    assert [i for page in pages for i in page] == expected
+    assert all(len(page) == size for page in pages[:-1])
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 4])
+def test_backward_walk_returns_the_same_pages(items, size):
+    cursor, _ = items
+    forward, last = _walk(cursor, size)
+    backward, _ = _walk(cursor, size, last.prev_token, direction="prev")
+    assert backward[::-1] == forward[:-1]
+
+
+def test_page_boundary_inside_the_null_rows(items):
+    cursor, _ = items
+    # Undated rows come after every dated one, highest id first
+    token = encode_token(NEXT, [None, 9])
+    page = fetch_page(cursor, QUERY, [], KEYS, token, 10)
+    assert [row["id"] for row in page.rows] == [8, 7, 6]
+    assert page.next_token is None
+
+    token = encode_token(PREV, [None, 8])
+    page = fetch_page(cursor, QUERY, [], KEYS, token, 2)
+    assert [row["id"] for row in page.rows] == [10, 9]
+
+
+def test_next_past_a_dated_row_includes_the_null_rows(items):
+    cursor, expected = items
+    page = fetch_page(cursor, QUERY, [], KEYS, encode_token(NEXT, ["2024-01-01", 5]), 10)
+    assert [row["id"] for row in page.rows] == expected[expected.index(5) + 1:]
+
+
+def test_beyond_with_null_first_key():
+    sql, params = _beyond(["created_at", "id"], [None, 7], NEXT)
+    assert sql == "(created_at IS NULL AND (id < %s))" and params == [7]
+    sql, params = _beyond(["created_at", "id"], [None, 7], PREV)
+    assert sql == "created_at IS NOT NULL OR (created_at IS NULL AND (id > %s))" and params == [7]
+
+
+@pytest.mark.parametrize("token", ["garbage", encode_token("x", [1, 2]), encode_token(NEXT, [1])])
+def test_bad_tokens_are_rejected(token):
+    with pytest.raises(PaginationError):
+        decode_token(token, 2)
@@ -0,0 +1,57 @@
+import pytest
+
+from conftest import FakeCursor
+from filters import APPLICATIONS
+from pdf_reports import PdfReports, report_query
+
+
+@pytest.fixture
+def cursor(sqlite_db, sqlite_cursor):
+    sqlite_db.execute("""
+        CREATE TABLE applications (
+            id INTEGER PRIMARY KEY, application_no TEXT, student_name TEXT, status TEXT,
+            age INTEGER, updated_at TEXT)
+    """)
+    sqlite_db.executemany(
+        "INSERT INTO applications (application_no, student_name, status, age, updated_at) VALUES (?,?,?,?,?)",
+        [("A-1", "Ali", "Approved", 9, "2024-01-01 10:00:00"),
+         ("A-2", "Sara", "Approved", 10, "2024-01-02 10:00:00"),
+         ("A-3", "Zara", "Pending", 9, "2024-01-03 10:00:00")])
+    return sqlite_cursor
+
+
+def _values(**args):
+    return APPLICATIONS.parse(args)[0]
+
+
+def test_version_query_has_no_order_by(cursor):
+    # MySQL refuses ORDER BY beside COUNT()/MAX() under ONLY_FULL_GROUP_BY (1140)
+    rows, version = PdfReports().report_version(cursor, _values(status="Approved"))
+    statement, params = cursor.statements[-1]
+    assert "ORDER BY" not in statement.upper()
+    assert statement.startswith("SELECT COUNT(*), MAX(updated_at) FROM applications")
+    assert params == ("Approved",)
+    assert (rows, version) == (2, [2, "2024-01-02 10:00:00"])
+
+
+def test_version_follows_the_data(cursor):
+    reports = PdfReports()
+    before = reports.report_version(cursor, _values(age="9"))[1]
+    cursor.conn.execute("UPDATE applications SET updated_at='2024-02-01 00:00:00' WHERE application_no='A-1'")
+    after = reports.report_version(cursor, _values(age="9"))[1]
+    assert before != after
+    assert reports.key("report", {"age": "9"}, before) != reports.key("report", {"age": "9"}, after)
+
+
+def test_version_query_with_a_name_filter():
+    # The Student filter's index probe runs first; no ORDER BY either way
+    for probe_rows, condition in (([(1,)], "MATCH(name_text)"), ([], "student_name LIKE")):
+        cursor = FakeCursor([probe_rows, (0, None)])
+        PdfReports().report_version(cursor, _values(student="Ali"))
+        statement = cursor.statements[-1][0]
+        assert condition in statement and "ORDER BY" not in statement.upper()
+
+
+def test_report_rows_stay_ordered_by_id():
+    query, _ = report_query(_values(), "id")
+    assert query.endswith("ORDER BY id")
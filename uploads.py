@@ -0,0 +1,187 @@
+"""
+Upload handling for photos and receipts.
+
+Uploaded files are copied in CHUNK_SIZE pieces to a staging file under
+UPLOAD_TMP_DIR, never read whole into memory. While copying, the size is
+checked against the field's limit and the type is sniffed from the leading
+bytes (the browser's filename and Content-Type are not trusted):
+
+    staged = stage_file(request.files["receipt"], "receipt")
+    staged.path, staged.size, staged.mimetype, staged.ext
+
+The webcam capture arrives as a base64 data URL in a form field; it is decoded
+in chunks the same way with stage_data_url().
+
+The request itself is capped by MAX_CONTENT_LENGTH (UPLOAD_MAX_REQUEST_MB) and
+form fields by UploadRequest.max_form_memory_size, so an oversized post is
+refused before it is parsed. The slow part - resizing photos, re-encoding
+receipt images - is left to background jobs (see app.py).
+
+Environment: UPLOAD_TMP_DIR (default var/uploads), UPLOAD_MAX_REQUEST_MB (20),
+PICTURE_MAX_MB (8), RECEIPT_MAX_MB (10), RECEIPT_MAX_PX (2000).
+"""
+import base64
+import binascii
+import hashlib
+import os
+import tempfile
+
+from flask import Request
+from PIL import Image, ImageOps
+
+from image_store import sniff_image_type
+
+UPLOAD_TMP_DIR = os.environ.get("UPLOAD_TMP_DIR", "var/uploads")
+MAX_REQUEST_BYTES = int(float(os.environ.get("UPLOAD_MAX_REQUEST_MB", 20)) * 1024 * 1024)
+RECEIPT_MAX_PX = int(os.environ.get("RECEIPT_MAX_PX", 2000))
+CHUNK_SIZE = 64 * 1024
+
+IMAGE_TYPES = ("image/jpeg", "image/png", "image/webp", "image/gif", "image/bmp")
+PDF_TYPE = "application/pdf"
+
+# field kind -> (max bytes, allowed mimetypes)
+LIMITS = {
+    "picture": (int(float(os.environ.get("PICTURE_MAX_MB", 8)) * 1024 * 1024), IMAGE_TYPES),
+    "receipt": (int(float(os.environ.get("RECEIPT_MAX_MB", 10)) * 1024 * 1024), IMAGE_TYPES + (PDF_TYPE,)),
+}
+
+
+class UploadError(Exception):
+    pass
+
+
+class UploadRequest(Request):
+    # Non-file form fields (the webcam data URL is the big one) are held in
+    # memory by the form parser; cap them too
+    max_form_memory_size = MAX_REQUEST_BYTES
+
+
+class StagedUpload:
+    def __init__(self, path, size, mimetype, ext, sha256):
+        self.path = path
+        self.size = size
+        self.mimetype = mimetype
+        self.ext = ext
+        self.sha256 = sha256
+
+    def discard(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def sniff_type(head):
+    # (mimetype, extension) of an image or PDF, or (None, None)
+    if head.startswith(b"%PDF-"):
+        return PDF_TYPE, "pdf"
+    return sniff_image_type(head)
+
+
+def _limit(kind):
+    if kind not in LIMITS:
+        raise UploadError(f"Unknown upload kind: {kind}")
+    return LIMITS[kind]
+
+
+def _stage(chunks, kind):
+    # Write chunks to a staging file, enforcing the kind's size and type
+    max_bytes, allowed = _limit(kind)
+    os.makedirs(UPLOAD_TMP_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=UPLOAD_TMP_DIR, prefix=f"{kind}-")
+    digest = hashlib.sha256()
+    size = 0
+    mimetype = ext = None
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                if size == 0:
+                    mimetype, ext = sniff_type(chunk[:16])
+                    if mimetype not in allowed:
+                        raise UploadError(f"{kind.capitalize()} must be one of: "
+                                          + ", ".join(t.split("/")[1].upper() for t in allowed))
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadError(f"{kind.capitalize()} is larger than {max_bytes // (1024 * 1024)} MB")
+                digest.update(chunk)
+                out.write(chunk)
+        if size == 0:
+            raise UploadError(f"{kind.capitalize()} is empty")
+    except BaseException:
+        os.remove(path)
+        raise
+    return StagedUpload(path, size, mimetype, ext, digest.hexdigest())
+
+
+def stage_file(storage, kind):
+    # storage: werkzeug FileStorage
+    stream = storage.stream
+    return _stage(iter(lambda: stream.read(CHUNK_SIZE), b""), kind)
+
+
+def _data_url_chunks(value):
+    header, sep, encoded = value.partition(",")
+    if not sep or not header.startswith("data:") or not header.endswith(";base64"):
+        raise UploadError("Captured image is not a base64 data URL")
+    # 4 base64 characters decode to 3 bytes, so chunk on a multiple of 4
+    step = CHUNK_SIZE // 3 * 4
+    try:
+        for start in range(0, len(encoded), step):
+            yield base64.b64decode(encoded[start:start + step], validate=True)
+    except binascii.Error:
+        raise UploadError("Captured image is corrupt")
+
+
+def stage_data_url(value, kind):
+    return _stage(_data_url_chunks(value.strip()), kind)
+
+
+# ==== BACKGROUND PROCESSING ====
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def normalize_receipt(path):
+    # Receipt photos straight off a phone camera: apply EXIF rotation, drop
+    # metadata, downscale to RECEIPT_MAX_PX and re-encode in the same format.
+    # PDFs are only checked for being complete. `path` is left alone (stored
+    # files are content-addressed); -> a StagedUpload of the re-encoded
+    # receipt, or None when it is kept as it is
+    with open(path, "rb") as f:
+        head = f.read(16)
+        f.seek(max(os.path.getsize(path) - 1024, 0))
+        tail = f.read()
+    mimetype, ext = sniff_type(head)
+    if mimetype == PDF_TYPE:
+        if b"%%EOF" not in tail:
+            raise UploadError(f"Receipt PDF looks truncated: {path}")
+        return None
+    if mimetype not in IMAGE_TYPES:
+        raise UploadError(f"Receipt is not an image or PDF: {path}")
+
+    with Image.open(path) as img:
+        fmt = img.format
+        if fmt == "GIF":
+            return None   # re-saving would drop frames
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((RECEIPT_MAX_PX, RECEIPT_MAX_PX))
+        if fmt == "JPEG" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        os.makedirs(UPLOAD_TMP_DIR, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=UPLOAD_TMP_DIR, prefix="receipt-")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                if fmt == "JPEG":
+                    img.save(out, format=fmt, quality=85, optimize=True, progressive=True)
+                else:
+                    img.save(out, format=fmt)
+            return StagedUpload(tmp, os.path.getsize(tmp), mimetype, ext, _hash_file(tmp))
+        except Exception:
+            os.remove(tmp)
+            raise